@@ -3,12 +3,9 @@ import re
 import sys
 import json
 import time
-import atexit
-import base64
 import random
 import requests
 import datetime
-import subprocess
 from urllib.parse import quote
 
 from urllib.parse import urlparse
@@ -16,12 +13,19 @@ from playwright.sync_api import sync_playwright
 from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 
 # ==================== 基准数据对接 ====================
-BASE_URL = "https://dashboard.digitalplat.org/_panel_api/api/domains"
+# DIGITALPLAT_API_URL 可指向本地替身（python -m engine.mock_sites）
+BASE_URL = os.environ.get("DIGITALPLAT_API_URL") or "https://dashboard.digitalplat.org/_panel_api/api/domains"
 RENEW_DAYS = 120
 TIMEOUT = 15
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, BASE_DIR)
 from engine.notify import TelegramNotifier
+from engine.tunnel import get_tunnel_pool
+from engine.browser import apply_block_profile, DEFAULT_BLOCK_PROFILE
+from engine.logger import get_logger
+from engine.proxy_pool import ProxyPool
+from engine.scheduler import DailyScheduler
+from engine.storage_codec import slim_storage_state, encode_state, decode_state, pack_locals, unpack_locals
 try:
     from engine.main import ConfigReader, SecretUpdater,print_dict_tree,test_proxy
 except ImportError:
@@ -41,6 +45,10 @@ BOARD_ENTRY_URL = "https://dashboard.digitalplat.org/domains"
 
 DEVICE_VERIFY_WAIT = 30  # Mobile验证 默认等 30 秒
 TWO_FACTOR_WAIT = int(os.environ.get("TWO_FACTOR_WAIT", "120"))  # 2FA验证 默认等 120 秒
+# 资源拦截：GitHub 登录 / 设备验证页不拦截，其余页面拦截图片 / 字体 / 统计脚本
+BLOCK_PROFILE = DEFAULT_BLOCK_PROFILE.extend(allow_hosts=["github.com"])
+# storage_state 只保留该域名的 cookie
+COOKIE_DOMAINS = ["digitalplat.org"]
 
 # 初始化
 _notifier = None
@@ -70,39 +78,6 @@ def mask_ip(ip: str):
 
 def mask_password(pwd: str):
     return "*" * 6 + f"({len(pwd)})"
-def slim_storage_state(state):
-    """
-    精简 storage_state，只保留核心登录凭据，防止超过 GitHub 64KB 限制
-    """
-    if not isinstance(state, dict):
-        return state
-
-    # 1. 精简 Cookies：只保留 .digitalplat.org 的
-    if "cookies" in state:
-        state["cookies"] = [
-            c for c in state["cookies"] 
-            if "digitalplat.org" in c.get("domain", "")
-        ]
-
-    # 2. 精简 Origins：只保留核心 key，剔除没用的 UI 状态
-    if "origins" in state:
-        new_origins = []
-        # 核心关注的 localStorage 键名
-        essential_keys = ["session", "lastLoginUpdateTime", "i18nextLng"]
-        
-        for o in state["origins"]:
-            storage = o.get("localStorage", [])
-            # 过滤掉那些几百行长的无用缓存数据
-            slim_storage = [
-                item for item in storage 
-                if item.get("name") in essential_keys
-            ]
-            o["localStorage"] = slim_storage
-            new_origins.append(o)
-        
-        state["origins"] = new_origins
-
-    return state
 class AutoLogin:
     """自动登录，因 GH_SESSIION 每日更新，不考虑登录github，直接注入GH_SESSIION"""
     
@@ -137,7 +112,7 @@ class AutoLogin:
         self.notify = config.get('notify')
         # self.secret = SecretUpdater()
         self.shots = []
-        self.logs = []
+        self.logger = get_logger("digitalplat", account=self.gh_username)
         self.n = 0
         
         # 区域相关
@@ -147,10 +122,7 @@ class AutoLogin:
 
         
     def log(self, msg, level="INFO"):
-        icons = {"INFO": "ℹ️", "SUCCESS": "✅", "ERROR": "❌", "WARN": "⚠️", "STEP": "🔹"}
-        line = f"{icons.get(level, '•')} {msg}"
-        print(line, flush=True)
-        self.logs.append(line)
+        self.logger.log(msg, level)
     
     def shot(self, page, name):
         self.n += 1
@@ -272,45 +244,29 @@ class AutoLogin:
         
     def start_gost_proxy(self, proxy):
         """
-        使用 gost 将 socks5(带认证) 转为本地 http 代理
+        从共享隧道池获取 gost，将 socks5(带认证) 转为本地 http 代理
+        同一上游代理在多个账号 / 任务间复用同一个 gost 进程
         """
-        listen_port = random.randint(20000, 30000)
-        listen = f"http://127.0.0.1:{listen_port}"
-
-        auth = ""
-        if proxy.get("username") and proxy.get("password"):
-            auth = f"{proxy['username']}:{proxy['password']}@"
-
-        remote = f"socks5://{auth}{proxy['server']}:{proxy['port']}"
-
-        cmd = [
-            "./gost",
-            "-L", listen,
-            "-F", remote
-        ]
-
-        self.log(f"启动 Gost，listen: {listen}", "INFO")
+        tunnels = get_tunnel_pool()
+        tunnel = tunnels.acquire(proxy)
+        self.gost_proxy = proxy
+        self.log(f"使用 Gost 隧道，listen: {tunnel.local_url}", "INFO")
 
-        proc = subprocess.Popen(
-            cmd,
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-
-        atexit.register(proc.terminate)
-
-        time.sleep(1.5)  # 给 gost 启动时间
         # ----------------------------
         # 2️⃣ 测试隧道是否可用
         # ----------------------------
-        res = requests.get("https://api.ipify.org", proxies={"http": remote, "https": remote}, timeout=15)
-        self.log(f"隧道就绪，出口 IP: {res.text.strip()}", "INFO")
+        tunnels.probe(proxy)
 
         return {
-            "server": listen,
-            "process": proc
+            "server": tunnel.local_url,
+            "process": tunnel.proc
         }
 
+    def release_gost_proxy(self):
+        if getattr(self, "gost_proxy", None):
+            get_tunnel_pool().release(self.gost_proxy)
+            self.gost_proxy = None
+
     
     def build_session(self,token):
         cookies=self.get_digitalplat_cookies()
@@ -1331,6 +1287,7 @@ class AutoLogin:
                 )
             
             
+            apply_block_profile(context, BLOCK_PROFILE)
             page = context.new_page()
             page.add_init_script("""
                 // 基础反检测
@@ -1489,21 +1446,10 @@ class AutoLogin:
                 
                     self.log("开始为数据瘦身...")
                 
-                    # ⚠️ 直接传 dict
-                    slimmest_local = slim_storage_state(storage_state)
-                
-                    # 现在才转 json
-                    final_json = json.dumps(slimmest_local, ensure_ascii=False)
-                
-                    self.log(f"瘦身完成，最终数据大小: {len(final_json) / 1024:.2f} KB")
-                
-                    # 再 base64
-                    storage_state_b64 = base64.b64encode(
-                        final_json.encode("utf-8")
-                    ).decode("utf-8")
-                
+                    slimmest_local = slim_storage_state(storage_state, cookie_domains=COOKIE_DOMAINS)
+                    new_local = encode_state(slimmest_local)
+                    self.log(f"瘦身完成，压缩后大小: {len(new_local) / 1024:.2f} KB")
                     ok = True
-                    new_local = storage_state_b64
                 
                 else:
                     self.log("未获取到 storage_state", "WARN")
@@ -1556,7 +1502,7 @@ def main():
     # 初始化 SecretUpdater，会自动根据当前仓库用户名获取 token
     secret = SecretUpdater("DIGITALPLAT_LOCALS", config_reader=config)
     # 读取
-    dt_locals = secret.load() 
+    dt_locals = unpack_locals(secret.load())
     
 
     if not accounts:
@@ -1568,8 +1514,14 @@ def main():
 
     print(f"📊 检测到 {len(accounts)} 个账号和 {len(proxies)} 个代理")
 
-    # 使用 zip 实现一一对应
-    for account, proxy  in zip(accounts, proxies):
+    # 并发预检全部代理，账号内 test_proxy 直接命中缓存；失效代理的账号切换到健康的备用代理
+    pool = ProxyPool(proxies, task="digitalplat")
+    # 共用同一代理的账号复用 gost 隧道，全部账号结束后统一关闭
+    tunnels = get_tunnel_pool(keep_idle=True)
+
+    # 按代理池分配（粘性 + 故障转移），今日已完成的账号跳过（FORCE_RUN=1 强制重跑）
+    scheduler = DailyScheduler("digitalplat")
+    for account, proxy  in scheduler.pending(pool.assign_all(accounts), key=lambda p: p[0]['username']):
         username=account['username']
         if username=='you5102':
             continue
@@ -1583,7 +1535,7 @@ def main():
         #dt_info['gh_password'] = account.get('password')
         dt_info['dt_proxy'] = proxy
         dt_info['notify'] = notify
-        dt_info['wz_proxy'] = proxies[-1]
+        dt_info['wz_proxy'] = pool.spare_for(proxy)
 
         if isinstance(gh_sessions, dict):
             gh_session = gh_sessions.get(username,'')
@@ -1604,7 +1556,10 @@ def main():
             dt_local=dt_locals.get(username,'')
             if dt_local:
                 try:
-                    dt_info['dt_local'] =  json.loads(base64.b64decode(dt_local).decode("utf-8"))
+                    state = decode_state(dt_local)
+                    if not state:
+                        raise ValueError("storage_state 为空")
+                    dt_info['dt_local'] = state
                     print("✅ 已加载 storage_state")
                 except Exception as e:
                     print(f"❌ 加载 storage_state 失败: {e}")
@@ -1616,10 +1571,15 @@ def main():
         try:
 
             auto_login= AutoLogin(dt_info)
-            ok, new_local,msg = auto_login.run()
+            try:
+                ok, new_local,msg = auto_login.run()
+            finally:
+                auto_login.release_gost_proxy()
     
             if ok:
                 print(f"    ✅ 执行成功")
+                scheduler.mark_done(username)
+                pool.confirm(username, proxy)
                 results.append(f"    ✅ {msg}\n")
                 if new_local:
                     print(f"    ✅ 保存新 new_local")
@@ -1632,10 +1592,12 @@ def main():
             print(f"    ❌ 执行异常: {e}")
             results.append(f"    ❌ 执行异常: {e}")
         #break
+    print(f"🚇 隧道统计: {tunnels.stats()}")
+    tunnels.close_all()
     # 写入
-    # 转换为 JSON 字符串前可以检查下大小
-    print(f"dt_locals数据大小: {len(json.dumps(dt_locals)) / 1024:.2f} KB")
-    secret.update(dt_locals)
+    # 跨账号去重 + 压缩，pack_locals 会打印剩余容量
+    status = secret.update(pack_locals(dt_locals, name=secret.name))
+    results.append(f"💾 {secret.name}: {'内容未变化，跳过回写' if status == 'unchanged' else '已回写'}")
     # 发送结果
     notify.send(
         title="digitalplat 自动登录保活汇总",
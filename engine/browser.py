@@ -0,0 +1,234 @@
+# engine/browser.py
+# -*- coding: utf-8 -*-
+import os
+import re
+import threading
+from urllib.parse import urlparse
+
+from playwright.sync_api import sync_playwright
+
+"""
+# ==================================================
+# 浏览器管理：一次启动 Chromium，多账号独立 Context
+用法：
+manager = get_browser_manager()
+ctx = manager.new_context(proxy_url="http://127.0.0.1:8080", storage_state=storage)
+page = ctx.new_page()
+...
+ctx.close()               # 账号结束只关闭 context
+close_browser_manager()   # 任务结束关闭浏览器（需在同一线程调用）
+
+# 资源拦截：默认拦截图片 / 字体 / 媒体与统计脚本，可按任务覆盖
+profile = DEFAULT_BLOCK_PROFILE.extend(allow_hosts=["checkin.leaflow.net"])
+ctx = manager.new_context(block_profile=profile)
+apply_block_profile(context, profile)   # 自建 context 时手动挂载
+# 环境变量 BLOCK_PROFILE=off 关闭拦截，BLOCK_TYPES=image,font 覆盖拦截类型
+# ==================================================
+"""
+
+DEFAULT_ARGS = [
+    "--no-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-infobars",
+    "--exclude-switches=enable-automation",
+]
+
+MAX_CONTEXT_USES = 20
+
+
+# ==================================================
+# 资源拦截配置
+# ==================================================
+class BlockProfile:
+    """
+    请求拦截配置
+    - block_types: 按 Playwright resource_type 拦截（image / font / media ...）
+    - block_patterns: URL 正则，命中即拦截（统计、广告、监控脚本）
+    - allow_hosts: 白名单域名（含子域名），不做任何拦截，保证登录 / 签到 / 验证码可用
+    """
+    def __init__(self, block_types=(), block_patterns=(), allow_hosts=(), enabled: bool = True):
+        self.block_types = frozenset(block_types)
+        self.block_patterns = tuple(block_patterns)
+        self.allow_hosts = tuple(h.lower() for h in allow_hosts)
+        self.enabled = enabled
+        self._pattern = re.compile("|".join(self.block_patterns), re.IGNORECASE) if self.block_patterns else None
+
+    def extend(self, block_types=(), block_patterns=(), allow_hosts=(), enabled: bool = None):
+        """在当前配置基础上追加规则，返回新配置（任务级覆盖）"""
+        return BlockProfile(
+            block_types=self.block_types | set(block_types),
+            block_patterns=self.block_patterns + tuple(block_patterns),
+            allow_hosts=self.allow_hosts + tuple(allow_hosts),
+            enabled=self.enabled if enabled is None else enabled,
+        )
+
+    def is_allowed_host(self, host: str) -> bool:
+        host = (host or "").lower()
+        return any(host == h or host.endswith("." + h) for h in self.allow_hosts)
+
+    def should_block(self, url: str, resource_type: str) -> bool:
+        if not self.enabled:
+            return False
+        if self.is_allowed_host(urlparse(url).hostname):
+            return False
+        if resource_type in self.block_types:
+            return True
+        return bool(self._pattern and self._pattern.search(url))
+
+    @classmethod
+    def from_env(cls, base: "BlockProfile") -> "BlockProfile":
+        """读取 BLOCK_PROFILE / BLOCK_TYPES 环境变量覆盖"""
+        if os.getenv("BLOCK_PROFILE", "").strip().lower() in ("off", "0", "false", "none"):
+            return base.extend(enabled=False)
+        raw_types = os.getenv("BLOCK_TYPES", "").strip()
+        if raw_types:
+            types = [t.strip() for t in raw_types.split(",") if t.strip()]
+            return cls(types, base.block_patterns, base.allow_hosts, base.enabled)
+        return base
+
+
+DEFAULT_BLOCK_PROFILE = BlockProfile(
+    block_types=["image", "media", "font"],
+    block_patterns=[
+        r"google-analytics\.com",
+        r"googletagmanager\.com",
+        r"doubleclick\.net",
+        r"googlesyndication\.com",
+        r"facebook\.net",
+        r"hotjar\.com",
+        r"clarity\.ms",
+        r"sentry\.io",
+        r"cloudflareinsights\.com",
+        r"/analytics(\.js|/)",
+        r"/gtag/js",
+    ],
+    # 验证码服务不能拦截，否则登录流程会卡死
+    allow_hosts=[
+        "challenges.cloudflare.com",
+        "hcaptcha.com",
+        "recaptcha.net",
+    ],
+)
+
+
+def apply_block_profile(context, profile: BlockProfile = None):
+    """在 context 上挂载请求拦截，需在页面导航前调用"""
+    profile = BlockProfile.from_env(profile or DEFAULT_BLOCK_PROFILE)
+    if not profile.enabled:
+        print("🧱 资源拦截已关闭")
+        return context
+
+    def _route(route):
+        request = route.request
+        if profile.should_block(request.url, request.resource_type):
+            route.abort()
+        else:
+            route.continue_()
+
+    context.route("**/*", _route)
+    print(f"🧱 已启用资源拦截: {','.join(sorted(profile.block_types))}")
+    return context
+
+
+class BrowserManager:
+    """
+    浏览器管理器
+    - 首次 new_context 时启动 Playwright + Chromium，之后复用
+    - 每个账号一个 BrowserContext（独立 cookies / storage / 代理）
+    - 累计创建 max_uses 个 context 后回收并重启浏览器，防止内存膨胀
+    注意：Playwright 同步 API 绑定线程，一个管理器只能在创建它的线程中使用
+    """
+    def __init__(self, args: list = None, headless: bool = True, max_uses: int = MAX_CONTEXT_USES):
+        self.args = args or DEFAULT_ARGS
+        self.headless = headless
+        self.max_uses = max_uses
+        self.pw = None
+        self.browser = None
+        self.uses = 0
+        self.launches = 0
+        self._open = set()
+
+    def _launch(self):
+        if self.pw is None:
+            self.pw = sync_playwright().start()
+
+        print("🚀 启动 Chromium（共享浏览器）")
+        self.browser = self.pw.chromium.launch(
+            headless=self.headless,
+            args=self.args,
+        )
+        self.uses = 0
+        self.launches += 1
+
+    def _recycle_if_needed(self):
+        if self.browser is None or not self.browser.is_connected():
+            self._launch()
+            return
+        if self.uses >= self.max_uses and not self._open:
+            print(f"♻️ 浏览器已服务 {self.uses} 个 context，重启回收")
+            self._close_browser()
+            self._launch()
+
+    def new_context(self, proxy_url: str = None, block_profile: BlockProfile = None, **kwargs):
+        """
+        创建独立的 BrowserContext
+        - proxy_url: 本账号代理，如 http://127.0.0.1:8080
+        - block_profile: 资源拦截配置，默认 DEFAULT_BLOCK_PROFILE
+        - kwargs: 透传给 browser.new_context（storage_state / viewport / user_agent 等）
+        """
+        self._recycle_if_needed()
+
+        # 不在启动时设置全局代理：未指定代理的 context 直连，而不是继承占位代理
+        if proxy_url:
+            kwargs["proxy"] = {"server": proxy_url}
+            print(f"🌐 Context 使用代理: {proxy_url}")
+        else:
+            print("🌐 Context 未使用代理")
+
+        ctx = self.browser.new_context(**kwargs)
+        self.uses += 1
+        self._open.add(ctx)
+        ctx.on("close", lambda c: self._open.discard(c))
+        apply_block_profile(ctx, block_profile)
+        return ctx
+
+    def _close_browser(self):
+        if self.browser:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+        self._open.clear()
+
+    def close(self):
+        self._close_browser()
+        if self.pw:
+            try:
+                self.pw.stop()
+            except Exception:
+                pass
+            self.pw = None
+        if self.launches:
+            print(f"🧹 浏览器已关闭，本线程共启动 {self.launches} 次")
+
+
+_local = threading.local()
+
+
+def get_browser_manager(**kwargs) -> BrowserManager:
+    """当前线程的共享浏览器管理器（首次调用时创建）"""
+    manager = getattr(_local, "manager", None)
+    if manager is None:
+        manager = BrowserManager(**kwargs)
+        _local.manager = manager
+    return manager
+
+
+def close_browser_manager():
+    """关闭当前线程的浏览器管理器，可作为 run_pool 的 on_worker_exit"""
+    manager = getattr(_local, "manager", None)
+    if manager is not None:
+        manager.close()
+        _local.manager = None
@@ -0,0 +1,318 @@
+# engine/config_format.py
+# -*- coding: utf-8 -*-
+import os
+import sys
+import hmac
+import json
+import base64
+import time
+import hashlib
+import struct
+import threading
+from hashlib import sha256
+from pathlib import Path
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+"""
+# ==================================================
+# 加密配置文件格式
+# v1（旧）：base64( nonce + AES-GCM(整个 JSON) )，读取任一项都要解密全部
+# v2（索引）：按配置项分段加密，get_value 只解密用到的段
+#
+#   MAGIC(4) | VERSION(1) | HEADER_LEN(4, 大端) | HEADER(JSON) | SECTIONS...
+#   HEADER = {"version": 2, "kdf": {...}, "check": "<base64>", "index": {"<tag>": [offset, length]}}
+#   kdf     = {"name": "scrypt", "salt": "<base64>", "n": 32768, "r": 8, "p": 1}
+#             {"name": "pbkdf2", "salt": "<base64>", "iterations": 600000}
+#             缺省为 {"name": "sha256"}（与 v1 相同，仅用于兼容）
+#   tag     = HMAC-SHA256(索引密钥, 配置项名)，文件中不出现明文键名
+#   section = nonce(12) + AES-GCM({"description", "value"}, aad=MAGIC+tag)
+#   offset 相对 SECTIONS 起点
+#
+# 转换旧文件（需设置 CONFIG_PASSWORD）：
+python -m engine.config_format convert engine/config.enc
+# 从明文 JSON 生成：
+python -m engine.config_format pack plain.json engine/config.enc
+# 指定 KDF（默认 scrypt:n=32768,r=8,p=1）：
+CONFIG_KDF="scrypt:n=65536" python -m engine.config_format convert engine/config.enc
+# 测试各 KDF 参数的启动耗时：
+python -m engine.config_format bench
+# ==================================================
+"""
+
+MAGIC = b"ACFG"
+VERSION = 2
+NONCE_SIZE = 12
+_PREFIX = struct.Struct(">4sBI")
+
+
+# ==================================================
+# KDF：参数写入文件头，派生结果进程内缓存
+# ==================================================
+DEFAULT_KDF = "scrypt:n=32768,r=8,p=1"
+BENCH_KDFS = [
+    "sha256",
+    "pbkdf2:iterations=200000",
+    "pbkdf2:iterations=600000",
+    "scrypt:n=16384,r=8,p=1",
+    "scrypt:n=32768,r=8,p=1",
+    "scrypt:n=65536,r=8,p=1",
+    "scrypt:n=131072,r=8,p=1",
+]
+
+_key_cache = {}
+_key_lock = threading.Lock()
+
+
+def parse_kdf_spec(spec: str = None) -> dict:
+    """
+    "scrypt:n=32768,r=8,p=1" -> {"name": "scrypt", "n": 32768, "r": 8, "p": 1}
+    未指定的参数使用默认值，salt 在生成文件时随机产生
+    """
+    spec = (spec or os.getenv("CONFIG_KDF") or DEFAULT_KDF).strip()
+    name, _, raw = spec.partition(":")
+    params = dict(kv.split("=", 1) for kv in raw.split(",") if "=" in kv)
+    name = name.lower()
+    if name == "scrypt":
+        return {"name": name, "n": int(params.get("n", 32768)), "r": int(params.get("r", 8)), "p": int(params.get("p", 1))}
+    if name == "pbkdf2":
+        return {"name": name, "iterations": int(params.get("iterations", 600000))}
+    if name == "sha256":
+        return {"name": name}
+    raise ValueError(f"不支持的 KDF: {name}")
+
+
+def new_kdf(spec: str = None) -> dict:
+    """按 spec 生成带随机 salt 的 KDF 参数（写入文件头）"""
+    kdf = parse_kdf_spec(spec)
+    if kdf["name"] != "sha256":
+        kdf["salt"] = base64.b64encode(os.urandom(16)).decode()
+    return kdf
+
+
+def _run_kdf(password: bytes, kdf: dict) -> bytes:
+    name = kdf.get("name", "sha256")
+    if name == "sha256":
+        return sha256(password).digest()
+    salt = base64.b64decode(kdf["salt"])
+    if name == "scrypt":
+        n, r, p = kdf["n"], kdf["r"], kdf["p"]
+        return hashlib.scrypt(password, salt=salt, n=n, r=r, p=p, maxmem=256 * r * (n + p + 2), dklen=32)
+    if name == "pbkdf2":
+        return hashlib.pbkdf2_hmac("sha256", password, salt, kdf["iterations"], dklen=32)
+    raise ValueError(f"不支持的 KDF: {name}")
+
+
+def derive_key(password: str, kdf: dict = None) -> bytes:
+    """按 KDF 参数派生 AES key，同一 密码 + 参数 在进程内只计算一次"""
+    kdf = kdf or {"name": "sha256"}
+    cache_key = (sha256(password.encode()).hexdigest(), json.dumps(kdf, sort_keys=True))
+    with _key_lock:
+        key = _key_cache.get(cache_key)
+        if key is None:
+            key = _run_kdf(password.encode(), kdf)
+            _key_cache[cache_key] = key
+        return key
+
+
+def _index_tag(key: bytes, name: str) -> str:
+    index_key = hmac.new(key, b"acfg-index", sha256).digest()
+    return hmac.new(index_key, name.encode("utf-8"), sha256).hexdigest()
+
+
+def _seal(aes: AESGCM, plaintext: bytes, aad: bytes) -> bytes:
+    nonce = os.urandom(NONCE_SIZE)
+    return nonce + aes.encrypt(nonce, plaintext, aad)
+
+
+def _open(aes: AESGCM, blob: bytes, aad: bytes) -> bytes:
+    return aes.decrypt(blob[:NONCE_SIZE], blob[NONCE_SIZE:], aad)
+
+
+def is_indexed(path) -> bool:
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+# ==================================================
+# v1 旧格式
+# ==================================================
+def decrypt_legacy(encrypted_str: str, key: bytes) -> dict:
+    try:
+        raw = base64.b64decode(encrypted_str)
+        if len(raw) < NONCE_SIZE + 1:
+            raise ValueError("加密数据格式错误")
+        plaintext = AESGCM(key).decrypt(raw[:NONCE_SIZE], raw[NONCE_SIZE:], None)
+        return json.loads(plaintext.decode("utf-8"))
+    except Exception as e:
+        raise ValueError(f"解密失败: {e}")
+
+
+# ==================================================
+# v2 索引格式
+# ==================================================
+def write_indexed(path, data: dict, password: str, kdf: dict = None):
+    """将 {名称: {"description", "value"}} 写为 v2 索引格式"""
+    kdf = kdf or new_kdf()
+    key = derive_key(password, kdf)
+    aes = AESGCM(key)
+    index, sections, offset = {}, [], 0
+    for name, info in data.items():
+        tag = _index_tag(key, name)
+        blob = _seal(aes, json.dumps(info, ensure_ascii=False).encode("utf-8"), MAGIC + tag.encode())
+        index[tag] = [offset, len(blob)]
+        sections.append(blob)
+        offset += len(blob)
+
+    header = json.dumps({
+        "version": VERSION,
+        "kdf": kdf,
+        "check": base64.b64encode(_seal(aes, b"ok", MAGIC + b"check")).decode(),
+        "index": index,
+    }, separators=(",", ":")).encode("utf-8")
+
+    path = Path(path)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(header)))
+        f.write(header)
+        for blob in sections:
+            f.write(blob)
+    os.replace(tmp, path)
+
+
+class IndexedConfig:
+    """
+    v2 配置读取
+    - 打开时只读取头部与索引，按头部 KDF 参数派生 key，并用 check 段校验密码
+    - get(name) 按偏移读取并解密单个配置项，结果缓存
+    与 dict 一样支持 get(name, default)，可直接替换 ConfigReader.config
+    """
+    def __init__(self, path, password: str):
+        self.path = Path(path)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+        with open(self.path, "rb") as f:
+            magic, version, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError("不是索引格式配置文件")
+            if version != VERSION:
+                raise ValueError(f"不支持的配置版本: {version}")
+            header = json.loads(f.read(header_len).decode("utf-8"))
+        self._data_start = _PREFIX.size + header_len
+        self._index = header.get("index", {})
+        self.kdf = header.get("kdf") or {"name": "sha256"}
+        self.key = derive_key(password, self.kdf)
+        self._aes = AESGCM(self.key)
+
+        try:
+            _open(self._aes, base64.b64decode(header["check"]), MAGIC + b"check")
+        except Exception:
+            raise ValueError("解密失败: 密码错误或文件已损坏")
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, name: str) -> bool:
+        return _index_tag(self.key, name) in self._index
+
+    def get(self, name: str, default=None):
+        with self._lock:
+            if name in self._cache:
+                return self._cache[name]
+
+            tag = _index_tag(self.key, name)
+            entry = self._index.get(tag)
+            if entry is None:
+                return default
+
+            offset, length = entry
+            with open(self.path, "rb") as f:
+                f.seek(self._data_start + offset)
+                blob = f.read(length)
+            try:
+                info = json.loads(_open(self._aes, blob, MAGIC + tag.encode()).decode("utf-8"))
+            except Exception as e:
+                raise ValueError(f"解密 {name} 失败: {e}")
+            self._cache[name] = info
+            return info
+
+
+def load_config(path, password: str):
+    """自动识别格式：v2 返回 IndexedConfig，v1 返回完整 dict"""
+    if is_indexed(path):
+        return IndexedConfig(path, password)
+    return decrypt_legacy(Path(path).read_text(encoding="utf-8").strip(), derive_key(password))
+
+
+def _require_password(password: str = None) -> str:
+    password = password or os.getenv("CONFIG_PASSWORD", "").strip()
+    if not password:
+        raise RuntimeError("❌ 未设置 CONFIG_PASSWORD")
+    return password
+
+
+def convert(src, dst=None, password: str = None, kdf_spec: str = None):
+    """将 v1 配置文件转换为 v2 索引格式（dst 默认覆盖 src）"""
+    password = _require_password(password)
+    if is_indexed(src):
+        # v2 中键名只保存 HMAC，无法枚举，更换 KDF 需从明文 JSON 重新 pack
+        print(f"ℹ️ {src} 已是索引格式，无需转换")
+        return
+    data = decrypt_legacy(Path(src).read_text(encoding="utf-8").strip(), derive_key(password))
+    kdf = new_kdf(kdf_spec)
+    write_indexed(dst or src, data, password, kdf)
+    print(f"✅ 已转换 {len(data)} 个配置项 -> {dst or src}（KDF: {kdf['name']}）")
+
+
+def pack(plain_json, dst, password: str = None, kdf_spec: str = None):
+    """从明文 JSON 生成 v2 配置文件"""
+    password = _require_password(password)
+    data = json.loads(Path(plain_json).read_text(encoding="utf-8"))
+    kdf = new_kdf(kdf_spec)
+    write_indexed(dst, data, password, kdf)
+    print(f"✅ 已写入 {len(data)} 个配置项 -> {dst}（KDF: {kdf['name']}）")
+
+
+def bench(specs: list = None, rounds: int = 3) -> list[dict]:
+    """
+    测试各 KDF 参数的派生耗时（不走缓存），用于在 CI 冷启动预算内选择最强参数
+    返回 [{"kdf", "avg_ms", "max_ms"}]
+    """
+    rows = []
+    for spec in specs or BENCH_KDFS:
+        kdf = new_kdf(spec)
+        costs = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            _run_kdf(b"benchmark-password", kdf)
+            costs.append((time.perf_counter() - start) * 1000)
+        rows.append({"kdf": spec, "avg_ms": sum(costs) / len(costs), "max_ms": max(costs)})
+
+    print(f"{'KDF':<28}{'平均(ms)':>12}{'最大(ms)':>12}")
+    for r in rows:
+        print(f"{r['kdf']:<28}{r['avg_ms']:>12.1f}{r['max_ms']:>12.1f}")
+    return rows
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) >= 2 and argv[0] == "convert":
+        convert(argv[1], argv[2] if len(argv) > 2 else None)
+    elif len(argv) == 3 and argv[0] == "pack":
+        pack(argv[1], argv[2])
+    elif argv and argv[0] == "bench":
+        bench(argv[1:] or None)
+    else:
+        print("用法:\n"
+              "  python -m engine.config_format convert <config.enc> [输出文件]\n"
+              "  python -m engine.config_format pack <plain.json> <config.enc>\n"
+              "  python -m engine.config_format bench [kdf spec ...]\n"
+              "  环境变量 CONFIG_KDF 指定生成文件的 KDF，如 scrypt:n=65536,r=8,p=1")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
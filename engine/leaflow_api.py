@@ -0,0 +1,210 @@
+# engine/leaflow_api.py
+# -*- coding: utf-8 -*-
+import os
+import re
+import json
+import html
+import threading
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+from requests.adapters import HTTPAdapter
+
+from engine.main import session_from_cookies, perform_checkin, to_beijing_time
+from engine.state import STATE_DIR
+
+"""
+# ==================================================
+# Leaflow 纯 API 快速通道（不启动浏览器）
+用法：
+session = build_session(cookies, proxy_url="socks5://u:p@1.2.3.4:1080")
+try:
+    ok, data, msg = api_checkin(session, "user@example.com")
+except LoginExpired:
+    ...  # cookie 失效，回退到 Playwright 登录流程
+# ==================================================
+"""
+
+# LEAFLOW_URL / LEAFLOW_CHECKIN_URL 可指向本地替身（python -m engine.mock_sites）
+MAIN_SITE = (os.getenv("LEAFLOW_URL") or "https://leaflow.net").rstrip("/")
+BALANCE_URL = f"{MAIN_SITE}/balance"
+CHECKIN_URL = (os.getenv("LEAFLOW_CHECKIN_URL") or "https://checkin.leaflow.net").rstrip("/")
+# Inertia 资源版本兜底值，实际使用 InertiaVersionResolver 自动发现的版本
+INERTIA_VERSION = "1da8f358bacd543adbf104c91fa91267"
+
+INERTIA_HEADERS = {
+    "x-inertia": "true",
+    "x-requested-with": "XMLHttpRequest",
+    "Accept": "text/html, application/xhtml+xml",
+}
+
+BROWSER_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
+    "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
+}
+
+
+class LoginExpired(Exception):
+    """cookie 已失效（401/403 或被重定向到登录页），需要回退到浏览器登录"""
+
+
+# ==================================================
+# Inertia 版本自动发现
+# ==================================================
+_DATA_PAGE_RE = re.compile(r'data-page="([^"]+)"')
+
+
+def extract_inertia_version(page_html: str):
+    """从页面 HTML 的 data-page 属性中提取 Inertia version"""
+    m = _DATA_PAGE_RE.search(page_html or "")
+    if not m:
+        return None
+    try:
+        return json.loads(html.unescape(m.group(1))).get("version")
+    except (ValueError, AttributeError):
+        return None
+
+
+class InertiaVersionResolver:
+    """
+    Inertia 版本解析器
+    - get(): 内存 -> 磁盘缓存 -> INERTIA_VERSION 兜底
+    - update(): 发现新版本时写入内存与磁盘，供本次运行和下次运行复用
+    Leaflow 重新部署后接口返回 409，只需一次额外请求即可拿到新版本
+    """
+    def __init__(self, cache_file=None, default: str = INERTIA_VERSION):
+        self.cache_file = Path(cache_file) if cache_file else STATE_DIR / "leaflow_inertia.json"
+        self.default = default
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self) -> str:
+        with self._lock:
+            if self._version is None:
+                self._version = self._read_cache() or self.default
+            return self._version
+
+    def update(self, version: str):
+        if not version:
+            return
+        with self._lock:
+            if version == self._version:
+                return
+            print(f"🔄 [Inertia] 版本更新: {self._version} -> {version}")
+            self._version = version
+            try:
+                self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+                self.cache_file.write_text(json.dumps({"version": version}), encoding="utf-8")
+            except OSError as e:
+                print(f"⚠️ [Inertia] 版本缓存写入失败: {e}")
+
+    def _read_cache(self):
+        try:
+            return json.loads(self.cache_file.read_text(encoding="utf-8")).get("version")
+        except (OSError, ValueError):
+            return None
+
+    def resolve_from_conflict(self, session, resp, timeout: int = 30):
+        """处理 409：请求 X-Inertia-Location 的完整页面，解析并缓存新版本"""
+        location = resp.headers.get("X-Inertia-Location") or resp.url
+        print(f"🔎 [Inertia] 409 版本冲突，解析新版本: {location}")
+        page = session.get(location, timeout=timeout)
+        version = extract_inertia_version(page.text)
+        self.update(version)
+        return version
+
+
+inertia_versions = InertiaVersionResolver()
+
+
+def api_mode_enabled() -> bool:
+    """LEAFLOW_API_MODE=off 时关闭快速通道，默认开启"""
+    return os.getenv("LEAFLOW_API_MODE", "auto").strip().lower() not in ("off", "0", "false")
+
+
+def cookies_from_storage(storage):
+    """Playwright storage_state / cookies 列表 -> cookies 列表"""
+    if isinstance(storage, dict):
+        return storage.get("cookies") or []
+    if isinstance(storage, list):
+        return storage
+    return []
+
+
+def build_session(cookies, proxy_url=None, pool_size: int = 4):
+    """基于 cookies 构建复用连接池的 requests.Session"""
+    session = session_from_cookies(cookies, headers=BROWSER_HEADERS, proxy_url=proxy_url)
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def fetch_balance(session, timeout: int = 30) -> dict:
+    """
+    以 Inertia JSON 方式请求余额页
+    返回 Inertia page 对象（含 props），cookie 失效时抛出 LoginExpired
+    版本冲突（409）时自动解析新版本并重试一次
+    """
+    def _get(version):
+        headers = dict(INERTIA_HEADERS, **{"x-inertia-version": version})
+        r = session.get(BALANCE_URL, headers=headers, timeout=timeout, allow_redirects=False)
+        print(f"⬅️ [LeaflowAPI] balance HTTP {r.status_code}")
+        return r
+
+    resp = _get(inertia_versions.get())
+    if resp.status_code == 409:
+        version = inertia_versions.resolve_from_conflict(session, resp, timeout=timeout)
+        if version:
+            resp = _get(version)
+
+    if resp.status_code in (401, 403):
+        raise LoginExpired(f"HTTP {resp.status_code}")
+    if resp.status_code in (301, 302, 303) and "login" in resp.headers.get("Location", "").lower():
+        raise LoginExpired("重定向到登录页")
+    resp.raise_for_status()
+
+    try:
+        return resp.json()
+    except ValueError:
+        raise RuntimeError("余额接口未返回 JSON")
+
+
+def is_checked_today(data: dict) -> bool:
+    """根据余额记录判断北京时间今天是否已有签到奖励"""
+    records = data.get("props", {}).get("records", {}).get("data", [])
+    today_str = datetime.now(timezone(timedelta(hours=8))).strftime("%Y-%m-%d")
+    for r in records:
+        remark = r.get("remark", "")
+        if "奖励" not in remark and "签到" not in remark:
+            continue
+        bj_dt = to_beijing_time(r.get("created_at"))
+        if bj_dt and bj_dt.strftime("%Y-%m-%d") == today_str:
+            return True
+    return False
+
+
+def api_checkin(session, account_name: str):
+    """
+    纯 API 签到：查询余额 -> 未签到则提交签到 -> 再次查询确认
+    返回 (ok, balance_data, msg)
+    cookie 失效时抛出 LoginExpired，由调用方回退到浏览器流程
+    """
+    data = fetch_balance(session)
+    if is_checked_today(data):
+        print(f"✅ [LeaflowAPI] {account_name} 今日已签到")
+        return True, data, "今日已签到（API）"
+
+    ok, msg = perform_checkin(
+        session=session,
+        account_name=account_name,
+        checkin_url=CHECKIN_URL,
+        main_site=MAIN_SITE,
+    )
+
+    data = fetch_balance(session)
+    if is_checked_today(data):
+        return True, data, f"{msg}（API）"
+
+    print(f"⚠️ [LeaflowAPI] {account_name} 签到后仍未确认: {msg}")
+    return False, data, msg
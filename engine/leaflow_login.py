@@ -1,51 +1,53 @@
 import time
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+import threading
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 
 from engine.main import ConfigReader
 from engine.notify import TelegramNotifier
+from engine.browser import get_browser_manager, DEFAULT_BLOCK_PROFILE
+from engine.leaflow_api import MAIN_SITE
 
-LOGIN_URL = "https://leaflow.net/login"
-DASHBOARD_URL = "https://leaflow.net/dashboard"
+LOGIN_URL = f"{MAIN_SITE}/login"
+DASHBOARD_URL = f"{MAIN_SITE}/dashboard"
+
+# 签到页保持完整加载，其余页面拦截图片 / 字体 / 统计脚本
+BLOCK_PROFILE = DEFAULT_BLOCK_PROFILE.extend(allow_hosts=["checkin.leaflow.net"])
 
 step = 0  # 全局步骤计数
 # 初始化
 _notifier = None
 config = None
+# 多账号并发时保护全局计数与通知器初始化
+_lock = threading.Lock()
 
 def get_notifier():
     global _notifier,config
-    if config is None:
-        config = ConfigReader()
-    if _notifier is None:
-        _notifier = TelegramNotifier(config)
+    with _lock:
+        if config is None:
+            config = ConfigReader()
+        if _notifier is None:
+            _notifier = TelegramNotifier(config)
     return _notifier
 
 # ==================================================
-# 启动浏览器
+# 启动浏览器（共享 Chromium，每个账号独立 Context）
 # ==================================================
 def open_browser(proxy_url=None):
-    print("🚀 启动 Playwright 浏览器")
-    pw = sync_playwright().start()
-
-    proxy_config = {"server": proxy_url} if proxy_url else None
-    print(f"🌐 使用代理: {proxy_url}" if proxy_url else "🌐 未使用代理")
-
-    browser = pw.chromium.launch(
-        headless=True,
-        args=["--no-sandbox", "--disable-dev-shm-usage"],
-        proxy=proxy_config
-    )
-
-    ctx = browser.new_context(proxy=proxy_config)
+    """
+    返回 (ctx, page)
+    账号结束时只需 ctx.close()，浏览器由 engine.browser 统一回收
+    """
+    print("🚀 获取 Playwright 浏览器 Context")
+    ctx = get_browser_manager().new_context(proxy_url=proxy_url, block_profile=BLOCK_PROFILE)
     page = ctx.new_page()
 
-    print("✅ 浏览器启动完成")
-    return pw, browser, ctx, page
+    print("✅ 浏览器 Context 就绪")
+    return ctx, page
 
 # ================= 获取余额和已消费金额 =================
 def get_balance_info(page):
     # 访问页面
-    page.goto("https://leaflow.net/balance")
+    page.goto(f"{MAIN_SITE}/balance")
     
     # 1. 定位并获取“当前余额”
     # 使用 title 属性定位是最精确的
@@ -88,8 +90,9 @@ def cookies_ok(page):
 # ==================================================
 def take_shot(page, name):
     global step
-    step += 1
-    filename = f"{step:02d}_{name}.png"
+    with _lock:
+        step += 1
+        filename = f"{step:02d}_{name}.png"
 
     try:
         page.screenshot(path=filename, full_page=True)
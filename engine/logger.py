@@ -0,0 +1,198 @@
+# engine/logger.py
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+from collections import deque
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from engine.safe_print import desensitize_text, mask_account
+from engine.state import STATE_DIR
+
+"""
+# ==================================================
+# 结构化日志（后台线程输出，调用方不阻塞）
+用法：
+logger = get_logger("leaflow")
+acc = logger.bind(account="a@b.com")
+acc.log("开始登录", "STEP")        # STEP 同时切换当前步骤
+acc.log("登录成功", "SUCCESS")
+acc.lines()                        # 该账号最近的日志（环形缓冲，用于汇总）
+
+# 每条记录：ts / task / account / step / level / msg / elapsed（距 logger 创建秒数）
+# 输出：控制台（带图标）+ JSON Lines（LOG_JSONL 指定，默认 .state/logs/run.jsonl，滚动保留）
+# 脱敏在 logger 过滤器中统一执行一次（msg 与 account 字段），所有输出共用脱敏后的文本
+# 控制台 / JSON 由后台线程写出；环形缓冲同步追加，lines() 总能拿到最新记录
+# LOG_JSONL=off 关闭 JSON 输出，LOG_BUFFER 设置环形缓冲条数（默认 2000）
+# ==================================================
+"""
+
+ICONS = {"INFO": "ℹ️", "SUCCESS": "✅", "ERROR": "❌", "WARN": "⚠️", "STEP": "🔹", "DEBUG": "🔸"}
+LEVELS = {"DEBUG": logging.DEBUG, "INFO": logging.INFO, "STEP": logging.INFO, "SUCCESS": logging.INFO,
+          "WARN": logging.WARNING, "ERROR": logging.ERROR}
+LOGGER_NAME = "auto_checkin"
+BUFFER_SIZE = int(os.getenv("LOG_BUFFER") or 2000)
+
+
+class RedactFilter(logging.Filter):
+    """分发到各 handler 前脱敏一次（msg + account），并把 args 合并进 msg，避免后台线程再次格式化"""
+    def filter(self, record):
+        record.msg = desensitize_text(record.getMessage())
+        record.args = None
+        if getattr(record, "account", None):
+            record.account = mask_account(record.account)
+        return True
+
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record):
+        return f"{ICONS.get(getattr(record, 'tag', ''), '•')} {record.msg}"
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps({
+            "ts": round(record.created, 3),
+            "task": getattr(record, "task", None),
+            "account": getattr(record, "account", None),
+            "step": getattr(record, "step", None),
+            "level": getattr(record, "tag", record.levelname),
+            "msg": record.msg,
+            "elapsed": getattr(record, "elapsed", None),
+        }, ensure_ascii=False)
+
+
+class RingBufferHandler(logging.Handler):
+    """保留最近 capacity 条记录，供任务汇总"""
+    def __init__(self, capacity: int = BUFFER_SIZE):
+        super().__init__()
+        self.records = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def snapshot(self) -> list:
+        with self._lock:
+            return list(self.records)
+
+
+_setup_lock = threading.Lock()
+_listener = None
+_ring = None
+
+
+def _jsonl_path():
+    raw = os.getenv("LOG_JSONL", "").strip()
+    if raw.lower() in ("off", "0", "false"):
+        return None
+    return raw or str(STATE_DIR / "logs" / "run.jsonl")
+
+
+def _setup():
+    """首次使用时挂载 QueueHandler + 后台 QueueListener + 环形缓冲"""
+    global _listener, _ring
+    with _setup_lock:
+        if _ring is not None:
+            return
+        console = logging.StreamHandler(sys.stdout)
+        console.setFormatter(ConsoleFormatter())
+        _ring = RingBufferHandler()
+        handlers = [console]
+
+        path = _jsonl_path()
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                jsonl = RotatingFileHandler(path, maxBytes=5 * 1024 * 1024, backupCount=2, encoding="utf-8")
+                jsonl.setFormatter(JsonFormatter())
+                handlers.append(jsonl)
+            except OSError as e:
+                sys.stdout.write(f"⚠️ JSON 日志文件不可用: {e}\n")
+
+        log_queue = queue.SimpleQueue()
+        base = logging.getLogger(LOGGER_NAME)
+        base.setLevel(logging.DEBUG)
+        base.propagate = False
+        base.addFilter(RedactFilter())
+        base.addHandler(QueueHandler(log_queue))
+        base.addHandler(_ring)
+
+        _listener = QueueListener(log_queue, *handlers, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """停止后台线程并输出剩余日志（进程退出时自动调用）"""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+class TaskLogger:
+    """
+    任务日志
+    - bind(account=..., step=...) 派生子 logger，共享起始时间
+    - log(msg, level): level 为 INFO / STEP / SUCCESS / WARN / ERROR / DEBUG
+    """
+    def __init__(self, task: str, account: str = None, step: str = None, started: float = None):
+        _setup()
+        self.task = task
+        self.account = account
+        self.step = step
+        self.started = started or time.monotonic()
+        self._logger = logging.getLogger(LOGGER_NAME)
+
+    def bind(self, **fields) -> "TaskLogger":
+        return TaskLogger(
+            self.task,
+            account=fields.get("account", self.account),
+            step=fields.get("step", self.step),
+            started=self.started,
+        )
+
+    def log(self, msg, level: str = "INFO"):
+        level = level.upper()
+        if level == "STEP":
+            self.step = str(msg)
+        self._logger.log(LEVELS.get(level, logging.INFO), "%s", msg, extra={
+            "tag": level,
+            "task": self.task,
+            "account": self.account,
+            "step": self.step,
+            "elapsed": round(time.monotonic() - self.started, 3),
+        })
+
+    def info(self, msg):
+        self.log(msg, "INFO")
+
+    def warn(self, msg):
+        self.log(msg, "WARN")
+
+    def error(self, msg):
+        self.log(msg, "ERROR")
+
+    def lines(self, limit: int = None) -> list[str]:
+        """环形缓冲中属于当前任务（及账号）的日志行"""
+        # 缓冲中的 account 已脱敏，按同样规则比较
+        account = mask_account(self.account)
+        records = [
+            r for r in (_ring.snapshot() if _ring else [])
+            if r.task == self.task and (self.account is None or r.account == account)
+        ]
+        if limit:
+            records = records[-limit:]
+        return [f"{ICONS.get(r.tag, '•')} {r.msg}" for r in records]
+
+
+def get_logger(task: str, **fields) -> TaskLogger:
+    return TaskLogger(task, **fields)
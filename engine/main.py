@@ -1,15 +1,24 @@
 # -*- coding: utf-8 -*-
 import re
 import os
-import base64
 import requests
-from nacl import public, encoding
 import json
-from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+import threading
 from hashlib import sha256
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
-from urllib.parse import quote
+
+from engine.state import get_state_store
+from engine.secret_backends import (
+    GitHubSecretsClient,
+    get_secrets_client,
+    secret_backend_name,
+    serialize_secret,
+    secret_digest,
+    read_secret_env,
+)
+from engine.proxy_probe import build_proxy_url, probe_proxy
+from engine.config_format import is_indexed, IndexedConfig, decrypt_legacy, derive_key
 
 """
 # ==================================================
@@ -24,14 +33,23 @@ print(api_key)
 # 也可以自定义文件和密码
 reader2 = ConfigReader(password="mysecret", config_file="/path/to/config.enc")
 value = reader2.get_value("ACCOUNT_INFO")
+
+# 同一进程内多次 ConfigReader() 只解密一次（按 文件路径 + mtime + 密码摘要 缓存）
+# 配置文件更新后 mtime 变化会自动重新解密，也可手动 ConfigReader.clear_cache()
+# 支持 v2 索引格式（engine/config_format.py），get_value 只解密所需配置项
 # ==================================================
 """
+_config_cache = {}
+_config_lock = threading.Lock()
+
+
 class ConfigReader:
     """
     加密配置文件读取器
     功能：
     - 使用 CONFIG_PASSWORD 解密 config.enc
     - 提供 get_value(key) 获取配置项
+    - 进程级缓存：相同文件 / 密码只解密一次
     """
     def __init__(self, password: str = None, config_file: str = None):
         # 1️⃣ 密码
@@ -45,41 +63,58 @@ class ConfigReader:
         if not self.config_file.exists():
             raise FileNotFoundError(f"❌ 找不到配置文件: {self.config_file}")
 
-        # 3️⃣ 解密配置
-        encrypted_content = self.config_file.read_text(encoding="utf-8").strip()
-        try:
-            self.config = self._decrypt_json(encrypted_content)
-            print("✅ 配置解密成功")
-        except ValueError as e:
-            print(f"❌ 配置解密失败: {e}")
-            raise
+        # 3️⃣ 解密配置（命中缓存则直接复用）
+        self.config = self._load_cached()
 
     # ===============================
-    # 私有方法：派生 AES key
+    # 私有方法：进程级解密缓存
+    # ===============================
+    def _cache_key(self) -> tuple:
+        path = self.config_file.resolve()
+        return (str(path), path.stat().st_mtime_ns, sha256(self.password.encode()).hexdigest())
+
+    def _load_cached(self):
+        key = self._cache_key()
+        with _config_lock:
+            config = _config_cache.get(key)
+            if config is not None:
+                return config
+
+            try:
+                if is_indexed(self.config_file):
+                    # v2 索引格式：只校验密码并读取索引，配置项按需解密
+                    config = IndexedConfig(self.config_file, self.password)
+                    print(f"✅ 配置解密成功（索引格式 / {config.kdf['name']}，{len(config)} 项按需解密）")
+                else:
+                    encrypted_content = self.config_file.read_text(encoding="utf-8").strip()
+                    config = self._decrypt_json(encrypted_content)
+                    print("✅ 配置解密成功")
+            except ValueError as e:
+                print(f"❌ 配置解密失败: {e}")
+                raise
+
+            # 同一文件旧 mtime / 旧密码的缓存作废
+            for old in [k for k in _config_cache if k[0] == key[0]]:
+                del _config_cache[old]
+            _config_cache[key] = config
+            return config
+
+    @staticmethod
+    def clear_cache():
+        with _config_lock:
+            _config_cache.clear()
+
+    # ===============================
+    # 私有方法：派生 AES key（v1 格式固定 sha256，结果进程内缓存）
     # ===============================
     def _derive_key(self) -> bytes:
-        return sha256(self.password.encode()).digest()
+        return derive_key(self.password)
 
     # ===============================
     # 私有方法：解密 AES-GCM + base64 JSON
     # ===============================
     def _decrypt_json(self, encrypted_str: str) -> dict:
-        try:
-            key = self._derive_key()
-            raw = base64.b64decode(encrypted_str)
-
-            if len(raw) < 13:
-                raise ValueError("加密数据格式错误")
-
-            nonce = raw[:12]
-            ciphertext = raw[12:]
-
-            aesgcm = AESGCM(key)
-            plaintext = aesgcm.decrypt(nonce, ciphertext, None)
-
-            return json.loads(plaintext.decode("utf-8"))
-        except Exception as e:
-            raise ValueError(f"解密失败: {e}")
+        return decrypt_legacy(encrypted_str, self._derive_key())
 
     # ===============================
     # 公有方法：获取配置项
@@ -107,8 +142,48 @@ secret.update([{"email": "a@b.com", "token": "123"}])
 # 读取
 cookies = secret.load()
 print(cookies)
+# 同一仓库 + token 的所有 SecretUpdater 共享一个 GitHubSecretsClient
+# 超过 45 KB 的值自动分片为 NAME_0..NAME_n，NAME 中保存清单，load() 自动合并
+# 内容未变化时跳过回写：update 返回 "unchanged"，已写入返回 "updated"
+# 对比基准为 load() 读到的值，或本地状态库中记录的上次写入摘要
+# SECRET_BACKEND=local / file 切换到本地后端（engine/secret_backends.py），load() 从同一后端读取
  ==================================================
 """
+# ==================================================
+# 大 Secret 分片：NAME 存清单，内容分段写入 NAME_0..NAME_n
+# ==================================================
+# 单片上限，低于 GitHub 48 KB 限制并为加密膨胀留余量
+SHARD_SIZE = 45 * 1024
+SHARD_KEY = "__shards__"
+# 分片数上限，workflow 中只显式传入 NAME_0..NAME_{MAX_SHARDS-1}
+MAX_SHARDS = 4
+
+
+def split_shards(data: str, size: int = SHARD_SIZE) -> list:
+    """按 UTF-8 字节数切片，保证每片不超过 size 字节"""
+    shards, current, current_size = [], [], 0
+    for ch in data:
+        n = len(ch.encode("utf-8"))
+        if current_size + n > size:
+            shards.append("".join(current))
+            current, current_size = [], 0
+        current.append(ch)
+        current_size += n
+    if current:
+        shards.append("".join(current))
+    return shards
+
+
+def parse_manifest(raw: str):
+    try:
+        data = json.loads(raw)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if isinstance(data, dict) and isinstance(data.get(SHARD_KEY), int) and len(data) == 2:
+        return data
+    return None
+
+
 class SecretUpdater:
     """
     GitHub Secret 更新器
@@ -144,74 +219,106 @@ class SecretUpdater:
             # fallback 环境变量
             self.token = os.getenv("REPO_TOKEN")
 
+        if not self.token and secret_backend_name() != "github":
+            # 本地后端不校验 token
+            self.token = "local"
         if not self.token:
             raise RuntimeError("❌ 未找到有效 GitHub token")
 
+        self.client = get_secrets_client(self.repo, self.token)
+        self.status = None
+        self._shards = None
         print(f"🔐 初始化 SecretUpdater: {self.name}, 仓库 {self.repo}")
 
     # ================================
     # 回写 Secret
     # ================================
-    def update(self, value):
+    def update(self, value, force: bool = False) -> str:
+        """
+        回写 Secret，返回 "updated" 或 "unchanged"（内容未变化时跳过）
+        超过 SHARD_SIZE 时自动分片：先写 NAME_0..NAME_n，再写 NAME 清单，最后删除多余旧分片
+        """
         print("📝 准备回写 GitHub Secret")
-
-        headers = {
-            "Authorization": f"Bearer {self.token}",
-            "Accept": "application/vnd.github+json",
-        }
-
-        # 获取公钥
-        print(f"🌐 获取仓库公钥: {self.repo}")
-        r = requests.get(
-            f"https://api.github.com/repos/{self.repo}/actions/secrets/public-key",
-            headers=headers,
-            timeout=30,
-        )
-        r.raise_for_status()
-        key = r.json()
-
-        # 支持字符串或 dict/list
-        if isinstance(value, (dict, list)):
-            value_to_store = json.dumps(value)
-        else:
-            value_to_store = str(value)
-
-        # 加密
-        print("🔑 加密 Secret")
-        pk = public.PublicKey(key["key"].encode(), encoding.Base64Encoder())
-        encrypted = public.SealedBox(pk).encrypt(value_to_store.encode())
-
-        # 提交
-        print(f"📤 提交 Secret: {self.name}")
-        r = requests.put(
-            f"https://api.github.com/repos/{self.repo}/actions/secrets/{self.name}",
-            headers=headers,
-            json={
-                "encrypted_value": base64.b64encode(encrypted).decode(),
-                "key_id": key["key_id"],
-            },
-            timeout=30,
+        data = serialize_secret(value)
+        if len(data.encode("utf-8")) <= SHARD_SIZE:
+            self.status = self.client.put(self.name, data, force=force)
+            self._drop_shards(0)
+            return self.status
+
+        parts = split_shards(data)
+        if len(parts) > MAX_SHARDS:
+            raise RuntimeError(
+                f"❌ Secret {self.name} 需要 {len(parts)} 片，超过上限 {MAX_SHARDS}（workflow 只传入 {self.name}_0..{MAX_SHARDS - 1}）"
+            )
+        print(f"🧩 Secret {self.name} 大小 {len(data) / 1024:.1f} KB，分为 {len(parts)} 片")
+        # 任一分片失败时 update_many 抛出异常，清单不会被改写
+        results = self.client.update_many(
+            {f"{self.name}_{i}": part for i, part in enumerate(parts)}, force=force
         )
 
-        if r.status_code not in (201, 204):
-            raise RuntimeError(f"❌ Secret 回写失败 HTTP {r.status_code}: {r.text}")
-
-        print("✅ Secret 回写成功")
-        return True
+        manifest = json.dumps({SHARD_KEY: len(parts), "digest": secret_digest(data)})
+        statuses = list(results.values()) + [self.client.put(self.name, manifest, force=force)]
+        self._drop_shards(len(parts))
+        self.status = "unchanged" if all(s == "unchanged" for s in statuses) else "updated"
+        return self.status
+
+    def _shard_kv(self) -> str:
+        return f"secret_shards:{self.client.kind}:{self.repo}:{self.name}"
+
+    def _drop_shards(self, keep: int):
+        """删除编号 >= keep 的旧分片"""
+        old = self._shards
+        if old is None:
+            old = int(get_state_store().get_kv(self._shard_kv()) or 0)
+        for i in range(keep, old):
+            self.client.delete(f"{self.name}_{i}")
+        if old != keep:
+            get_state_store().set_kv(self._shard_kv(), str(keep))
+        self._shards = keep
 
     # ================================
     # 从环境变量加载 Secret
     # ================================
     def load(self):
-        raw = os.getenv(self.name)
+        raw = self.client.read(self.name)
         if not raw:
             print("ℹ️ 未检测到 Secret，首次运行")
             return None
 
+        # 记录当前内容摘要，update 时内容未变化则跳过
+        self.client.remember(self.name, secret_digest(raw))
+
+        manifest = parse_manifest(raw)
+        if manifest:
+            raw = self._load_shards(manifest)
+            if raw is None:
+                return None
+        else:
+            self._shards = 0
+
         try:
             return json.loads(raw)
         except (json.JSONDecodeError, TypeError):
             return raw
+
+    def _load_shards(self, manifest: dict):
+        count = manifest[SHARD_KEY]
+        parts = []
+        for i in range(count):
+            part = self.client.read(f"{self.name}_{i}")
+            if part is None:
+                print(f"❌ 缺少分片 {self.name}_{i}，请在 workflow env 中传入该分片")
+                return None
+            self.client.remember(f"{self.name}_{i}", secret_digest(part))
+            parts.append(part)
+
+        raw = "".join(parts)
+        if secret_digest(raw) != manifest.get("digest"):
+            print(f"❌ Secret {self.name} 分片校验失败（可能写入未完成）")
+            return None
+        self._shards = count
+        print(f"🧩 已合并 {count} 个分片: {self.name}")
+        return raw
 # ==================================================
 # Session 工厂
 # ==================================================
@@ -522,61 +629,14 @@ def print_dict_tree(d, prefix=""):
                     print_dict_tree(item, sub_prefix)
 def test_proxy(proxy_info, timeout=5):
     """
-    测试代理是否可用
+    测试代理是否可用（并发探测全部检测地址，本次运行内缓存）
     返回: proxy_url / None
     """
-    proxy_url = None
-
-    try:
-        if proxy_info.get("username") and proxy_info.get("password"):
-            auth_part = (
-                f"{quote(str(proxy_info['username']), safe='')}:"
-                f"{quote(str(proxy_info['password']), safe='')}@"
-            )
-        else:
-            auth_part = ""
-
-        proxy_url = (
-            f"{proxy_info['type']}://"
-            f"{auth_part}"
-            f"{proxy_info['server']}:{proxy_info['port']}"
-        )
-
-        proxies = {
-            "http": proxy_url,
-            "https": proxy_url
-        }
-
-        # 备用检测地址
-        urls = [
-            "https://httpbin.io/ip",
-            "https://api.ipify.org?format=json",
-            "https://ipinfo.io/json"
-        ]
-
-        for url in urls:
-            try:
-                test_res = requests.get(
-                    url,
-                    proxies=proxies,
-                    timeout=timeout,
-                    headers={"User-Agent": "Mozilla/5.0"}
-                )
-
-                if test_res.status_code == 200:
-                    print(f"✅ 代理可用: {proxy_info['server']}")
-                    print(f"   检测地址: {url}")
-                    return proxy_url
-
-            except requests.RequestException:
-                continue
-
-        print(f"❌ 代理不可用: {proxy_url}")
-        return None
-
-    except Exception as e:
-        print(f"❌ 代理测试异常: {proxy_url}, 错误: {e}")
+    if not isinstance(proxy_info, dict):
+        print(f"❌ 代理配置无效: {proxy_info!r}")
         return None
+    result = probe_proxy(proxy_info, timeout)
+    return result["proxy_url"] if result["ok"] else None
 # 转换到东八区 (北京时间)
 def to_beijing_time(utc_str):
     if not utc_str or "无记录" in utc_str:
@@ -0,0 +1,795 @@
+# engine/mock_sites.py
+# -*- coding: utf-8 -*-
+import os
+import re
+import sys
+import json
+import time
+import random
+import secrets
+import argparse
+import tempfile
+import subprocess
+import threading
+from pathlib import Path
+from html import escape
+from datetime import datetime, timedelta, timezone
+from http.cookies import SimpleCookie
+from urllib.parse import urlsplit, parse_qs, unquote
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from engine.secret_server import start_secret_server
+from engine.state import StateStore, set_state_store
+
+"""
+# ==================================================
+# 本地站点替身（离线调试 / 性能基准）
+# 每个站点一个 HTTP 服务，接口与脚本实际调用的一致：
+#   leaflow     /login /dashboard /balance(Inertia) /api/workspaces/current/all
+#   checkin     / (签到页，POST 签到) /api/checkin /checkin
+#   digitalplat /_panel_api/api/domains  /_panel_api/api/domains/{domain}/renew
+#   fakerclaw   /console /api/user/checkin /api/user/self /api/log/self
+#   telegram    /bot{token}/sendMessage|sendPhoto|sendMediaGroup
+#   github      复用 engine/secret_server（SECRET_BACKEND=local）
+# 所有站点支持：
+#   POST /_admin/faults  {"latency_ms", "jitter_ms", "error_rate", "error_status"}  运行时调整故障注入
+#   GET  /_admin/stats   请求数 / 注入错误数 / 各路由耗时
+用法：
+python -m engine.mock_sites serve --latency 50 --error-rate 0.05   # 打印需要导出的环境变量
+python -m engine.mock_sites run -- python -u leaflow/leaflow_check.py
+python -m engine.mock_sites bench --rounds 5 --latency 30
+
+with MockSuite(latency_ms=30) as suite:   # 进入时写入 LEAFLOW_URL 等环境变量，退出时恢复
+    ...
+
+# 替身账号：任意用户名 / 密码均可登录；telegram 中以 "bad" 开头的 token 返回 401
+# 状态库隔离：套件进入时用临时目录下的 StateStore(path=...) 替换进程级实例，退出时恢复；
+# 子进程（run 子命令）通过导出的 STATE_DIR 指向同一临时目录
+# ==================================================
+"""
+
+BJ = timezone(timedelta(hours=8))
+INERTIA_VERSION = "mock-inertia-v1"
+
+
+class Faults:
+    """故障注入：固定延迟 + 随机抖动 + 按比例返回错误状态码"""
+    def __init__(self, latency_ms: int = 0, jitter_ms: int = 0, error_rate: float = 0.0,
+                 error_status: int = 503, seed=None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def update(self, **values):
+        with self._lock:
+            for k in ("latency_ms", "jitter_ms", "error_rate", "error_status"):
+                if k in values:
+                    setattr(self, k, type(getattr(self, k))(values[k]))
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in ("latency_ms", "jitter_ms", "error_rate", "error_status")}
+
+    def apply(self):
+        """按配置等待，需要注入错误时返回状态码，否则返回 None"""
+        with self._lock:
+            delay = self.latency_ms + (self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0)
+            failed = self.error_rate and self._random.random() < self.error_rate
+        if delay:
+            time.sleep(delay / 1000)
+        return self.error_status if failed else None
+
+
+class Request:
+    """handler 的简化视图，站点路由函数只依赖它"""
+    def __init__(self, handler, method: str, match=None):
+        parts = urlsplit(handler.path)
+        self.method = method
+        self.path = parts.path
+        self.query = {k: v[-1] for k, v in parse_qs(parts.query).items()}
+        self.headers = handler.headers
+        self.match = match
+        length = int(handler.headers.get("Content-Length") or 0)
+        self.body = handler.rfile.read(length) if length else b""
+        cookie = SimpleCookie()
+        cookie.load(handler.headers.get("Cookie") or "")
+        self.cookies = {k: m.value for k, m in cookie.items()}
+
+    def form(self) -> dict:
+        ctype = self.headers.get("Content-Type") or ""
+        if "application/json" in ctype:
+            return self.json()
+        if "multipart/form-data" in ctype:
+            # 只解析普通字段，文件内容忽略
+            fields = {}
+            for name, value in re.findall(rb'name="([^"]+)"\r\n\r\n(.*?)\r\n--', self.body, re.S):
+                fields[name.decode()] = value.decode(errors="replace")
+            return fields
+        return {k: v[-1] for k, v in parse_qs(self.body.decode(errors="replace")).items()}
+
+    def json(self) -> dict:
+        try:
+            return json.loads(self.body or b"{}")
+        except ValueError:
+            return {}
+
+
+class Response:
+    def __init__(self, status: int = 200, body=b"", content_type: str = "application/json", headers=None):
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.status = status
+        self.body = body
+        self.headers = dict(headers or {})
+        if body:
+            self.headers.setdefault("Content-Type", content_type)
+
+    @classmethod
+    def html(cls, text: str, status: int = 200, headers=None):
+        return cls(status, text, "text/html; charset=utf-8", headers)
+
+    @classmethod
+    def redirect(cls, location: str, headers=None):
+        return cls(302, b"", headers=dict(headers or {}, Location=location))
+
+
+class MockSite:
+    """
+    站点替身基类
+    - routes: [(方法, 路径正则, 方法名)]，子类声明
+    - 每个请求先经过 Faults，再分派到路由
+    """
+    name = "site"
+    routes = []
+
+    def __init__(self, faults: Faults = None):
+        self.faults = faults or Faults()
+        self.url = None
+        self._compiled = [(m, re.compile(p + "$"), fn) for m, p, fn in self.routes]
+        self._stats_lock = threading.Lock()
+        self.stats = {"requests": 0, "injected_errors": 0, "routes": {}}
+
+    def _count(self, route: str, cost_ms: float, injected: bool):
+        with self._stats_lock:
+            self.stats["requests"] += 1
+            self.stats["injected_errors"] += int(injected)
+            r = self.stats["routes"].setdefault(route, {"count": 0, "total_ms": 0.0})
+            r["count"] += 1
+            r["total_ms"] = round(r["total_ms"] + cost_ms, 1)
+
+    def _admin(self, req: Request) -> Response:
+        if req.path == "/_admin/faults" and req.method == "POST":
+            self.faults.update(**req.json())
+            return Response(200, self.faults.as_dict())
+        if req.path == "/_admin/stats":
+            with self._stats_lock:
+                return Response(200, dict(self.stats, faults=self.faults.as_dict()))
+        return Response(404, {"message": "Not Found"})
+
+    def dispatch(self, handler, method: str) -> Response:
+        # 先读完请求体，注入错误时也不会破坏 keep-alive 连接
+        req = Request(handler, method, None)
+        if req.path.startswith("/_admin/"):
+            return self._admin(req)
+        if method == "OPTIONS":
+            return Response(204)
+
+        start = time.perf_counter()
+        status = self.faults.apply()
+        for m, regex, fn in self._compiled:
+            req.match = regex.match(req.path)
+            if m == method and req.match:
+                route = fn
+                resp = Response(status, {"message": "injected failure"}) if status else getattr(self, fn)(req)
+                break
+        else:
+            route, resp = "not_found", Response(404, {"message": "Not Found"})
+        self._count(route, (time.perf_counter() - start) * 1000, bool(status))
+        return resp
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    site: MockSite = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _handle(self, method: str):
+        try:
+            resp = self.site.dispatch(self, method)
+        except Exception as e:
+            resp = Response(500, {"message": f"mock error: {e}"})
+        self.send_response(resp.status)
+        # 浏览器内 fetch 跨域访问替身接口
+        self.send_header("Access-Control-Allow-Origin", self.headers.get("Origin") or "*")
+        self.send_header("Access-Control-Allow-Credentials", "true")
+        self.send_header("Access-Control-Allow-Headers", "*")
+        self.send_header("Access-Control-Allow-Methods", "GET, POST, PUT, DELETE, OPTIONS")
+        for k, v in resp.headers.items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(resp.body)))
+        self.end_headers()
+        if resp.body and method != "HEAD":
+            self.wfile.write(resp.body)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+    def do_OPTIONS(self):
+        self._handle("OPTIONS")
+
+
+def start_site(site: MockSite, host: str = "127.0.0.1", port: int = 0):
+    """后台线程启动站点替身，返回 server（server.url 为访问地址）"""
+    handler = type(f"{type(site).__name__}Handler", (MockHandler,), {"site": site})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    site.url = server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name=f"mock_{site.name}", daemon=True).start()
+    print(f"🧪 {site.name} 替身已启动: {server.url}")
+    return server
+
+
+# ==================================================
+# Leaflow
+# ==================================================
+class LeaflowState:
+    """Leaflow 主站与签到站共享的账号状态"""
+    def __init__(self, reward: float = 1.0):
+        self.reward = reward
+        self.lock = threading.Lock()
+        self.sessions = {}        # session -> 用户名
+        self.records = {}         # 用户名 -> [签到记录]
+
+    def login(self, user: str) -> str:
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.sessions[token] = user
+            self.records.setdefault(user, [])
+        return token
+
+    def user(self, req: Request):
+        with self.lock:
+            return self.sessions.get(req.cookies.get("leaflow_session"))
+
+    def checked_today(self, user: str) -> bool:
+        today = datetime.now(BJ).strftime("%Y-%m-%d")
+        with self.lock:
+            return any(r["_day"] == today for r in self.records.get(user, []))
+
+    def checkin(self, user: str) -> bool:
+        """返回 False 表示今日已签到"""
+        if self.checked_today(user):
+            return False
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            self.records.setdefault(user, []).insert(0, {
+                "remark": "每日签到奖励",
+                "amount": f"{self.reward:.2f}",
+                "created_at": now.strftime("%Y-%m-%dT%H:%M:%S.000000Z"),
+                "_day": now.astimezone(BJ).strftime("%Y-%m-%d"),
+            })
+        return True
+
+    def page(self, user: str, url: str) -> dict:
+        with self.lock:
+            records = [{k: v for k, v in r.items() if not k.startswith("_")} for r in self.records.get(user, [])]
+        earned = sum(float(r["amount"]) for r in records)
+        return {
+            "component": "Balance/Index",
+            "url": url,
+            "version": INERTIA_VERSION,
+            "props": {
+                "auth": {"user": {"name": user.split("@")[0]}},
+                "balance": f"{10 + earned:.2f}",
+                "totalConsumed": "0.00",
+                "records": {"data": records},
+            },
+        }
+
+
+def _data_page_html(page: dict, body: str = "") -> str:
+    data = escape(json.dumps(page, ensure_ascii=False), quote=True)
+    return f'<!DOCTYPE html><html><body><div id="app" data-page="{data}"></div>{body}</body></html>'
+
+
+class LeaflowSite(MockSite):
+    name = "leaflow"
+    routes = [
+        ("GET", r"/login", "login_page"),
+        ("POST", r"/login", "login"),
+        ("GET", r"/dashboard", "dashboard"),
+        ("GET", r"/balance", "balance"),
+        ("GET", r"/api/workspaces/current/all", "workspaces"),
+        ("GET", r"/", "dashboard"),
+    ]
+
+    def __init__(self, state: LeaflowState, faults: Faults = None):
+        super().__init__(faults)
+        self.state = state
+
+    def login_page(self, req):
+        return Response.html(
+            '<form method="post" action="/login">'
+            '<input id="account" name="account"><input id="password" name="password" type="password">'
+            '<label><input type="checkbox" name="remember" aria-label="保持登录状态">保持登录状态</label>'
+            '<button type="submit">登录</button></form>'
+        )
+
+    def login(self, req):
+        user = req.form().get("account")
+        if not user:
+            return Response.redirect("/login")
+        token = self.state.login(user)
+        return Response.redirect("/dashboard", {"Set-Cookie": f"leaflow_session={token}; Path=/; HttpOnly"})
+
+    def dashboard(self, req):
+        user = self.state.user(req)
+        if not user:
+            return Response.redirect("/login")
+        return Response.html(_data_page_html(self.state.page(user, "/dashboard"), "<h1>Dashboard</h1>"))
+
+    def workspaces(self, req):
+        if not self.state.user(req):
+            return Response(401, {"message": "Unauthenticated."})
+        return Response(200, {"data": []})
+
+    def balance(self, req):
+        user = self.state.user(req)
+        inertia = req.headers.get("x-inertia")
+        if not user:
+            if inertia:
+                return Response(401, {"message": "Unauthenticated."})
+            return Response.redirect("/login")
+        page = self.state.page(user, "/balance")
+        if not inertia:
+            return Response.html(_data_page_html(page))
+        if req.headers.get("x-inertia-version") != INERTIA_VERSION:
+            return Response(409, b"", headers={"X-Inertia-Location": f"{self.url}/balance"})
+        return Response(200, page, headers={"X-Inertia": "true", "Vary": "X-Inertia"})
+
+
+class LeaflowCheckinSite(MockSite):
+    name = "leaflow_checkin"
+    routes = [
+        ("GET", r"/", "page"),
+        ("POST", r"/", "submit"),
+        ("GET", r"/(?:api/)?checkin", "api_status"),
+        ("POST", r"/(?:api/)?checkin", "api_checkin"),
+    ]
+
+    def __init__(self, state: LeaflowState, faults: Faults = None):
+        super().__init__(faults)
+        self.state = state
+
+    def page(self, req):
+        user = self.state.user(req)
+        if not user:
+            return Response.html("<h1>请先登录</h1>", 401)
+        if self.state.checked_today(user):
+            body = '<div class="mt-2 mb-1 text-muted small">今日已签到</div>'
+        else:
+            body = ('<form method="post" action="/"><input type="hidden" name="_token" value="mock-csrf">'
+                    '<h2>每日签到 daily check-in</h2><button class="checkin-btn" type="submit">立即签到</button></form>')
+        return Response.html(f'<html><head><meta name="csrf-token" content="mock-csrf"></head><body>{body}</body></html>')
+
+    def submit(self, req):
+        user = self.state.user(req)
+        if not user:
+            return Response.html("<h1>请先登录</h1>", 401)
+        if self.state.checkin(user):
+            return Response.html(
+                f'<div class="mt-2 mb-1 text-muted small">今日已签到</div><p>签到成功，获得奖励 {self.state.reward:.2f} 元</p>'
+            )
+        return Response.html('<div class="mt-2 mb-1 text-muted small">今日已签到</div>')
+
+    def api_status(self, req):
+        return Response(405, {"message": "Method Not Allowed"})
+
+    def api_checkin(self, req):
+        user = self.state.user(req)
+        if not user:
+            return Response(401, {"message": "Unauthenticated."})
+        if self.state.checkin(user):
+            return Response(200, {"success": True, "message": f"签到成功，获得奖励 {self.state.reward:.2f} 元"})
+        return Response(200, {"success": True, "message": "今日已签到"})
+
+
+# ==================================================
+# DigitalPlat
+# ==================================================
+class DigitalplatSite(MockSite):
+    """domains: {域名: 到期日 YYYYMMDD}；POST renew 延长一年"""
+    name = "digitalplat"
+    routes = [
+        ("GET", r"/_panel_api/api/domains", "list_domains"),
+        ("POST", r"/_panel_api/api/domains/([^/]+)/renew", "renew"),
+    ]
+
+    def __init__(self, domains: dict = None, faults: Faults = None):
+        super().__init__(faults)
+        today = datetime.now()
+        self.expiry = domains or {
+            "mock-a.dpdns.org": (today + timedelta(days=30)).strftime("%Y%m%d"),
+            "mock-b.dpdns.org": (today + timedelta(days=300)).strftime("%Y%m%d"),
+        }
+        self.lock = threading.Lock()
+
+    def _authed(self, req) -> bool:
+        return bool(req.cookies)
+
+    def domains_list(self) -> list[dict]:
+        with self.lock:
+            return [{"domain": d, "expiry_date": e} for d, e in self.expiry.items()]
+
+    def list_domains(self, req):
+        if not self._authed(req):
+            return Response(401, {"message": "unauthorized"})
+        return Response(200, {"domains": self.domains_list()})
+
+    def renew(self, req):
+        if not self._authed(req):
+            return Response(401, {"message": "unauthorized"})
+        csrf = req.cookies.get("panel_csrf_token")
+        if csrf and req.headers.get("x-csrf-token") != csrf:
+            return Response(403, {"message": "csrf token mismatch"})
+        domain = unquote(req.match.group(1))
+        years = int(req.json().get("years") or 1)
+        with self.lock:
+            if domain not in self.expiry:
+                return Response(404, {"message": "domain not found"})
+            expiry = datetime.strptime(self.expiry[domain], "%Y%m%d") + timedelta(days=365 * years)
+            self.expiry[domain] = expiry.strftime("%Y%m%d")
+        return Response(200, {"success": True, "domain": domain, "expiry_date": self.expiry[domain]})
+
+
+# ==================================================
+# FakerClaw
+# ==================================================
+class FakerclawSite(MockSite):
+    """New-Api-User 头即用户 ID；/console 页面写入 localStorage 供 run_internal_checkin 读取"""
+    name = "fakerclaw"
+    routes = [
+        ("GET", r"/console(?:/.*)?", "console"),
+        ("POST", r"/api/user/checkin", "checkin"),
+        ("GET", r"/api/user/self", "profile"),
+        ("GET", r"/api/log/self", "logs"),
+    ]
+
+    def __init__(self, faults: Faults = None):
+        super().__init__(faults)
+        self.lock = threading.Lock()
+        self.users = {}
+
+    def _user(self, req):
+        uid = req.headers.get("New-Api-User")
+        if not uid:
+            return None
+        with self.lock:
+            return self.users.setdefault(uid, {"quota": 5_000_000, "used_quota": 0, "logs": []})
+
+    def console(self, req):
+        return Response.html(
+            "<html><body><h1>Console</h1>"
+            "<script>localStorage.setItem('user', JSON.stringify({id: 1001}));</script></body></html>"
+        )
+
+    def checkin(self, req):
+        user = self._user(req)
+        if user is None:
+            return Response(401, {"success": False, "message": "未登录"})
+        today = datetime.now().strftime("%Y-%m-%d")
+        with self.lock:
+            if any(datetime.fromtimestamp(l["created_at"]).strftime("%Y-%m-%d") == today for l in user["logs"]):
+                return Response(200, {"success": False, "message": "今日已签到"})
+            reward = 250_000
+            user["quota"] += reward
+            user["logs"].insert(0, {"created_at": int(time.time()), "type": 4, "quota": reward,
+                                    "content": f"签到奖励 ＄{reward / 500000:.2f}"})
+        return Response(200, {"success": True, "message": "签到成功"})
+
+    def profile(self, req):
+        user = self._user(req)
+        if user is None:
+            return Response(401, {"success": False, "message": "未登录"})
+        uid = req.headers.get("New-Api-User")
+        return Response(200, {"success": True, "data": {
+            "display_name": f"mock-{uid}", "quota": user["quota"], "used_quota": user["used_quota"],
+        }})
+
+    def logs(self, req):
+        user = self._user(req)
+        if user is None:
+            return Response(401, {"success": False, "message": "未登录"})
+        with self.lock:
+            items = list(user["logs"])
+        return Response(200, {"success": True, "data": {"items": items, "total": len(items)}})
+
+
+# ==================================================
+# Telegram Bot API
+# ==================================================
+class TelegramSite(MockSite):
+    """
+    - token 以 "bad" 开头返回 401（测试 Bot 切换）
+    - rate_per_sec > 0 时每个 token 超速返回 429 + retry_after
+    """
+    name = "telegram"
+    routes = [("POST", r"/bot([^/]+)/(sendMessage|sendPhoto|sendMediaGroup)", "send")]
+
+    def __init__(self, rate_per_sec: float = 0, faults: Faults = None):
+        super().__init__(faults)
+        self.rate_per_sec = rate_per_sec
+        self.lock = threading.Lock()
+        self.messages = []
+        self._last = {}
+
+    def send(self, req):
+        token, method = req.match.group(1), req.match.group(2)
+        if token.startswith("bad"):
+            return Response(401, {"ok": False, "error_code": 401, "description": "Unauthorized"})
+        with self.lock:
+            now = time.monotonic()
+            if self.rate_per_sec and now - self._last.get(token, 0) < 1 / self.rate_per_sec:
+                return Response(429, {"ok": False, "error_code": 429, "description": "Too Many Requests",
+                                      "parameters": {"retry_after": 1}})
+            self._last[token] = now
+            fields = req.form()
+            self.messages.append({"method": method, "chat_id": fields.get("chat_id"),
+                                  "text": fields.get("text") or fields.get("caption"), "bytes": len(req.body)})
+            message_id = len(self.messages)
+        return Response(200, {"ok": True, "result": {"message_id": message_id, "date": int(time.time())}})
+
+
+# ==================================================
+# 替身套件
+# ==================================================
+class MockSuite:
+    """
+    启动全部站点替身并导出环境变量
+    - faults: 各站点共用的故障注入配置（可通过 /_admin/faults 单独调整）
+    """
+    def __init__(self, latency_ms: int = 0, jitter_ms: int = 0, error_rate: float = 0.0,
+                 error_status: int = 503, seed=None, telegram_rate: float = 0):
+        self.fault_args = dict(latency_ms=latency_ms, jitter_ms=jitter_ms, error_rate=error_rate,
+                               error_status=error_status)
+        self.seed = seed
+        self.telegram_rate = telegram_rate
+        self.servers = []
+        self.sites = {}
+        self.state_dir = None
+        self.store = None
+        self._saved_env = {}
+        self._saved_store = None
+
+    def _faults(self, offset: int) -> Faults:
+        return Faults(**self.fault_args, seed=None if self.seed is None else self.seed + offset)
+
+    def start(self):
+        # 状态库 / Inertia 版本缓存写到临时目录，不污染真实 .state
+        self.state_dir = tempfile.mkdtemp(prefix="mock_state_")
+        leaflow_state = LeaflowState()
+        sites = [
+            LeaflowSite(leaflow_state, self._faults(0)),
+            LeaflowCheckinSite(leaflow_state, self._faults(1)),
+            DigitalplatSite(faults=self._faults(2)),
+            FakerclawSite(self._faults(3)),
+            TelegramSite(self.telegram_rate, self._faults(4)),
+        ]
+        for site in sites:
+            self.servers.append(start_site(site))
+            self.sites[site.name] = site
+        # GitHub Secrets 替身只注入延迟，写入失败会让 SecretUpdater 直接报错
+        self.secret_server = start_secret_server(latency_ms=self.fault_args["latency_ms"])
+        self.servers.append(self.secret_server)
+        return self
+
+    def env(self) -> dict:
+        return {
+            "LEAFLOW_URL": self.sites["leaflow"].url,
+            "LEAFLOW_CHECKIN_URL": self.sites["leaflow_checkin"].url,
+            "DIGITALPLAT_API_URL": f"{self.sites['digitalplat'].url}/_panel_api/api/domains",
+            "FAKERCLAW_URL": self.sites["fakerclaw"].url,
+            "TELEGRAM_API_URL": self.sites["telegram"].url,
+            "STATE_DIR": self.state_dir,
+            "SECRET_BACKEND": "local",
+            "SECRET_API_URL": self.secret_server.url,
+            "GITHUB_REPOSITORY": os.getenv("GITHUB_REPOSITORY") or "mock/auto_checkin",
+            "REPO_TOKEN": os.getenv("REPO_TOKEN") or "mock-token",
+        }
+
+    def apply_env(self):
+        for k, v in self.env().items():
+            self._saved_env.setdefault(k, os.environ.get(k))
+            os.environ[k] = v
+        # engine.state.STATE_DIR 在导入时已确定，进程内显式替换状态库实例
+        if self.store is None:
+            self.store = StateStore(path=Path(self.state_dir) / "run_state.db")
+            self._saved_store = set_state_store(self.store)
+
+    def restore_env(self):
+        for k, v in self._saved_env.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+        self._saved_env = {}
+        if self.store is not None:
+            set_state_store(self._saved_store)
+            self.store.close()
+            self.store = self._saved_store = None
+
+    def stats(self) -> dict:
+        return {name: site.stats for name, site in self.sites.items()}
+
+    def stop(self):
+        self.restore_env()
+        for server in self.servers:
+            server.shutdown()
+            server.server_close()
+        self.servers = []
+
+    def __enter__(self):
+        self.start()
+        self.apply_env()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+# ==================================================
+# 基准
+# ==================================================
+def _timed(rounds: int, func) -> dict:
+    costs, failures = [], 0
+    for i in range(rounds):
+        start = time.perf_counter()
+        try:
+            if not func(i):
+                failures += 1
+        except Exception as e:
+            print(f"⚠️ 基准执行异常: {e}")
+            failures += 1
+        costs.append((time.perf_counter() - start) * 1000)
+    costs.sort()
+    return {
+        "avg_ms": sum(costs) / len(costs),
+        "p95_ms": costs[min(len(costs) - 1, int(len(costs) * 0.95))],
+        "failures": failures,
+    }
+
+
+def bench(rounds: int = 5, latency_ms: int = 0, error_rate: float = 0.0, seed: int = 1) -> list[dict]:
+    """
+    离线跑一遍各条纯 HTTP 流程（需要浏览器的流程用 run 子命令对接脚本）
+    返回 [{"flow", "avg_ms", "p95_ms", "failures"}]
+    """
+    rows = []
+    with MockSuite(latency_ms=latency_ms, error_rate=error_rate, seed=seed) as suite:
+        # 站点地址在模块导入时读取，必须在 apply_env 之后导入
+        from engine import leaflow_api
+        from engine.main import perform_checkin, SecretUpdater
+        from engine.notify import TelegramNotifier
+
+        # Inertia 版本缓存同样写到临时目录
+        real_inertia_cache = leaflow_api.inertia_versions.cache_file
+        leaflow_api.inertia_versions.cache_file = Path(suite.state_dir) / "leaflow_inertia.json"
+        leaflow = suite.sites["leaflow"]
+        checkin = suite.sites["leaflow_checkin"]
+
+        def leaflow_session(i):
+            token = leaflow.state.login(f"bench{i}_{time.time_ns()}@mock.test")
+            return leaflow_api.build_session({"leaflow_session": token})
+
+        def flow_api_checkin(i):
+            ok, _, _ = leaflow_api.api_checkin(leaflow_session(i), f"bench{i}")
+            return ok
+
+        def flow_perform_checkin(i):
+            ok, _ = perform_checkin(leaflow_session(i), f"bench{i}", checkin.url, leaflow.url)
+            return ok
+
+        def flow_digitalplat(i):
+            from digitalplat.renew import AutoLogin
+            bot = AutoLogin({"gh_username": f"bench{i}"})
+            cookies = {"panel_session": "mock", "panel_csrf_token": "mock-csrf"}
+            return "失败 0 个" in bot.check_and_renew(cookies)
+
+        class _BotConfig:
+            def get_value(self, key):
+                return [{"token": "bad-token", "id": "1"}, {"token": "123:mock", "id": "1"}] if key == "BOT_INFO" else None
+
+        notifier = TelegramNotifier(_BotConfig())
+
+        def flow_telegram(i):
+            return notifier.send_now("基准", f"第 {i} 条")
+
+        def flow_secrets(i):
+            updater = SecretUpdater("MOCK_BENCH")
+            updater.update({"round": i, "blob": "x" * 4096}, force=True)
+            return SecretUpdater("MOCK_BENCH").load() == {"round": i, "blob": "x" * 4096}
+
+        flows = [
+            ("leaflow_api_checkin", flow_api_checkin),
+            ("perform_checkin", flow_perform_checkin),
+            ("digitalplat_renew", flow_digitalplat),
+            ("telegram_send", flow_telegram),
+            ("github_secret", flow_secrets),
+        ]
+        for name, func in flows:
+            rows.append(dict(flow=name, **_timed(rounds, func)))
+        stats = suite.stats()
+        leaflow_api.inertia_versions.cache_file = real_inertia_cache
+
+    print(f"{'流程':<22}{'平均(ms)':>12}{'P95(ms)':>12}{'失败':>6}")
+    for r in rows:
+        print(f"{r['flow']:<22}{r['avg_ms']:>12.1f}{r['p95_ms']:>12.1f}{r['failures']:>6}")
+    for name, s in stats.items():
+        print(f"📊 {name}: {s['requests']} 次请求，注入错误 {s['injected_errors']} 次")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地站点替身（Leaflow / DigitalPlat / FakerClaw / Telegram / GitHub Secrets）")
+    sub = parser.add_subparsers(dest="cmd")
+    for name, help_text in (("serve", "启动全部替身并打印环境变量"),
+                            ("run", "启动替身后运行指定命令（环境变量已指向替身）"),
+                            ("bench", "离线基准各条 HTTP 流程")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("--latency", type=int, default=0, help="每个请求额外延迟（毫秒）")
+        p.add_argument("--jitter", type=int, default=0, help="延迟随机抖动（毫秒）")
+        p.add_argument("--error-rate", type=float, default=0.0, help="随机返回错误的比例 0~1")
+        p.add_argument("--seed", type=int, default=None)
+        if name == "bench":
+            p.add_argument("--rounds", type=int, default=5)
+        if name == "run":
+            p.add_argument("command", nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "bench":
+        bench(rounds=args.rounds, latency_ms=args.latency, error_rate=args.error_rate,
+              seed=1 if args.seed is None else args.seed)
+        return 0
+    if args.cmd not in ("serve", "run"):
+        parser.print_help()
+        return 1
+
+    suite = MockSuite(latency_ms=args.latency, jitter_ms=args.jitter, error_rate=args.error_rate, seed=args.seed)
+    with suite:
+        if args.cmd == "serve":
+            for k, v in suite.env().items():
+                print(f"export {k}={v}")
+            try:
+                while True:
+                    time.sleep(3600)
+            except KeyboardInterrupt:
+                return 0
+
+        command = [c for c in args.command if c != "--"]
+        if not command:
+            parser.error("run 需要指定命令，例如: run -- python -u leaflow/leaflow_check.py")
+        start = time.perf_counter()
+        code = subprocess.call(command, env=dict(os.environ))
+        print(f"⏱️ 命令耗时 {time.perf_counter() - start:.1f}s，退出码 {code}")
+        for name, s in suite.stats().items():
+            print(f"📊 {name}: {s['requests']} 次请求，注入错误 {s['injected_errors']} 次")
+        return code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,104 @@
 # -*- coding: utf-8 -*-
 
 import os
+import json
+import time
+import queue
+import atexit
+import threading
 import requests
 from engine.safe_print import desensitize_text
 from engine.main import ConfigReader
 from html import escape
 
+"""
+# ==================================================
+# Telegram 通知
+用法：
+notifier = TelegramNotifier(config)
+notifier.send("标题", "内容", image_path="shot.png")   # 入队立即返回，后台线程发送
+notifier.flush()                                       # 等待队列发送完毕，有发送失败时返回 False（进程退出时自动调用）
+notifier.send_now("标题", "内容")                      # 同步发送
+# 后台发送：COALESCE_WINDOW 秒内按入队顺序发送，相邻的文字合并为一条（不超过 4096 字），
+# 相邻的图片合并为相册（sendMediaGroup，每组最多 10 张），截图总是紧跟在所属消息之后
+# 所有 Bot 都被拒绝（鉴权失败 / chat 不存在）后 send 直接返回 False
+# 图片在入队时读入内存，调用方之后删除临时文件不受影响
+# TG_ASYNC=off 关闭后台发送，send 退化为同步
+# 每个 Bot 令牌桶限速（TG_RATE 条/秒，默认 1），429 按 retry_after 等待重试，
+# 只有鉴权失败 / chat 不存在等 Bot 级错误才切换备用 Bot
+# ==================================================
+"""
+
+COALESCE_WINDOW = 2.0
+TEXT_LIMIT = 4096
+CAPTION_LIMIT = 1024
+ALBUM_LIMIT = 10
+TEXT_SEPARATOR = "\n\n━━━━━━━━━━\n\n"
+FLUSH_TIMEOUT = 120
+# Telegram 单个 chat 约 1 条/秒，突发不超过 3 条
+BOT_RATE = float(os.getenv("TG_RATE") or 1.0)
+BOT_BURST = 3
+MAX_RETRIES = 3
+# TELEGRAM_API_URL 可指向本地替身（python -m engine.mock_sites）
+TELEGRAM_API = (os.getenv("TELEGRAM_API_URL") or "https://api.telegram.org").rstrip("/")
+# 这些错误说明 Bot 本身不可用（token 失效 / 被踢出 / chat 不存在），需要切换
+FATAL_STATUS = (401, 403, 404)
+FATAL_MARKERS = ("chat not found", "bot was blocked", "bot was kicked", "not enough rights", "unauthorized")
+
+
+def async_enabled() -> bool:
+    return os.getenv("TG_ASYNC", "on").strip().lower() not in ("off", "0", "false")
+
+
+def retry_after(resp, default: int = 5) -> int:
+    """429 响应中的等待秒数（parameters.retry_after 或 Retry-After 头）"""
+    try:
+        return int(resp.json().get("parameters", {}).get("retry_after") or default)
+    except ValueError:
+        return int(resp.headers.get("Retry-After") or default)
+
+
+def is_fatal_response(resp) -> bool:
+    if resp.status_code in FATAL_STATUS:
+        return True
+    if resp.status_code == 400:
+        text = resp.text.lower()
+        return any(m in text for m in FATAL_MARKERS)
+    return False
+
+
+class TokenBucket:
+    """令牌桶限速：rate 个/秒，最多累积 capacity 个；pause 用于 429 后整体暂停"""
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self.blocked_until:
+                    self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+                else:
+                    wait = self.blocked_until - now
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+            self.tokens = 0
+            self.updated = self.blocked_until
+
+
 class TelegramNotifier:
     def __init__(self, config: ConfigReader, default_index: int = 0):
         """
@@ -20,6 +113,16 @@ class TelegramNotifier:
 
         self._apply_bot(self.current_index)
 
+        self._queue = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._atexit_registered = False
+        self._bot_lock = threading.RLock()
+        self._buckets = {}
+        # 所有 Bot 均被拒绝后置 True；failed 为后台发送失败条数
+        self.exhausted = False
+        self.failed = 0
+
     # =========================
     # 配置读取
     # =========================
@@ -55,93 +158,285 @@ class TelegramNotifier:
     # =========================
 
     def _switch_bot(self) -> bool:
-        if self.current_index + 1 >= len(self.bots):
-            print("❌ 已无可用的 Telegram Bot 可切换")
-            return False
+        with self._bot_lock:
+            if self.current_index + 1 >= len(self.bots):
+                print("❌ 已无可用的 Telegram Bot 可切换")
+                self.exhausted = True
+                return False
 
-        self.current_index += 1
-        self._apply_bot(self.current_index)
+            self.current_index += 1
+            self._apply_bot(self.current_index)
 
         print(f"🔁 已切换到 Telegram Bot[{self.current_index}]")
         return True
 
+    def _with_failover(self, label: str, func, *args) -> bool:
+        """
+        执行发送，仅在 Bot 失效（鉴权 / chat 错误）时切换 Bot 重试
+        429 与临时错误在 _request 内部等待重试，不消耗备用 Bot
+        """
+        try:
+            status = func(*args)
+        except Exception as e:
+            print(f"💥 TG {label}发送异常: {e}")
+            status = "error"
+
+        if status == "fatal" and self._switch_bot():
+            print(f"🔁 重试发送{label}")
+            try:
+                status = func(*args)
+            except Exception as e:
+                print(f"💥 TG {label}重试异常: {e}")
+                status = "error"
+        return status == "ok"
+
+    # =========================
+    # 限速与重试
+    # =========================
+
+    def _bucket(self) -> "TokenBucket":
+        with self._bot_lock:
+            bucket = self._buckets.get(self.token)
+            if bucket is None:
+                bucket = TokenBucket(BOT_RATE, BOT_BURST)
+                self._buckets[self.token] = bucket
+            return bucket
+
+    def _request(self, method: str, data: dict, files: dict | None = None, timeout: int = 30) -> str:
+        """
+        调用 Bot API，返回 "ok" / "fatal"（需切换 Bot）/ "error"（放弃本条）
+        - 每个 Bot 令牌桶限速
+        - 429 按 retry_after 等待后重试
+        - 5xx / 网络错误指数退避重试
+        """
+        url = f"{TELEGRAM_API}/bot{self.token}/{method}"
+        for attempt in range(MAX_RETRIES + 1):
+            self._bucket().acquire()
+            try:
+                r = self.session.post(url, data=data, files=files, timeout=timeout)
+            except requests.RequestException as e:
+                print(f"💥 [TG] {method} 网络异常: {e}")
+                time.sleep(2 ** attempt)
+                continue
+
+            print(f"⬅️ [TG] {method} HTTP {r.status_code}")
+            if r.ok:
+                return "ok"
+
+            print(f"❌ [TG] 失败响应: {r.text}")
+            if r.status_code == 429:
+                wait = retry_after(r)
+                print(f"⏳ [TG] 触发限流，{wait}s 后重试")
+                self._bucket().pause(wait)
+                continue
+            if is_fatal_response(r):
+                return "fatal"
+            if r.status_code >= 500:
+                time.sleep(2 ** attempt)
+                continue
+            return "error"
+        return "error"
+
     # =========================
     # 内部发送封装
     # =========================
 
-    def _send_text_once(self, text: str) -> bool:
-        url = f"https://api.telegram.org/bot{self.token}/sendMessage"
+    def _send_text_once(self, text: str) -> str:
         payload = {
             "chat_id": self.chat_id,
             "text": text,
             "parse_mode": "HTML",
             "disable_web_page_preview": True,
         }
+        return self._request("sendMessage", payload)
 
-        r = self.session.post(url, data=payload, timeout=30)
-        print(f"⬅️ [TG] HTTP {r.status_code}")
-        if not r.ok:
-            print(f"❌ [TG] 失败响应: {r.text}")
-        return r.ok
+    def _send_album_once(self, photos: list[dict]) -> str:
+        """photos: [{"name", "data", "caption"}]，1 张走 sendPhoto，多张走 sendMediaGroup"""
+        if len(photos) == 1:
+            p = photos[0]
+            data = {"chat_id": self.chat_id}
+            if p["caption"]:
+                data["caption"] = p["caption"]
+            return self._request("sendPhoto", data, files={"photo": (p["name"], p["data"])}, timeout=60)
 
-    def _send_image_once(self, image_path: str, caption: str | None) -> bool:
-        url = f"https://api.telegram.org/bot{self.token}/sendPhoto"
-        data = {"chat_id": self.chat_id}
+        media, files = [], {}
+        for i, p in enumerate(photos):
+            item = {"type": "photo", "media": f"attach://photo{i}"}
+            if p["caption"]:
+                item["caption"] = p["caption"]
+            media.append(item)
+            files[f"photo{i}"] = (p["name"], p["data"])
+        print(f"🖼️ [TG] 相册发送 {len(photos)} 张图片")
+        return self._request(
+            "sendMediaGroup",
+            {"chat_id": self.chat_id, "media": json.dumps(media)},
+            files=files,
+            timeout=60,
+        )
 
-        if caption:
-            data["caption"] = caption
+    # =========================
+    # 后台发送队列
+    # =========================
 
-        with open(image_path, "rb") as f:
-            files = {"photo": f}
-            r = self.session.post(url, data=data, files=files, timeout=60)
+    def _ensure_worker(self):
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._dispatch_loop, name="tg_notifier", daemon=True)
+                self._worker.start()
+                # 工作线程重启时不重复注册
+                if not self._atexit_registered:
+                    atexit.register(self.flush)
+                    self._atexit_registered = True
 
-        print(f"⬅️ [TG] HTTP {r.status_code}")
-        if not r.ok:
-            print(f"❌ [TG] 失败响应: {r.text}")
-        return r.ok
+    def _dispatch_loop(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + COALESCE_WINDOW
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            try:
+                self._dispatch(batch)
+            except Exception as e:
+                print(f"💥 [TG] 后台发送异常: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    @staticmethod
+    def _segments(batch: list[dict]) -> list[tuple]:
+        """
+        按入队顺序切分为 [("text", [...]), ("photo", [...]), ...]
+        相邻同类合并，每条消息的截图紧跟在该消息之后发送
+        """
+        segments = []
+        for item in batch:
+            for kind in ("text", "photo"):
+                if not item.get(kind):
+                    continue
+                if segments and segments[-1][0] == kind:
+                    segments[-1][1].append(item[kind])
+                else:
+                    segments.append((kind, [item[kind]]))
+        return segments
+
+    def _dispatch(self, batch: list[dict]):
+        segments = self._segments(batch)
+        if len(batch) > 1:
+            texts = sum(len(v) for k, v in segments if k == "text")
+            photos = sum(len(v) for k, v in segments if k == "photo")
+            print(f"📦 [TG] 合并发送: {texts} 条文字, {photos} 张图片")
+
+        for kind, values in segments:
+            if kind == "text":
+                results = [self._with_failover("文字", self._send_text_once, m) for m in self._coalesce_texts(values)]
+            else:
+                results = [
+                    self._with_failover("图片", self._send_album_once, values[i:i + ALBUM_LIMIT])
+                    for i in range(0, len(values), ALBUM_LIMIT)
+                ]
+            self.failed += results.count(False)
+
+    @staticmethod
+    def _coalesce_texts(texts: list[str]) -> list[str]:
+        """按 TEXT_LIMIT 将多条消息合并为尽量少的几条"""
+        merged, current = [], ""
+        for text in texts:
+            candidate = f"{current}{TEXT_SEPARATOR}{text}" if current else text
+            if current and len(candidate) > TEXT_LIMIT:
+                merged.append(current)
+                current = text
+            else:
+                current = candidate
+        if current:
+            merged.append(current)
+        return merged
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT) -> bool:
+        """等待队列中的通知发送完毕，超时或有发送失败时返回 False"""
+        if self._worker is None:
+            return True
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if time.monotonic() > deadline:
+                print(f"⚠️ [TG] flush 超时，仍有 {self._queue.unfinished_tasks} 条未发送")
+                return False
+            time.sleep(0.1)
+        if self.failed:
+            print(f"⚠️ [TG] 后台发送失败 {self.failed} 次")
+            return False
+        return True
 
     # =========================
     # 对外接口
     # =========================
 
     def send(self, title: str, content: str, image_path: str | None = None) -> bool:
+        """
+        入队后立即返回（TG_ASYNC=off 时同步发送）
+        返回 False：所有 Bot 均已被拒绝，或图片读取失败；入队后的发送结果由 flush() 汇总
+        """
+        if not async_enabled():
+            return self.send_now(title, content, image_path)
+        if self.exhausted:
+            print("❌ [TG] 所有 Bot 均不可用，通知未发送")
+            return False
+
+        # 文字与截图作为同一条入队，保证截图紧跟其消息
+        item = {"text": desensitize_text(f"<b>{escape(title)}</b>\n\n{escape(content)}")}
+        ok = True
+        if image_path and os.path.exists(image_path):
+            # 入队时读取图片，调用方随后删除临时文件也不影响发送
+            try:
+                with open(image_path, "rb") as f:
+                    data = f.read()
+                item["photo"] = {
+                    "name": os.path.basename(image_path),
+                    "data": data,
+                    "caption": desensitize_text(title)[:CAPTION_LIMIT],
+                }
+            except OSError as e:
+                print(f"⚠️ [TG] 读取图片失败: {e}")
+                ok = False
+
+        self._ensure_worker()
+        self._queue.put(item)
+        print(f"🔔 通知已入队（待发送 {self._queue.unfinished_tasks}）")
+        return ok
+
+    def send_now(self, title: str, content: str, image_path: str | None = None) -> bool:
         print("🔔 开始发送通知")
 
         safe_title = escape(title)
         safe_content = escape(content)
-        
+
         message = f"<b>{safe_title}</b>\n\n{safe_content}"
         message = desensitize_text(message)
 
-
         # -------- 文字 --------
-        try:
-            ok = self._send_text_once(message)
-        except Exception as e:
-            print(f"💥 TG 文字发送异常: {e}")
-            ok = False
-
-        if not ok and self._switch_bot():
-            print("🔁 重试发送文字")
-            ok = self._send_text_once(message)
+        ok = self._with_failover("文字", self._send_text_once, message)
 
         # -------- 图片 --------
         ok_img = True
         if image_path and os.path.exists(image_path):
             try:
-                ok_img = self._send_image_once(
-                    image_path,
-                    caption=desensitize_text(title),
-                )
-            except Exception as e:
-                print(f"💥 TG 图片发送异常: {e}")
+                with open(image_path, "rb") as f:
+                    photo = {
+                        "name": os.path.basename(image_path),
+                        "data": f.read(),
+                        "caption": desensitize_text(title)[:CAPTION_LIMIT],
+                    }
+            except OSError as e:
+                # 图片不可读时只保留上面已发出的文字消息
+                print(f"⚠️ [TG] 读取图片失败，仅发送文字: {e}")
+                photo = None
                 ok_img = False
-
-            if not ok_img and self._switch_bot():
-                print("🔁 重试发送图片")
-                ok_img = self._send_image_once(
-                    image_path,
-                    caption=desensitize_text(title),
-                )
+            if photo:
+                ok_img = self._with_failover("图片", self._send_album_once, [photo])
 
         return ok and ok_img
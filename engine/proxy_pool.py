@@ -0,0 +1,148 @@
+# engine/proxy_pool.py
+# -*- coding: utf-8 -*-
+import json
+import time
+import threading
+
+from engine.proxy_probe import probe_proxies
+from engine.state import get_state_store
+
+"""
+# ==================================================
+# 代理池：账号 -> 代理分配（健康度 + 故障转移 + 粘性）
+用法：
+pool = ProxyPool(proxies, task="clawcloud")
+for account, proxy in pool.assign_all(accounts):      # 替代 zip(accounts, proxies)
+    spare = pool.spare_for(proxy)                      # 替代 proxies[-1] 作为备用代理
+    ...
+    if ok:
+        pool.confirm(account["username"], proxy)       # 成功后才记为该账号的粘性代理
+
+# 分配规则：
+#   1. 首选代理：上次成功运行所用的代理（粘性，保持会话出口 IP 一致），否则按下标一一对应
+#   2. 首选代理本次探测失败时，改用最健康的备用代理（负载少 > 历史成功率高 > 延迟低）
+#   3. 全部代理都不可用时退回首选代理
+# 健康度：每次探测结果累计到状态库 proxy_health:<server>:<port>，跨运行保留
+# 粘性记录只在 confirm() 时写入，未成功的分配不会被记住
+# 账号多于代理时按下标循环复用代理，不丢弃账号
+# ==================================================
+"""
+
+# 历史延迟的指数平均系数
+LATENCY_ALPHA = 0.3
+
+
+def proxy_key(proxy: dict) -> str:
+    return f"{proxy.get('server')}:{proxy.get('port')}"
+
+
+class ProxyPool:
+    def __init__(self, proxies: list, task: str, store=None, probe: bool = True):
+        self.proxies = [p for p in (proxies or []) if isinstance(p, dict)]
+        self.task = task
+        self.store = store or get_state_store()
+        self._lock = threading.Lock()
+        self._load = {proxy_key(p): 0 for p in self.proxies}
+        self._alive = {}
+        if probe and self.proxies:
+            self.probe()
+
+    # ---------- 健康度 ----------
+    def _health_kv(self, key: str) -> str:
+        return f"proxy_health:{key}"
+
+    def health(self, proxy: dict) -> dict:
+        raw = self.store.get_kv(self._health_kv(proxy_key(proxy)))
+        try:
+            return json.loads(raw) if raw else {}
+        except ValueError:
+            return {}
+
+    def _record(self, proxy: dict, result: dict):
+        h = self.health(proxy)
+        h["ok"] = h.get("ok", 0) + (1 if result.get("ok") else 0)
+        h["fail"] = h.get("fail", 0) + (0 if result.get("ok") else 1)
+        latency = result.get("latency_ms")
+        if latency is not None:
+            prev = h.get("latency_ms")
+            h["latency_ms"] = round(latency if prev is None else prev + LATENCY_ALPHA * (latency - prev), 1)
+        h["updated"] = time.time()
+        self.store.set_kv(self._health_kv(proxy_key(proxy)), json.dumps(h))
+
+    def probe(self):
+        """并发探测全部代理（结果本次运行内缓存），并累计健康度"""
+        for proxy, result in zip(self.proxies, probe_proxies(self.proxies)):
+            self._alive[proxy_key(proxy)] = bool(result.get("ok"))
+            self._record(proxy, result)
+        alive = sum(self._alive.values())
+        print(f"🩺 [{self.task}] 代理健康检测: {alive}/{len(self.proxies)} 可用")
+
+    def is_alive(self, proxy: dict) -> bool:
+        # 未探测过的代理视为可用
+        return self._alive.get(proxy_key(proxy), True)
+
+    def _score(self, proxy: dict):
+        """越小越优：本次负载、历史失败率（平滑）、历史延迟"""
+        h = self.health(proxy)
+        fail_rate = (h.get("fail", 0) + 1) / (h.get("ok", 0) + h.get("fail", 0) + 2)
+        return self._load[proxy_key(proxy)], round(fail_rate, 2), h.get("latency_ms") or float("inf")
+
+    # ---------- 分配 ----------
+    def _sticky_kv(self, account: str) -> str:
+        return f"proxy_assign:{self.task}:{account}"
+
+    def _find(self, key: str):
+        return next((p for p in self.proxies if proxy_key(p) == key), None)
+
+    def assign(self, account: str, index: int) -> dict:
+        """为账号分配代理，index 为该账号在 zip 对应关系中的下标"""
+        if not self.proxies:
+            return None
+        with self._lock:
+            sticky = self._find(self.store.get_kv(self._sticky_kv(account)) or "")
+            preferred = sticky or self.proxies[index % len(self.proxies)]
+            chosen = preferred
+            if not self.is_alive(preferred):
+                spares = [p for p in self.proxies if self.is_alive(p)]
+                if spares:
+                    chosen = min(spares, key=self._score)
+                    print(f"🔀 [{self.task}] {account[:3]}*** 首选代理不可用，切换: "
+                          f"{proxy_key(preferred)} -> {proxy_key(chosen)}")
+            self._load[proxy_key(chosen)] += 1
+            return chosen
+
+    def confirm(self, account: str, proxy: dict):
+        """账号使用 proxy 运行成功后调用，记为下次运行的首选代理"""
+        if not proxy:
+            return
+        key = proxy_key(proxy)
+        if self.store.get_kv(self._sticky_kv(account)) != key:
+            self.store.set_kv(self._sticky_kv(account), key)
+
+    def assign_all(self, accounts: list, key=lambda a: a["username"]) -> list:
+        """
+        [(account, proxy), ...]，每个账号都会分配
+        账号多于代理时按下标循环复用代理；没有代理时返回空列表
+        """
+        accounts = accounts or []
+        if not self.proxies:
+            if accounts:
+                print(f"⚠️ [{self.task}] 未配置代理，{len(accounts)} 个账号均未分配")
+            return []
+        if len(accounts) > len(self.proxies):
+            print(f"ℹ️ [{self.task}] 账号 {len(accounts)} 个多于代理 {len(self.proxies)} 个，代理循环复用")
+        return [(account, self.assign(key(account), i)) for i, account in enumerate(accounts)]
+
+    def spare_for(self, proxy: dict) -> dict:
+        """除 proxy 外最健康的可用代理，没有时退回最后一个代理"""
+        with self._lock:
+            spares = [p for p in self.proxies if p is not proxy and self.is_alive(p)]
+            if spares:
+                return min(spares, key=self._score)
+        return self.proxies[-1] if self.proxies else None
+
+    def stats(self) -> list[dict]:
+        return [
+            {"proxy": proxy_key(p), "alive": self.is_alive(p), "load": self._load[proxy_key(p)], **self.health(p)}
+            for p in self.proxies
+        ]
@@ -0,0 +1,151 @@
+# engine/proxy_probe.py
+# -*- coding: utf-8 -*-
+import time
+import threading
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from engine.worker_pool import run_pool
+
+"""
+# ==================================================
+# 代理健康检测（并发探测 + 本次运行内缓存）
+用法：
+probe_proxies(proxies)            # 账号循环前一次性并发探测全部代理
+result = probe_proxy(proxy)       # 命中缓存直接返回
+# {"ok": True, "proxy_url": "socks5://...", "latency_ms": 812.4,
+#  "egress_ip": "1.2.3.4", "url": "https://api.ipify.org?format=json", "error": None}
+
+# 同一代理的多个检测地址同时请求，首个成功即返回；
+# 失效代理只耗费一次超时，且同一进程内不会重复探测
+# ==================================================
+"""
+
+PROBE_URLS = [
+    "https://httpbin.io/ip",
+    "https://api.ipify.org?format=json",
+    "https://ipinfo.io/json",
+]
+PROBE_HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+_probe_cache = {}
+_probe_locks = {}
+_probe_lock = threading.Lock()
+
+
+def build_proxy_url(proxy_info, default_type="socks5"):
+    """
+    proxy dict -> requests 可用的代理 URL
+    {"type": "socks5", "server": "1.2.3.4", "port": 1080, "username": "u", "password": "p"}
+    -> socks5://u:p@1.2.3.4:1080
+    """
+    if proxy_info.get("username") and proxy_info.get("password"):
+        auth_part = (
+            f"{quote(str(proxy_info['username']), safe='')}:"
+            f"{quote(str(proxy_info['password']), safe='')}@"
+        )
+    else:
+        auth_part = ""
+
+    return (
+        f"{proxy_info.get('type') or default_type}://"
+        f"{auth_part}"
+        f"{proxy_info['server']}:{proxy_info['port']}"
+    )
+
+
+def _egress_ip(resp):
+    """httpbin 返回 origin，ipify / ipinfo 返回 ip"""
+    try:
+        data = resp.json()
+    except ValueError:
+        return None
+    return data.get("ip") or data.get("origin")
+
+
+def _probe_url(proxy_url: str, url: str, timeout: float):
+    proxies = {"http": proxy_url, "https": proxy_url}
+    start = time.perf_counter()
+    r = requests.get(url, proxies=proxies, timeout=timeout, headers=PROBE_HEADERS)
+    latency = (time.perf_counter() - start) * 1000
+    if r.status_code != 200:
+        raise RuntimeError(f"HTTP {r.status_code}")
+    return latency, _egress_ip(r)
+
+
+def _probe(proxy_info, timeout: float, urls) -> dict:
+    result = {"ok": False, "proxy_url": None, "latency_ms": None, "egress_ip": None, "url": None, "error": None}
+    try:
+        proxy_url = build_proxy_url(proxy_info)
+    except Exception as e:
+        result["error"] = f"代理配置错误: {e}"
+        return result
+
+    result["proxy_url"] = proxy_url
+    executor = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="probe")
+    futures = {executor.submit(_probe_url, proxy_url, url, timeout): url for url in urls}
+    errors = []
+    try:
+        for future in as_completed(futures):
+            try:
+                latency, ip = future.result()
+            except Exception as e:
+                errors.append(f"{futures[future]}: {e}")
+                continue
+            result.update(ok=True, latency_ms=round(latency, 1), egress_ip=ip, url=futures[future])
+            return result
+    finally:
+        # 首个成功后不再等待其余请求
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    result["error"] = "; ".join(errors) or "全部检测地址失败"
+    return result
+
+
+def _cache_key(proxy_info):
+    return (proxy_info.get("type"), proxy_info.get("server"), str(proxy_info.get("port")), proxy_info.get("username"))
+
+
+def probe_proxy(proxy_info, timeout: float = 5, urls=PROBE_URLS, refresh: bool = False) -> dict:
+    """
+    探测单个代理，结果在本次运行内缓存
+    并发调用同一代理时只有一个线程真正探测，其余等待结果
+    """
+    key = _cache_key(proxy_info)
+    with _probe_lock:
+        lock = _probe_locks.setdefault(key, threading.Lock())
+    with lock:
+        cached = not refresh and key in _probe_cache
+        if cached:
+            result = _probe_cache[key]
+        else:
+            result = _probe(proxy_info, timeout, urls)
+            with _probe_lock:
+                _probe_cache[key] = result
+
+    server = proxy_info.get("server")
+    tag = "（缓存）" if cached else ""
+    if result["ok"]:
+        print(f"✅ 代理可用{tag}: {server}，延迟 {result['latency_ms']} ms，出口 IP {result['egress_ip']}")
+    else:
+        print(f"❌ 代理不可用{tag}: {server}，{result['error']}")
+    return result
+
+
+def probe_proxies(proxy_list, timeout: float = 5, max_workers: int = 8) -> list[dict]:
+    """并发探测全部代理，返回与输入顺序一致的结果列表"""
+    proxy_list = [p for p in (proxy_list or []) if isinstance(p, dict)]
+    results = run_pool(
+        lambda p: probe_proxy(p, timeout),
+        [(p,) for p in proxy_list],
+        max_workers=max_workers,
+        label="proxy_probe",
+    )
+    return [value if ok else {"ok": False, "error": str(error)} for ok, value, error in results]
+
+
+def clear_probe_cache():
+    with _probe_lock:
+        _probe_cache.clear()
@@ -0,0 +1,61 @@
+# engine/scheduler.py
+# -*- coding: utf-8 -*-
+import os
+
+from engine.state import get_state_store, business_day
+
+"""
+# ==================================================
+# 每日完成标记：同一北京时间业务日内跳过已完成账号
+用法：
+scheduler = DailyScheduler("leaflow")
+for account in scheduler.pending(accounts):
+    ...
+    if ok:
+        scheduler.mark_done(account["username"])
+# 强制全部重跑：环境变量 FORCE_RUN=1 或 DailyScheduler(..., force=True)
+# ==================================================
+"""
+
+
+def force_run_enabled() -> bool:
+    return os.getenv("FORCE_RUN", "").strip().lower() in ("1", "true", "yes", "on")
+
+
+class DailyScheduler:
+    """
+    基于 StateStore 的每日完成标记
+    - mark_done(account): 记录账号在当前业务日已完成
+    - is_done(account): 当前业务日是否已完成（force 时始终为 False）
+    - pending(items): 过滤出需要执行的账号
+    """
+    def __init__(self, task: str, store=None, force: bool = None):
+        self.task = task
+        self.store = store or get_state_store()
+        self.force = force_run_enabled() if force is None else force
+        self.day = business_day()
+        if self.force:
+            print(f"⏩ [{task}] FORCE_RUN 已开启，忽略今日完成标记")
+
+    def _key(self, account: str) -> str:
+        return f"done:{self.task}:{account}"
+
+    def is_done(self, account: str) -> bool:
+        if self.force:
+            return False
+        return self.store.get_kv(self._key(account)) == self.day
+
+    def mark_done(self, account: str):
+        self.store.set_kv(self._key(account), self.day)
+
+    def pending(self, items: list, key=lambda item: item["username"]) -> list:
+        """返回今日尚未完成的条目，并打印跳过信息"""
+        todo = []
+        for item in items:
+            if self.is_done(key(item)):
+                print(f"⏭️ [{self.task}] 今日({self.day})已完成，跳过: {key(item)[:3]}***")
+            else:
+                todo.append(item)
+        if len(todo) < len(items):
+            print(f"📅 [{self.task}] 今日待执行 {len(todo)}/{len(items)} 个账号")
+        return todo
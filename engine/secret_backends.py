@@ -0,0 +1,287 @@
+# engine/secret_backends.py
+# -*- coding: utf-8 -*-
+import os
+import json
+import base64
+import threading
+from hashlib import sha256
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+from nacl import public, encoding
+
+from engine.worker_pool import run_pool
+from engine.state import get_state_store, STATE_DIR
+
+"""
+# ==================================================
+# Secret 存储后端（SecretUpdater 通过 get_secrets_client 获取）
+# SECRET_BACKEND 选择后端：
+#   github（默认）：GitHub Actions Secret API 写入，环境变量读取
+#   local        ：本地 GitHub 兼容服务（python -m engine.secret_server），SECRET_API_URL 指定地址
+#   file         ：本地 JSON 文件，SECRET_FILE 指定路径（默认 .state/secrets.json）
+用法：
+client = get_secrets_client("owner/repo", token)
+client.put("NAME", "value")       # "updated" / "unchanged"
+client.read("NAME")
+client.update_many({"A": 1, "B": [2]})
+client.delete("NAME")
+# ==================================================
+"""
+
+DEFAULT_BACKEND = "github"
+
+
+def secret_backend_name() -> str:
+    return (os.getenv("SECRET_BACKEND") or DEFAULT_BACKEND).strip().lower()
+
+
+def serialize_secret(value) -> str:
+    # 支持字符串或 dict/list
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def secret_digest(value) -> str:
+    """内容摘要：JSON 按规范形式（键排序、紧凑分隔）计算，避免格式差异导致误判"""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except (json.JSONDecodeError, TypeError):
+            return sha256(value.encode()).hexdigest()
+    canonical = json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return sha256(canonical.encode()).hexdigest()
+
+
+def read_secret_env(name: str):
+    """
+    读取 Secret 环境变量
+    分片 NAME_0..NAME_n 需在 workflow env 中逐个显式传入，不读取整个 secrets 上下文
+    """
+    return os.getenv(name) or None
+
+
+class SecretsBackend:
+    """
+    Secret 后端基类
+    - put: 内容摘要与上次读取 / 写入一致时跳过，否则调用 _write
+    - update_many: 并发 put 多个 Secret
+    - 子类实现 _write / _remove / read
+    """
+    kind = "base"
+
+    def __init__(self, repo: str):
+        self.repo = repo
+        self._digests = {}
+        self._lock = threading.Lock()
+
+    def _digest_kv(self, name: str) -> str:
+        return f"secret_digest:{self.kind}:{self.repo}:{name}"
+
+    def remember(self, name: str, digest: str):
+        """记录 Secret 当前内容摘要（load 时调用）"""
+        with self._lock:
+            self._digests[name] = digest
+
+    def known_digest(self, name: str):
+        with self._lock:
+            digest = self._digests.get(name)
+        if digest is None:
+            digest = get_state_store().get_kv(self._digest_kv(name))
+        return digest
+
+    def put(self, name: str, value: str, force: bool = False) -> str:
+        """
+        写入单个 Secret，value 为已序列化的字符串
+        返回 "updated"，内容与已知摘要一致时返回 "unchanged"
+        """
+        digest = secret_digest(value)
+        if not force and self.known_digest(name) == digest:
+            print(f"⏸️ Secret {name} 内容未变化，跳过回写")
+            return "unchanged"
+
+        print(f"📤 提交 Secret: {name}")
+        self._write(name, value)
+        print(f"✅ Secret {name} 回写成功")
+        self.remember(name, digest)
+        get_state_store().set_kv(self._digest_kv(name), digest)
+        return "updated"
+
+    def update_many(self, values: dict, max_workers: int = 4, force: bool = False) -> dict:
+        """
+        并发提交多个 Secret（原样写入，不分片；大值请走 SecretUpdater.update）
+        返回 {name: "updated"/"unchanged"}，任一失败时汇总后抛出 RuntimeError
+        """
+        items = [(name, serialize_secret(value), force) for name, value in values.items()]
+        results = run_pool(self.put, items, max_workers=max_workers, label="secrets")
+        errors = [f"{name}: {error}" for (name, _, _), (ok, _, error) in zip(items, results) if not ok]
+        if errors:
+            raise RuntimeError(f"❌ {len(errors)}/{len(items)} 个 Secret 回写失败: {'; '.join(errors)}")
+        return {name: value for (name, _, _), (_, value, _) in zip(items, results)}
+
+    def delete(self, name: str) -> bool:
+        """删除 Secret（不存在视为成功）"""
+        print(f"🗑️ 删除 Secret: {name}")
+        self._remove(name)
+        with self._lock:
+            self._digests.pop(name, None)
+        get_state_store().set_kv(self._digest_kv(name), None)
+        return True
+
+    def read(self, name: str):
+        raise NotImplementedError
+
+    def _write(self, name: str, value: str):
+        raise NotImplementedError
+
+    def _remove(self, name: str):
+        raise NotImplementedError
+
+
+class GitHubSecretsClient(SecretsBackend):
+    """
+    仓库级 GitHub Actions Secret 客户端
+    - 复用一个带连接池的 requests.Session
+    - 公钥缓存：整个进程只请求一次 public-key，PUT 返回 422（key_id 过期）时刷新重试
+    - Secret 无法通过 API 读回，read 从环境变量读取
+    """
+    kind = "github"
+    API = "https://api.github.com"
+
+    def __init__(self, repo: str, token: str, pool_size: int = 4, api: str = None):
+        super().__init__(repo)
+        self.api = (api or self.API).rstrip("/")
+        self.session = requests.Session()
+        self.session.headers.update({
+            "Authorization": f"Bearer {token}",
+            "Accept": "application/vnd.github+json",
+        })
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._key = None
+
+    def _url(self, suffix: str) -> str:
+        return f"{self.api}/repos/{self.repo}/actions/secrets/{suffix}"
+
+    def public_key(self, refresh: bool = False) -> dict:
+        with self._lock:
+            if self._key is None or refresh:
+                print(f"🌐 获取仓库公钥: {self.repo}")
+                r = self.session.get(self._url("public-key"), timeout=30)
+                r.raise_for_status()
+                self._key = r.json()
+            return self._key
+
+    def _seal_put(self, name: str, value: str, key: dict):
+        pk = public.PublicKey(key["key"].encode(), encoding.Base64Encoder())
+        encrypted = public.SealedBox(pk).encrypt(value.encode())
+        return self.session.put(
+            self._url(name),
+            json={
+                "encrypted_value": base64.b64encode(encrypted).decode(),
+                "key_id": key["key_id"],
+            },
+            timeout=30,
+        )
+
+    def _write(self, name: str, value: str):
+        r = self._seal_put(name, value, self.public_key())
+        if r.status_code == 422:
+            # 公钥已轮换，刷新后重试一次
+            print("🔄 公钥 key_id 已失效，刷新后重试")
+            r = self._seal_put(name, value, self.public_key(refresh=True))
+        if r.status_code not in (201, 204):
+            raise RuntimeError(f"❌ Secret {name} 回写失败 HTTP {r.status_code}: {r.text}")
+
+    def _remove(self, name: str):
+        r = self.session.delete(self._url(name), timeout=30)
+        if r.status_code not in (204, 404):
+            raise RuntimeError(f"❌ Secret {name} 删除失败 HTTP {r.status_code}: {r.text}")
+
+    def read(self, name: str):
+        return read_secret_env(name)
+
+
+class LocalSecretsClient(GitHubSecretsClient):
+    """
+    本地 GitHub 兼容服务客户端（engine/secret_server.py）
+    写入流程与 GitHub 完全一致（公钥加密 + PUT），额外通过 /value 接口读回明文
+    """
+    kind = "local"
+    API = "http://127.0.0.1:8787"
+
+    def __init__(self, repo: str, token: str, pool_size: int = 4, api: str = None):
+        super().__init__(repo, token, pool_size, api or os.getenv("SECRET_API_URL") or self.API)
+
+    def read(self, name: str):
+        r = self.session.get(self._url(f"{name}/value"), timeout=30)
+        if r.status_code == 404:
+            return None
+        r.raise_for_status()
+        return r.json().get("value")
+
+
+class FileSecretsBackend(SecretsBackend):
+    """
+    本地 JSON 文件后端：{仓库: {名称: 值}}，明文存储，仅用于离线调试 / 基准测试
+    """
+    kind = "file"
+
+    def __init__(self, repo: str, path=None):
+        super().__init__(repo)
+        self.path = Path(path or os.getenv("SECRET_FILE") or STATE_DIR / "secrets.json")
+        self._file_lock = threading.Lock()
+
+    def _load_all(self) -> dict:
+        try:
+            return json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _save_all(self, data: dict):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, self.path)
+
+    def _write(self, name: str, value: str):
+        with self._file_lock:
+            data = self._load_all()
+            data.setdefault(self.repo, {})[name] = value
+            self._save_all(data)
+
+    def _remove(self, name: str):
+        with self._file_lock:
+            data = self._load_all()
+            if data.get(self.repo, {}).pop(name, None) is not None:
+                self._save_all(data)
+
+    def read(self, name: str):
+        with self._file_lock:
+            return self._load_all().get(self.repo, {}).get(name)
+
+
+BACKENDS = {
+    "github": GitHubSecretsClient,
+    "local": LocalSecretsClient,
+    "file": lambda repo, token: FileSecretsBackend(repo),
+}
+
+_secret_clients = {}
+_secret_clients_lock = threading.Lock()
+
+
+def get_secrets_client(repo: str, token: str, backend: str = None) -> SecretsBackend:
+    """同一后端 + 仓库 + token 共享一个客户端（公钥与连接复用）"""
+    backend = backend or secret_backend_name()
+    if backend not in BACKENDS:
+        raise RuntimeError(f"❌ 不支持的 SECRET_BACKEND: {backend}")
+    with _secret_clients_lock:
+        client = _secret_clients.get((backend, repo, token))
+        if client is None:
+            client = BACKENDS[backend](repo, token)
+            _secret_clients[(backend, repo, token)] = client
+        return client
@@ -0,0 +1,240 @@
+# engine/secret_server.py
+# -*- coding: utf-8 -*-
+import os
+import re
+import sys
+import json
+import time
+import base64
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from nacl import public, encoding
+
+"""
+# ==================================================
+# 本地 GitHub Secrets 替身服务（离线调试 / 基准测试）
+# 实现与 GitHub 一致的接口：
+#   GET    /repos/{owner}/{repo}/actions/secrets/public-key
+#   PUT    /repos/{owner}/{repo}/actions/secrets/{name}     {"encrypted_value", "key_id"}
+#   GET    /repos/{owner}/{repo}/actions/secrets/{name}
+#   DELETE /repos/{owner}/{repo}/actions/secrets/{name}
+# 替身扩展：
+#   GET    /repos/{owner}/{repo}/actions/secrets/{name}/value   读回明文
+#   POST   /_admin/rotate                                       轮换公钥（旧 key_id 返回 422）
+用法：
+python -m engine.secret_server serve --port 8787 --file .state/secret_server.json
+SECRET_BACKEND=local SECRET_API_URL=http://127.0.0.1:8787 python -u leaflow/leaflow_check.py
+
+# 端到端写入 / 读回基准（自动启动服务）
+python -m engine.secret_server bench
+# ==================================================
+"""
+
+_PATH_RE = re.compile(r"^/repos/([^/]+/[^/]+)/actions/secrets/([^/]+)(/value)?$")
+
+
+class SecretStore:
+    """替身服务的内存存储，可选持久化到 JSON 文件（只保存明文值，密钥每次启动重新生成）"""
+    def __init__(self, path=None, latency_ms: int = 0):
+        self.path = path
+        self.latency = latency_ms / 1000
+        self.lock = threading.Lock()
+        self.secrets = {}
+        self.rotate()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.secrets = json.load(f)
+
+    def rotate(self):
+        with self.lock:
+            self.private_key = public.PrivateKey.generate()
+            self.key_id = str(int(time.time() * 1000))
+
+    def public_key(self) -> dict:
+        return {
+            "key_id": self.key_id,
+            "key": self.private_key.public_key.encode(encoding.Base64Encoder()).decode(),
+        }
+
+    def put(self, repo: str, name: str, encrypted_value: str, key_id: str) -> int:
+        with self.lock:
+            if key_id != self.key_id:
+                return 422
+            value = public.SealedBox(self.private_key).decrypt(base64.b64decode(encrypted_value)).decode()
+            repo_secrets = self.secrets.setdefault(repo, {})
+            status = 204 if name in repo_secrets else 201
+            now = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            created = repo_secrets.get(name, {}).get("created_at", now)
+            repo_secrets[name] = {"value": value, "created_at": created, "updated_at": now}
+            self._save()
+            return status
+
+    def get(self, repo: str, name: str):
+        with self.lock:
+            return self.secrets.get(repo, {}).get(name)
+
+    def delete(self, repo: str, name: str) -> bool:
+        with self.lock:
+            found = self.secrets.get(repo, {}).pop(name, None) is not None
+            if found:
+                self._save()
+            return found
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.secrets, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+class SecretHandler(BaseHTTPRequestHandler):
+    store: SecretStore = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _reply(self, status: int, body=None):
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        if data:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def _route(self):
+        if self.store.latency:
+            time.sleep(self.store.latency)
+        m = _PATH_RE.match(self.path.split("?")[0])
+        return (m.group(1), m.group(2), bool(m.group(3))) if m else (None, None, False)
+
+    def do_GET(self):
+        repo, name, want_value = self._route()
+        if name == "public-key":
+            return self._reply(200, self.store.public_key())
+        item = self.store.get(repo, name) if repo else None
+        if item is None:
+            return self._reply(404, {"message": "Not Found"})
+        if want_value:
+            return self._reply(200, {"name": name, "value": item["value"]})
+        return self._reply(200, {"name": name, "created_at": item["created_at"], "updated_at": item["updated_at"]})
+
+    def do_PUT(self):
+        repo, name, _ = self._route()
+        if not repo:
+            return self._reply(404, {"message": "Not Found"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+            status = self.store.put(repo, name, body["encrypted_value"], body["key_id"])
+        except Exception as e:
+            return self._reply(400, {"message": f"Bad Request: {e}"})
+        if status == 422:
+            return self._reply(422, {"message": "Bad request - key_id mismatch"})
+        self._reply(status)
+
+    def do_DELETE(self):
+        repo, name, _ = self._route()
+        self._reply(204 if repo and self.store.delete(repo, name) else 404)
+
+    def do_POST(self):
+        if self.path == "/_admin/rotate":
+            self.store.rotate()
+            return self._reply(200, {"key_id": self.store.key_id})
+        self._reply(404, {"message": "Not Found"})
+
+
+def start_secret_server(host: str = "127.0.0.1", port: int = 0, path=None, latency_ms: int = 0):
+    """后台线程启动替身服务，返回 server（server.url 为访问地址）"""
+    handler = type("BoundSecretHandler", (SecretHandler,), {"store": SecretStore(path, latency_ms)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.url = f"http://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, name="secret_server", daemon=True).start()
+    print(f"🧪 Secrets 替身服务已启动: {server.url}")
+    return server
+
+
+def bench(sizes_kb=None, rounds: int = 3, latency_ms: int = 0) -> list[dict]:
+    """
+    端到端基准：SecretUpdater 写入（含分片）+ 读回，全程走本地替身服务
+    sizes_kb 默认覆盖单片 / 多片，最大值留在 SHARD_SIZE * MAX_SHARDS 之内
+    返回 [{"size_kb", "shards", "write_ms", "read_ms"}]
+    """
+    from engine.main import SecretUpdater, SHARD_SIZE, MAX_SHARDS
+
+    if sizes_kb is None:
+        # 预留 10 KB 给 JSON 包装，避免超过分片上限
+        sizes_kb = (4, 32, 96, SHARD_SIZE * MAX_SHARDS // 1024 - 10)
+
+    server = start_secret_server(latency_ms=latency_ms)
+    os.environ.update({
+        "SECRET_BACKEND": "local",
+        "SECRET_API_URL": server.url,
+        "GITHUB_REPOSITORY": os.getenv("GITHUB_REPOSITORY") or "bench/secrets",
+    })
+    rows = []
+    try:
+        for size in sizes_kb:
+            value = {"blob": "x" * (size * 1024)}
+            write_costs, read_costs = [], []
+            for i in range(rounds):
+                updater = SecretUpdater(f"BENCH_{size}KB")
+                value["round"] = i
+                start = time.perf_counter()
+                updater.update(value, force=True)
+                write_costs.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                loaded = SecretUpdater(f"BENCH_{size}KB").load()
+                read_costs.append((time.perf_counter() - start) * 1000)
+                if loaded != value:
+                    raise RuntimeError(f"❌ 读回内容不一致: {size} KB")
+            rows.append({
+                "size_kb": size,
+                "shards": updater._shards,
+                "write_ms": sum(write_costs) / rounds,
+                "read_ms": sum(read_costs) / rounds,
+            })
+    finally:
+        server.shutdown()
+
+    print(f"{'大小(KB)':>10}{'分片':>6}{'写入(ms)':>12}{'读回(ms)':>12}")
+    for r in rows:
+        print(f"{r['size_kb']:>10}{r['shards']:>6}{r['write_ms']:>12.1f}{r['read_ms']:>12.1f}")
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="本地 GitHub Secrets 替身服务")
+    sub = parser.add_subparsers(dest="cmd")
+    serve = sub.add_parser("serve", help="启动服务")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8787)
+    serve.add_argument("--file", help="持久化 JSON 文件")
+    serve.add_argument("--latency", type=int, default=0, help="每个请求额外延迟（毫秒）")
+    b = sub.add_parser("bench", help="端到端写入 / 读回基准")
+    b.add_argument("--rounds", type=int, default=3)
+    b.add_argument("--latency", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.cmd == "serve":
+        server = start_secret_server(args.host, args.port, args.file, args.latency)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+    elif args.cmd == "bench":
+        bench(rounds=args.rounds, latency_ms=args.latency)
+    else:
+        parser.print_help()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+# engine/state.py
+# -*- coding: utf-8 -*-
+import os
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+"""
+# ==================================================
+# 本地运行状态存储（SQLite）
+用法：
+store = get_state_store()
+
+# 账号会话
+store.save_session("leaflow", "a@b.com", blob)
+blob = store.load_session("leaflow", "a@b.com")
+
+# 签到结果（按北京时间业务日）
+store.record_result("leaflow", "a@b.com", ok=True, amount=0.5)
+store.last_success("leaflow", "a@b.com")
+
+# 步骤耗时
+with store.timer("leaflow", "a@b.com", "login"):
+    ...
+store.timing_summary("leaflow", days=7)
+# 数据库默认位于 <仓库>/.state/run_state.db，可用 STATE_DIR 覆盖（导入时读取）
+# 进程内切换数据库：set_state_store(StateStore(path=...))
+# GitHub Actions 中通过 actions/cache 在多次运行间保留
+# ==================================================
+"""
+
+STATE_DIR = Path(os.getenv("STATE_DIR") or Path(__file__).resolve().parent.parent / ".state")
+BEIJING_TZ = timezone(timedelta(hours=8))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    task TEXT NOT NULL,
+    account TEXT NOT NULL,
+    blob TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (task, account)
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    account TEXT NOT NULL,
+    day TEXT NOT NULL,
+    ok INTEGER NOT NULL,
+    amount REAL,
+    reason TEXT,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_lookup ON results (task, account, day);
+CREATE TABLE IF NOT EXISTS timings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    task TEXT NOT NULL,
+    account TEXT NOT NULL,
+    step TEXT NOT NULL,
+    seconds REAL NOT NULL,
+    ts REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_timings_lookup ON timings (task, step, ts);
+CREATE TABLE IF NOT EXISTS kv (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    updated_at REAL NOT NULL
+);
+"""
+
+
+def business_day(ts: float = None) -> str:
+    """北京时间业务日 YYYY-MM-DD"""
+    dt = datetime.fromtimestamp(ts if ts is not None else time.time(), BEIJING_TZ)
+    return dt.strftime("%Y-%m-%d")
+
+
+class StateStore:
+    """
+    运行状态存储
+    - sessions: 每个任务 / 账号的会话数据
+    - results: 每次执行结果（成功、签到金额、失败原因）
+    - timings: 步骤耗时，用于跨运行的性能回归追踪
+    - kv: 其他小型键值（如缓存摘要）
+    单连接 + 锁，支持多线程写入
+    """
+    def __init__(self, path=None):
+        self.path = Path(path) if path else STATE_DIR / "run_state.db"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    def _write(self, sql: str, params: tuple):
+        with self._lock:
+            self._conn.execute(sql, params)
+            self._conn.commit()
+
+    def _read(self, sql: str, params: tuple) -> list[dict]:
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(sql, params).fetchall()]
+
+    # ================================
+    # 会话
+    # ================================
+    def save_session(self, task: str, account: str, blob: str):
+        self._write(
+            "INSERT OR REPLACE INTO sessions (task, account, blob, updated_at) VALUES (?, ?, ?, ?)",
+            (task, account, blob, time.time()),
+        )
+
+    def load_session(self, task: str, account: str):
+        rows = self._read(
+            "SELECT blob FROM sessions WHERE task = ? AND account = ?",
+            (task, account),
+        )
+        return rows[0]["blob"] if rows else None
+
+    # ================================
+    # 执行结果
+    # ================================
+    def record_result(self, task: str, account: str, ok: bool, amount: float = None, reason: str = None, day: str = None):
+        self._write(
+            "INSERT INTO results (task, account, day, ok, amount, reason, ts) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (task, account, day or business_day(), int(bool(ok)), amount, reason, time.time()),
+        )
+
+    def last_success(self, task: str, account: str):
+        rows = self._read(
+            "SELECT * FROM results WHERE task = ? AND account = ? AND ok = 1 ORDER BY ts DESC LIMIT 1",
+            (task, account),
+        )
+        return rows[0] if rows else None
+
+    def results_for(self, task: str, account: str = None, day: str = None) -> list[dict]:
+        sql = "SELECT * FROM results WHERE task = ?"
+        params = [task]
+        if account:
+            sql += " AND account = ?"
+            params.append(account)
+        if day:
+            sql += " AND day = ?"
+            params.append(day)
+        return self._read(sql + " ORDER BY ts", tuple(params))
+
+    def daily_amounts(self, task: str, account: str, days: int = 30) -> dict:
+        """最近 N 天每日签到金额，用于趋势图"""
+        since = business_day(time.time() - days * 86400)
+        rows = self._read(
+            "SELECT day, SUM(amount) AS amount FROM results "
+            "WHERE task = ? AND account = ? AND ok = 1 AND amount IS NOT NULL AND day >= ? "
+            "GROUP BY day ORDER BY day",
+            (task, account, since),
+        )
+        return {r["day"]: r["amount"] for r in rows}
+
+    # ================================
+    # 步骤耗时
+    # ================================
+    def record_timing(self, task: str, account: str, step: str, seconds: float):
+        self._write(
+            "INSERT INTO timings (task, account, step, seconds, ts) VALUES (?, ?, ?, ?, ?)",
+            (task, account, step, seconds, time.time()),
+        )
+
+    @contextmanager
+    def timer(self, task: str, account: str, step: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record_timing(task, account, step, time.monotonic() - start)
+
+    def timing_summary(self, task: str, days: int = 7) -> list[dict]:
+        """最近 N 天各步骤耗时统计（次数 / 平均 / 最大）"""
+        return self._read(
+            "SELECT step, COUNT(*) AS runs, AVG(seconds) AS avg_s, MAX(seconds) AS max_s "
+            "FROM timings WHERE task = ? AND ts >= ? GROUP BY step ORDER BY step",
+            (task, time.time() - days * 86400),
+        )
+
+    # ================================
+    # 键值
+    # ================================
+    def get_kv(self, key: str):
+        rows = self._read("SELECT value FROM kv WHERE key = ?", (key,))
+        return rows[0]["value"] if rows else None
+
+    def set_kv(self, key: str, value: str):
+        self._write(
+            "INSERT OR REPLACE INTO kv (key, value, updated_at) VALUES (?, ?, ?)",
+            (key, value, time.time()),
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """进程级共享状态存储"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = StateStore()
+    return _store
+
+
+def set_state_store(store):
+    """替换进程级状态存储（本地替身 / 测试隔离用），返回原实例"""
+    global _store
+    with _store_lock:
+        previous, _store = _store, store
+    return previous
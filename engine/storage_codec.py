@@ -0,0 +1,163 @@
+# engine/storage_codec.py
+# -*- coding: utf-8 -*-
+import json
+import zlib
+import base64
+
+"""
+# ==================================================
+# storage_state 编解码（*_LOCALS Secret）
+用法：
+# 单账号：瘦身 + 压缩
+local = encode_state(slim_storage_state(state, cookie_domains=["claw.cloud"]))
+state = decode_state(local)          # 兼容旧的 base64(JSON)
+
+# 整个 Secret：跨账号去重共享 cookie 后整体压缩
+locals_ = unpack_locals(secret.load())   # {用户名: 单账号编码}，兼容旧 dict 格式
+locals_[username] = local
+secret.update(pack_locals(locals_, name="CLAWCLOUD_LOCALS"))
+
+# 格式（前缀即版本）
+#   z1:<base64(zlib(JSON))>          单账号 storage_state
+#   zl1:<base64(zlib(JSON))>         整个 Secret：{"v": 1, "shared": [cookie...], "accounts": {...}}
+#                                    accounts 中的 cookie 若为整数，表示 shared 中的下标
+#   其他字符串按旧格式 base64(JSON) 解析
+# ==================================================
+"""
+
+STATE_PREFIX = "z1:"
+LOCALS_PREFIX = "zl1:"
+# GitHub 单个 Secret 上限 48 KB
+SECRET_LIMIT = 48 * 1024
+ESSENTIAL_KEYS = ("session", "lastLoginUpdateTime", "i18nextLng")
+
+
+def _compress(obj) -> str:
+    raw = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return base64.b64encode(zlib.compress(raw, 9)).decode("ascii")
+
+
+def _decompress(data: str):
+    return json.loads(zlib.decompress(base64.b64decode(data)).decode("utf-8"))
+
+
+def slim_storage_state(state, cookie_domains=(), essential_keys=ESSENTIAL_KEYS):
+    """
+    精简 storage_state，只保留核心登录凭据
+    - cookie_domains: 只保留 domain 包含其中任一项的 cookie，空则全部保留
+    - essential_keys: localStorage 只保留这些键
+    """
+    if not isinstance(state, dict):
+        return state
+
+    state = dict(state)
+    if cookie_domains and "cookies" in state:
+        state["cookies"] = [
+            c for c in state["cookies"]
+            if any(d in c.get("domain", "") for d in cookie_domains)
+        ]
+
+    if "origins" in state:
+        state["origins"] = [
+            dict(o, localStorage=[
+                item for item in o.get("localStorage", [])
+                if item.get("name") in essential_keys
+            ])
+            for o in state["origins"]
+        ]
+    return state
+
+
+def encode_state(state) -> str:
+    return STATE_PREFIX + _compress(state)
+
+
+def decode_state(data):
+    """单账号编码 -> storage_state dict，失败返回 None"""
+    if isinstance(data, dict):
+        return data
+    if not data or not isinstance(data, str):
+        return None
+    try:
+        if data.startswith(STATE_PREFIX):
+            return _decompress(data[len(STATE_PREFIX):])
+        return json.loads(base64.b64decode(data).decode("utf-8"))
+    except Exception as e:
+        print(f"⚠️ storage_state 解码失败: {e}")
+        return None
+
+
+def _cookie_key(cookie: dict) -> str:
+    return json.dumps(cookie, sort_keys=True, separators=(",", ":"))
+
+
+def pack_locals(locals_: dict, name: str = "LOCALS") -> str:
+    """
+    {用户名: 单账号编码 / storage_state} -> 整个 Secret 的压缩字符串
+    在多个账号中完全相同的 cookie 只保存一份
+    """
+    states = {}
+    for user, data in (locals_ or {}).items():
+        state = decode_state(data)
+        if state is not None:
+            states[user] = state
+
+    counts = {}
+    for state in states.values():
+        for c in {_cookie_key(c) for c in state.get("cookies", [])}:
+            counts[c] = counts.get(c, 0) + 1
+    shared_keys = sorted(k for k, n in counts.items() if n > 1)
+    index = {k: i for i, k in enumerate(shared_keys)}
+
+    accounts = {}
+    for user, state in states.items():
+        cookies = [index.get(_cookie_key(c), c) for c in state.get("cookies", [])]
+        accounts[user] = dict(state, cookies=cookies)
+
+    packed = LOCALS_PREFIX + _compress({
+        "v": 1,
+        "shared": [json.loads(k) for k in shared_keys],
+        "accounts": accounts,
+    })
+    report_headroom(name, packed, accounts=len(accounts), shared=len(shared_keys))
+    return packed
+
+
+def unpack_locals(data) -> dict:
+    """
+    Secret 内容 -> {用户名: 单账号编码}
+    兼容旧格式 {用户名: base64(JSON)}，异常时返回空 dict
+    """
+    if isinstance(data, dict):
+        return data
+    if not data or not isinstance(data, str) or not data.startswith(LOCALS_PREFIX):
+        if data:
+            print("⚠️ 无法识别的 LOCALS 格式，忽略")
+        return {}
+    try:
+        payload = _decompress(data[len(LOCALS_PREFIX):])
+    except Exception as e:
+        print(f"⚠️ LOCALS 解码失败: {e}")
+        return {}
+
+    shared = payload.get("shared", [])
+    result = {}
+    for user, state in payload.get("accounts", {}).items():
+        cookies = [shared[c] if isinstance(c, int) else c for c in state.get("cookies", [])]
+        result[user] = encode_state(dict(state, cookies=cookies))
+    return result
+
+
+def report_headroom(name: str, packed: str, **extra) -> dict:
+    size = len(packed.encode("utf-8"))
+    report = {
+        "name": name,
+        "size_kb": round(size / 1024, 2),
+        "limit_kb": SECRET_LIMIT // 1024,
+        "headroom_pct": round((1 - size / SECRET_LIMIT) * 100, 1),
+        **extra,
+    }
+    icon = "⚠️" if size > SECRET_LIMIT * 0.8 else "📦"
+    detail = "".join(f", {k}={v}" for k, v in extra.items())
+    print(f"{icon} {name}: {report['size_kb']} KB / {report['limit_kb']} KB，剩余 {report['headroom_pct']}%{detail}")
+    return report
@@ -0,0 +1,309 @@
+# engine/tunnel.py
+# -*- coding: utf-8 -*-
+import atexit
+import socket
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+"""
+# ==================================================
+# Gost 隧道管理
+用法：
+proxy = {"server": "1.2.3.4", "port": 1080, "username": "u", "password": "p"}
+
+with GostTunnel(proxy) as tunnel:
+    print(tunnel.local_url)   # http://127.0.0.1:<随机空闲端口>
+    requests.get(url, proxies=tunnel.proxies)
+# 退出 with 自动关闭 gost
+
+# 多任务共享：同一上游代理只启动一个 gost
+pool = get_tunnel_pool()
+with pool.lease(proxy) as tunnel:
+    ...
+print(pool.stats())                    # 已关闭隧道的延迟 / 出口 IP / 使用次数仍保留
+
+# 默认引用归零即关闭 gost；按代理顺序跑多个账号的脚本开启 keep_idle 复用隧道，结束时统一关闭
+pool = get_tunnel_pool(keep_idle=True)
+...
+pool.close_all()
+# ==================================================
+"""
+
+GOST_BIN = "./gost"
+READY_TIMEOUT = 10     # 等待本地端口就绪的最长秒数
+PROBE_INTERVAL = 0.05  # 端口探测间隔
+IP_CHECK_URL = "https://api.ipify.org"
+
+
+def free_port() -> int:
+    """向系统申请一个当前空闲的本地端口"""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_port(port: int, host: str = "127.0.0.1", timeout: float = READY_TIMEOUT, proc=None) -> float:
+    """
+    轮询 TCP 连接直到端口可连接
+    - proc: 可选 Popen，进程提前退出时立即失败
+    返回: 就绪耗时（秒）
+    """
+    start = time.monotonic()
+    deadline = start + timeout
+    while True:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError(f"❌ gost 进程已退出，返回码 {proc.returncode}")
+        try:
+            with socket.create_connection((host, port), timeout=PROBE_INTERVAL * 4):
+                return time.monotonic() - start
+        except OSError:
+            pass
+        if time.monotonic() >= deadline:
+            raise TimeoutError(f"❌ 本地端口 {host}:{port} 在 {timeout}s 内未就绪")
+        time.sleep(PROBE_INTERVAL)
+
+
+def build_remote(proxy: dict, scheme: str = "socks5") -> str:
+    """proxy dict -> gost -F 上游地址"""
+    auth = ""
+    if proxy.get("username") and proxy.get("password"):
+        auth = f"{proxy['username']}:{proxy['password']}@"
+    return f"{scheme}://{auth}{proxy['server']}:{proxy['port']}"
+
+
+class GostTunnel:
+    """
+    单条 gost 隧道
+    - 自动选择空闲端口，避免并发账号端口冲突
+    - 仅监听 127.0.0.1，不向外网暴露未鉴权的代理端口
+    - 以 TCP 探测代替固定 sleep，就绪即返回
+    - 支持 with 上下文自动清理
+    """
+    def __init__(self, proxy: dict, port: int = None, timeout: float = READY_TIMEOUT):
+        self.proxy = proxy
+        self.port = port
+        self.timeout = timeout
+        self.proc = None
+        self.ready_seconds = None
+
+    @property
+    def local_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def proxies(self) -> dict:
+        return {"http": self.local_url, "https": self.local_url}
+
+    def start(self):
+        if self.proc is not None:
+            return self
+
+        self.port = self.port or free_port()
+        remote = build_remote(self.proxy)
+        print(f"🚇 启动 gost 隧道: 127.0.0.1:{self.port} -> ***{self.proxy['server']}:{self.proxy['port']}")
+
+        self.proc = subprocess.Popen(
+            [GOST_BIN, f"-L=http://127.0.0.1:{self.port}", f"-F={remote}"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        try:
+            self.ready_seconds = wait_port(self.port, timeout=self.timeout, proc=self.proc)
+        except Exception:
+            self.stop()
+            raise
+
+        print(f"✅ 隧道端口就绪: {self.port}，耗时 {self.ready_seconds * 1000:.0f} ms")
+        return self
+
+    def stop(self):
+        if self.proc is None:
+            return
+        self.proc.terminate()
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+            self.proc.wait()
+        self.proc = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+        return False
+
+
+# ==================================================
+# 隧道池：一个上游代理一个 gost，多账号 / 多任务复用
+# ==================================================
+def proxy_key(proxy: dict) -> tuple:
+    return (
+        str(proxy.get("server")),
+        str(proxy.get("port")),
+        str(proxy.get("username") or ""),
+    )
+
+
+class _TunnelStats:
+    """单个上游代理的累计统计，隧道关闭后仍保留，供 stats() 汇总"""
+    def __init__(self):
+        self.uses = 0
+        self.starts = 0
+        self.ready_ms = None
+        self.latency_ms = None
+        self.egress_ip = None
+        self.healthy = None
+        self.last_error = None
+
+
+class _PoolEntry:
+    def __init__(self, proxy: dict, stats: _TunnelStats):
+        self.tunnel = GostTunnel(proxy)
+        self.lock = threading.Lock()
+        self.refs = 0
+        self.stats = stats
+
+
+class TunnelPool:
+    """
+    gost 隧道池
+    - acquire / release 引用计数，同一上游代理只启动一个 gost
+    - 默认引用归零即关闭 gost，不留空闲进程
+    - keep_idle=True（调用方显式开启）时引用归零不关闭，供后续账号复用，进程退出时统一清理
+    - probe() 记录出口 IP 与延迟，stats() 输出健康信息（隧道关闭后统计仍保留）
+    """
+    def __init__(self, keep_idle: bool = False):
+        self.keep_idle = keep_idle
+        self._entries = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, proxy: dict) -> _PoolEntry:
+        key = proxy_key(proxy)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _PoolEntry(proxy, self._stats.setdefault(key, _TunnelStats()))
+                self._entries[key] = entry
+            entry.refs += 1
+            entry.stats.uses += 1
+            return entry
+
+    def acquire(self, proxy: dict) -> GostTunnel:
+        entry = self._entry(proxy)
+        try:
+            # 同一代理并发获取时只启动一次，其他线程等待就绪
+            with entry.lock:
+                if entry.tunnel.proc is None or entry.tunnel.proc.poll() is not None:
+                    entry.tunnel.proc = None
+                    entry.tunnel.start()
+                    entry.stats.starts += 1
+                    entry.stats.ready_ms = round(entry.tunnel.ready_seconds * 1000)
+                else:
+                    print(f"♻️ 复用 gost 隧道: {entry.tunnel.port} (引用 {entry.refs})")
+        except Exception as e:
+            entry.stats.healthy = False
+            entry.stats.last_error = str(e)
+            self.release(proxy)
+            raise
+        return entry.tunnel
+
+    def release(self, proxy: dict):
+        key = proxy_key(proxy)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.refs = max(0, entry.refs - 1)
+            if entry.refs or self.keep_idle:
+                return
+            del self._entries[key]
+        entry.tunnel.stop()
+
+    @contextmanager
+    def lease(self, proxy: dict):
+        tunnel = self.acquire(proxy)
+        try:
+            yield tunnel
+        finally:
+            self.release(proxy)
+
+    def probe(self, proxy: dict, timeout: float = 15) -> str:
+        """经隧道访问 IP_CHECK_URL，记录延迟与出口 IP，失败抛出异常"""
+        with self._lock:
+            entry = self._entries.get(proxy_key(proxy))
+        if entry is None:
+            raise RuntimeError("❌ 隧道未在池中，请先 acquire")
+
+        start = time.monotonic()
+        try:
+            res = requests.get(IP_CHECK_URL, proxies=entry.tunnel.proxies, timeout=timeout)
+            res.raise_for_status()
+        except Exception as e:
+            entry.stats.healthy = False
+            entry.stats.last_error = str(e)
+            raise
+        stats = entry.stats
+        stats.latency_ms = (time.monotonic() - start) * 1000
+        stats.egress_ip = res.text.strip()
+        stats.healthy = True
+        stats.last_error = None
+        print(f"✅ 隧道就绪，出口 IP: {stats.egress_ip}，延迟 {stats.latency_ms:.0f} ms")
+        return stats.egress_ip
+
+    def stats(self) -> list[dict]:
+        """本次运行用过的全部上游代理（含已关闭的隧道）"""
+        with self._lock:
+            records = list(self._stats.items())
+            entries = dict(self._entries)
+        result = []
+        for key, st in records:
+            e = entries.get(key)
+            result.append({
+                "upstream": f"***{key[0]}:{key[1]}",
+                "port": e.tunnel.port if e else None,
+                "alive": bool(e and e.tunnel.proc is not None and e.tunnel.proc.poll() is None),
+                "refs": e.refs if e else 0,
+                "uses": st.uses,
+                "starts": st.starts,
+                "ready_ms": st.ready_ms,
+                "latency_ms": round(st.latency_ms) if st.latency_ms else None,
+                "egress_ip": st.egress_ip,
+                "healthy": st.healthy,
+                "last_error": st.last_error,
+            })
+        return result
+
+    def close_all(self):
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            entry.tunnel.stop()
+        if entries:
+            print(f"🧹 已关闭 {len(entries)} 条 gost 隧道")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tunnel_pool(keep_idle: bool = False) -> TunnelPool:
+    """
+    进程级共享隧道池，退出时自动关闭所有 gost
+    keep_idle=True 时保留空闲隧道供后续账号复用（一旦开启对整个进程生效）
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = TunnelPool(keep_idle=keep_idle)
+            atexit.register(_pool.close_all)
+        elif keep_idle:
+            _pool.keep_idle = True
+    return _pool
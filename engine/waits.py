@@ -0,0 +1,111 @@
+# engine/waits.py
+# -*- coding: utf-8 -*-
+import re
+import time
+
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+"""
+# ==================================================
+# 事件驱动等待：条件满足立即返回，超时才走慢路径
+用法：
+# 等待 URL 离开登录页
+if wait_for_url_change(page, LOGIN_URL, timeout=60000): ...
+
+# 等待多个选择器中任意一个出现
+hit = wait_for_any_selector(page, {"done": "div.ok", "button": "button.go"}, timeout=60000)
+
+# 执行动作并等待某个接口返回
+resp = wait_for_response(page, r"/api/checkin", lambda: btn.click(), timeout=30000)
+
+# 任意条件轮询
+wait_until(lambda: page.locator("div.ok").count() > 0, timeout=15000, page=page)
+# 所有 timeout 单位均为毫秒，与 Playwright 保持一致
+# ==================================================
+"""
+
+POLL_INTERVAL = 250  # 轮询间隔（毫秒）
+
+
+def wait_until(predicate, timeout: int, interval: int = POLL_INTERVAL, page=None):
+    """
+    轮询 predicate 直到返回真值或超时
+    - page: 传入时用 page.wait_for_timeout 让出事件循环，否则 time.sleep
+    返回: predicate 的真值结果，超时返回 None
+    """
+    deadline = time.monotonic() + timeout / 1000
+    while True:
+        try:
+            result = predicate()
+        except Exception:
+            result = None
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        pause = min(interval, remaining * 1000)
+        if page is not None:
+            page.wait_for_timeout(pause)
+        else:
+            time.sleep(pause / 1000)
+
+
+def settle(page, state: str = "networkidle", timeout: int = 30000) -> bool:
+    """等待加载状态，超时不抛异常，返回是否按时完成"""
+    try:
+        page.wait_for_load_state(state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def wait_for_url_change(page, old_url: str, timeout: int) -> bool:
+    """等待 URL 不再包含 old_url（如离开登录页），返回是否发生跳转"""
+    marker = old_url.lower()
+    try:
+        page.wait_for_url(lambda url: marker not in url.lower(), timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def wait_for_url_match(page, pattern: str, timeout: int) -> bool:
+    """等待 URL 匹配正则，返回是否匹配"""
+    regex = re.compile(pattern, re.IGNORECASE)
+    try:
+        page.wait_for_url(regex, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+def wait_for_any_selector(page, selectors: dict, timeout: int, state: str = "visible"):
+    """
+    等待多个选择器中任意一个出现
+    - selectors: {名称: 选择器}
+    返回: 命中的名称，超时返回 None
+    """
+    combined = ", ".join(selectors.values())
+    try:
+        page.wait_for_selector(combined, state=state, timeout=timeout)
+    except PlaywrightTimeoutError:
+        return None
+    for name, selector in selectors.items():
+        if page.locator(selector).count() > 0:
+            return name
+    return None
+
+
+def wait_for_response(page, url_pattern: str, action, timeout: int):
+    """
+    执行 action 并等待匹配 url_pattern 的响应
+    返回: Response 对象，超时返回 None
+    """
+    regex = re.compile(url_pattern)
+    try:
+        with page.expect_response(lambda r: bool(regex.search(r.url)), timeout=timeout) as info:
+            action()
+        return info.value
+    except PlaywrightTimeoutError:
+        return None
@@ -0,0 +1,91 @@
+# engine/worker_pool.py
+# -*- coding: utf-8 -*-
+import os
+import queue
+import threading
+
+"""
+# ==================================================
+# 多账号并发执行
+用法：
+def task(account, proxy):
+    ...
+    return ok, msg
+
+results = run_pool(task, list(zip(accounts, proxies)), max_workers=3)
+# results 与输入顺序一致，每项为 (ok, value, error)
+# ==================================================
+"""
+
+DEFAULT_WORKERS = 3
+
+
+def get_max_workers(env_name: str = "MAX_WORKERS", default: int = DEFAULT_WORKERS) -> int:
+    """从环境变量读取并发数，非法值回退到默认值"""
+    raw = os.getenv(env_name, "").strip()
+    if not raw:
+        return default
+    try:
+        return max(1, int(raw))
+    except ValueError:
+        print(f"⚠️ {env_name}={raw} 非法，使用默认并发 {default}")
+        return default
+
+
+def run_pool(func, items: list, max_workers: int = None, label: str = "任务", on_worker_exit=None) -> list:
+    """
+    有界线程池执行 func(*item)
+    - items: 参数元组列表，每个元素作为一次调用的位置参数
+    - on_worker_exit: 可选回调，在每个工作线程退出前于该线程内调用，
+      用于释放线程绑定资源（如 Playwright 同步浏览器）
+    - 返回与 items 顺序一致的 [(ok, value, error), ...]
+      ok=False 时 value 为 None，error 为异常对象
+    """
+    if not items:
+        return []
+
+    workers = min(max_workers or get_max_workers(), len(items))
+    print(f"🧵 [{label}] 并发执行 {len(items)} 项，工作线程: {workers}")
+
+    results = [None] * len(items)
+    jobs = queue.Queue()
+    for idx, item in enumerate(items):
+        jobs.put((idx, item))
+
+    def worker():
+        try:
+            while True:
+                try:
+                    idx, item = jobs.get_nowait()
+                except queue.Empty:
+                    return
+                results[idx] = _call(func, item)
+        finally:
+            if on_worker_exit:
+                try:
+                    on_worker_exit()
+                except Exception as e:
+                    print(f"⚠️ [{threading.current_thread().name}] 线程清理失败: {e}")
+
+    if workers == 1:
+        worker()
+        return results
+
+    threads = [
+        threading.Thread(target=worker, name=f"{label}_{i}", daemon=True)
+        for i in range(workers)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results
+
+
+def _call(func, item):
+    args = item if isinstance(item, tuple) else (item,)
+    try:
+        return True, func(*args), None
+    except Exception as e:
+        print(f"❌ [{threading.current_thread().name}] 执行异常: {e}")
+        return False, None, e
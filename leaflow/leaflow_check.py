@@ -4,23 +4,33 @@ import sys
 import time
 import matplotlib.pyplot as plt
 from datetime import datetime, timedelta, timezone
-import base64
 import json
-import socket
-import subprocess
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, BASE_DIR)
 
 from engine.notify import TelegramNotifier
 from engine.main import ConfigReader, SecretUpdater, test_proxy,to_beijing_time
+from engine.tunnel import get_tunnel_pool
+from engine.browser import get_browser_manager, close_browser_manager, DEFAULT_BLOCK_PROFILE
+from engine.waits import settle, wait_for_url_change, wait_for_any_selector
+from engine.state import get_state_store
+from engine.scheduler import DailyScheduler
+from engine.logger import get_logger
+from engine.proxy_pool import ProxyPool
+from engine.storage_codec import encode_state, decode_state, pack_locals, unpack_locals
+from engine.leaflow_api import api_mode_enabled, build_session, api_checkin, cookies_from_storage, LoginExpired, inertia_versions
+from engine.leaflow_api import MAIN_SITE, CHECKIN_URL as CHECKIN_SITE
 plt.switch_backend('Agg') # 必须在其他 plt 操作之前执行
-LOGIN_URL = "https://leaflow.net/login"
-DASHBOARD_URL = "https://leaflow.net/dashboard"
-BALANCE_URL = "https://leaflow.net/balance"
-CHECKIN_URL = "https://checkin.leaflow.net/"
+LOGIN_URL = f"{MAIN_SITE}/login"
+DASHBOARD_URL = f"{MAIN_SITE}/dashboard"
+BALANCE_URL = f"{MAIN_SITE}/balance"
+CHECKIN_URL = f"{CHECKIN_SITE}/"
 SCREENSHOT_DIR = "/tmp/leaflow_fail"
+TASK_NAME = "leaflow"
+# 签到页保持完整加载，其余页面拦截图片 / 字体 / 统计脚本
+BLOCK_PROFILE = DEFAULT_BLOCK_PROFILE.extend(allow_hosts=["checkin.leaflow.net"])
 
 
 # ==================== 工具函数 ====================
@@ -42,16 +52,6 @@ def mask_password(pwd: str):
     return "*" * 6 + f"({len(pwd)})"
 
 
-def decode_storage(b64_str):
-    try:
-        raw = base64.b64decode(b64_str).decode()
-        return json.loads(raw)
-    except Exception:
-        return None
-
-
-def encode_storage(storage):
-    return base64.b64encode(json.dumps(storage).encode()).decode()
 
 
 
@@ -60,79 +60,62 @@ def encode_storage(storage):
 class LeaflowTask:
     def __init__(self):
         self.config = ConfigReader()
-        self.logs = []
+        self.task_logger = get_logger(TASK_NAME)
+        self.logger = self.task_logger
         self.notifier = TelegramNotifier(self.config)
         self.secret = SecretUpdater("LEAFLOW_LOCALS", config_reader=self.config)
-        self.gost_proc = None
+        self.gost_proxy = None
+        self.state = get_state_store()
+        self.scheduler = DailyScheduler(TASK_NAME, store=self.state)
+        self.pool = None
+        self.last_report = None
         os.makedirs(SCREENSHOT_DIR, exist_ok=True)
 
     # ---------- 日志 ----------
     def log(self, msg, level="INFO"):
-        icons = {"INFO": "ℹ️", "SUCCESS": "✅", "ERROR": "❌", "WARN": "⚠️", "STEP": "🔹"}
-        line = f"{icons.get(level,'•')} {msg}"
-        print(line, flush=True)
-        self.logs.append(line)
+        self.logger.log(msg, level)
 
  # ---------- Gost ----------
     def start_gost_proxy(self, proxy):
-        def free_port():
-            s = socket.socket()
-            s.bind(("", 0))
-            port = s.getsockname()[1]
-            s.close()
-            return port
-
-        port = free_port()
-        server = f"socks5://127.0.0.1:{port}"
-        remote = f"socks5://{proxy['username']}:{proxy['password']}@{proxy['server']}:{proxy['port']}"
+        tunnel = get_tunnel_pool().acquire(proxy)
+        self.gost_proxy = proxy
 
         self.log(
-            f"启动 Gost: ./gost -L :{port} -F ***{proxy['server']}:{proxy['port']}",
+            f"使用 Gost 隧道: 127.0.0.1:{tunnel.port} -> ***{proxy['server']}:{proxy['port']}",
             "STEP"
         )
+        return {"server": tunnel.local_url}
 
-        self.gost_proc = subprocess.Popen(
-            ["./gost", "-L", f":{port}", "-F", remote],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
-        )
-        time.sleep(2)
-        return {"server": server}
+    def release_gost_proxy(self):
+        if self.gost_proxy:
+            get_tunnel_pool().release(self.gost_proxy)
+            self.gost_proxy = None
 
    # ---------- 浏览器 ----------
     def open_browser(self, proxy, storage):
-        self.log("启动 Playwright 浏览器", "STEP")
-        pw = sync_playwright().start()
-
-        launch_args = {
-            "headless": True,
-            "args": [
-                "--no-sandbox",
-                "--disable-blink-features=AutomationControlled",
-                "--disable-infobars",
-                "--exclude-switches=enable-automation",
-            ]
-        }
+        """共享浏览器中为账号创建独立 context，返回 (context, page)"""
+        self.log("创建 Playwright 浏览器 Context", "STEP")
 
+        proxy_url = None
         if proxy:
             if proxy.get("type") == "socks5" and proxy.get("username"):
                 gost = self.start_gost_proxy(proxy)
-                launch_args["proxy"] = {"server": gost["server"]}
-                self.log(f"使用 Gost 本地代理: {gost['server']}", "SUCCESS")
+                proxy_url = gost["server"]
+                self.log(f"使用 Gost 本地代理: {proxy_url}", "SUCCESS")
             else:
-                server = f"{proxy['type']}://{proxy['server']}:{proxy['port']}"
-                launch_args["proxy"] = {"server": server}
+                proxy_url = f"{proxy['type']}://{proxy['server']}:{proxy['port']}"
                 self.log(f"启用代理: {mask_ip(proxy['server'])}", "INFO")
 
-        browser = pw.chromium.launch(**launch_args)
-        context = browser.new_context(
+        context = get_browser_manager().new_context(
+            proxy_url=proxy_url,
+            block_profile=BLOCK_PROFILE,
             storage_state=storage,
             viewport={"width": 1920, "height": 1080},
             user_agent="Mozilla/5.0 Chrome/128.0.0.0"
         )
 
         page = context.new_page()
-        return pw, browser, page
+        return context, page
 
     # ---------- 截图 ----------
     def capture_and_notify(self, page, user, reason):
@@ -167,9 +150,9 @@ class LeaflowTask:
 
         self.log("点击登录按钮", "STEP")
         page.locator('button[type="submit"]').click()
-        page.wait_for_load_state("networkidle", timeout=60000)
 
-        if "login" in page.url.lower():
+        # 跳转离开登录页即返回，最长 60 秒
+        if not wait_for_url_change(page, "login", timeout=60000):
             raise RuntimeError("登录失败")
 
         self.log("登录成功", "SUCCESS")
@@ -191,8 +174,8 @@ class LeaflowTask:
                 page.goto(DASHBOARD_URL, timeout=60000)
                 page.wait_for_load_state("domcontentloaded", timeout=60000)
     
-                # 给页面一点时间跳转
-                page.wait_for_timeout(60000)
+                # 等待页面稳定（含前端跳转到登录页），就绪即返回，最长 60 秒
+                settle(page, "networkidle", timeout=60000)
     
                 current_url = page.url.lower()
     
@@ -238,21 +221,40 @@ class LeaflowTask:
         自动重试 + 状态校验
         """
     
+        # 传入缓存的 Inertia 版本与余额地址；409 时在页面内解析新版本并重试一次
         api_script = """
-        async () => {
+        async ([version, url]) => {
+            const readVersion = (html) => {
+                const m = html.match(/data-page="([^"]+)"/);
+                if (!m) return null;
+                const box = document.createElement("textarea");
+                box.innerHTML = m[1];
+                try { return JSON.parse(box.value).version || null; } catch (_) { return null; }
+            };
+            const call = (v) => fetch(url, {
+                headers: {
+                    "x-inertia": "true",
+                    "x-inertia-version": v,
+                    "x-requested-with": "XMLHttpRequest"
+                },
+                method: "GET"
+            });
+
             try {
-                const response = await fetch("https://leaflow.net/balance", {
-                    headers: {
-                        "x-inertia": "true",
-                        "x-inertia-version": "1da8f358bacd543adbf104c91fa91267",
-                        "x-requested-with": "XMLHttpRequest"
-                    },
-                    method: "GET"
-                });
+                let response = await call(version);
+                let resolved = null;
+
+                if (response.status === 409) {
+                    const location = response.headers.get("x-inertia-location") || url;
+                    const html = await (await fetch(location)).text();
+                    resolved = readVersion(html);
+                    if (resolved) response = await call(resolved);
+                }
     
                 return {
                     status: response.status,
                     ok: response.ok,
+                    version: resolved,
                     data: response.ok ? await response.json() : null
                 };
     
@@ -270,15 +272,20 @@ class LeaflowTask:
             try:
                 self.log(f"获取余额信息 (第 {attempt}/{max_retry} 次)", "STEP")
     
-                page.goto(DASHBOARD_URL, timeout=60000)
-                page.wait_for_load_state("domcontentloaded", timeout=30000)
-                page.wait_for_timeout(2000)
+                # 已在 leaflow.net 同源页面时直接请求，重试时才重新加载
+                if attempt > 1 or not page.url.startswith(MAIN_SITE):
+                    page.goto(DASHBOARD_URL, timeout=60000)
+                    page.wait_for_load_state("domcontentloaded", timeout=30000)
     
-                result = page.evaluate(api_script)
+                result = page.evaluate(api_script, [inertia_versions.get(), BALANCE_URL])
     
                 # JS执行异常
                 if result is None:
                     raise Exception("返回数据为空")
+
+                # 409 后解析到的新版本写入缓存
+                if result.get("version"):
+                    inertia_versions.update(result.get("version"))
     
                 # 网络错误
                 if result.get("status") == -1:
@@ -312,9 +319,14 @@ class LeaflowTask:
     def get_checkin_info(self, page):
         # 1. 先通过 API 获取数据
         raw_info = self.get_balance_data(page)
-        if raw_info:
+        return self.report_checkin(raw_info)
+
+    def report_checkin(self, raw_info):
+        """解析余额数据，已签到时发送资产报告并返回 True"""
+        if isinstance(raw_info, dict):
             report = self.process_leaflow_api(raw_info)
             self.user=report['username']
+            self.last_report = report
             if report['is_checked_today']:
                 
                 self.log(f"今日已签到 (用户: {mask_name(report['username'])}, 余额: {report['balance']})", "SUCCESS")
@@ -358,6 +370,48 @@ class LeaflowTask:
             else:
                 self.log(f"今日还未签到!", "WARN")
 
+    def record_result(self, user, ok, reason=None, proxy=None):
+        """记录本账号执行结果，成功时附带今日签到金额并确认粘性代理"""
+        amount = None
+        if ok and self.last_report:
+            try:
+                amount = float(self.last_report["last_checkin_amount"])
+            except (TypeError, ValueError):
+                amount = None
+        self.state.record_result(TASK_NAME, user, ok, amount=amount, reason=reason)
+        if ok:
+            self.scheduler.mark_done(user)
+            if self.pool:
+                self.pool.confirm(user, proxy)
+
+    # ---------- 纯 API 快速通道 ----------
+    def try_api_checkin(self, user, storage, proxy_url):
+        """
+        使用已保存的 cookies 直接请求接口完成签到，不启动浏览器
+        返回 True 表示已完成；False 表示需要回退到浏览器流程
+        """
+        cookies = cookies_from_storage(storage)
+        if not api_mode_enabled() or not cookies:
+            return False
+
+        self.log(f"尝试纯 API 签到: {mask_email(user)}", "STEP")
+        try:
+            session = build_session(cookies, proxy_url=proxy_url)
+            ok, data, msg = api_checkin(session, user)
+        except LoginExpired as e:
+            self.log(f"API 登录态失效（{e}），回退浏览器流程", "WARN")
+            return False
+        except Exception as e:
+            self.log(f"API 签到异常: {e}，回退浏览器流程", "WARN")
+            return False
+
+        if ok and self.report_checkin(data):
+            self.log(f"API 签到完成: {msg}", "SUCCESS")
+            return True
+
+        self.log(f"API 未能确认签到: {msg}，回退浏览器流程", "WARN")
+        return False
+
 
     # ---------- 签到 (终极稳健版) ----------
     def do_checkin(self, page):
@@ -376,10 +430,16 @@ class LeaflowTask:
                 # 优化点 1: 使用 domcontentloaded 减少因加载某个图片/广告导致的 90s 超时
                 page.goto(CHECKIN_URL, wait_until="domcontentloaded", timeout=60000)
                 
+                # 优化点 2: 同时等待「已签到」或「签到按钮」，先出现者决定分支（最长 75 秒）
+                self.log("等待签到状态或签到按钮出现...", "INFO")
+                hit = wait_for_any_selector(
+                    page,
+                    {"done": success_text_selector, "button": checkin_btn_selector},
+                    timeout=75000,
+                )
+
                 # 检查是否已签到（防止 API 缓存导致的误判）
-                # 等待 5 秒给 JS 执行时间
-                time.sleep(15)
-                if page.locator(success_text_selector).count() > 0:
+                if hit == "done":
                     self.log("页面检测到今日已签到", "SUCCESS")
                     if page:
                         self.capture_and_notify(page, self.user, "今日已签到!")
@@ -387,22 +447,13 @@ class LeaflowTask:
                     self.get_checkin_info(page)
                     return
 
-                # 优化点 2: 显式等待按钮可见
-                self.log("等待签到按钮出现...", "INFO")
-                btn = page.wait_for_selector(checkin_btn_selector, state="visible", timeout=60000)
-                
-                if btn:
+                if hit == "button":
                     self.log("发现签到按钮，执行点击", "SUCCESS")
-                    # 优化点 3: 增加点击前的小延迟，模拟真人操作
-                    time.sleep(5)
-                    btn.click()
+                    page.locator(checkin_btn_selector).first.click()
                     
-                    # 优化点 4: 循环检查签到状态（最多等 15 秒）
-                    for _ in range(15):
-                        if page.locator(success_text_selector).count() > 0:
-                            self.log("签到确认成功", "SUCCESS")
-                            break
-                        time.sleep(15)
+                    # 优化点 3: 等待签到状态出现即返回（最多等 225 秒）
+                    if wait_for_any_selector(page, {"done": success_text_selector}, timeout=225000):
+                        self.log("签到确认成功", "SUCCESS")
                     
                     if page:
                         self.capture_and_notify(page, self.user, "签到状态!")
@@ -410,6 +461,8 @@ class LeaflowTask:
                         return
                     raise RuntimeError("点击了按钮但状态未更新")
 
+                raise RuntimeError("签到按钮未出现")
+
             except Exception as e:
                 self.log(f"第 {attempt+1} 次尝试异常: {str(e)}", "WARN")
                 if attempt < 14:
@@ -556,32 +609,52 @@ class LeaflowTask:
 
         accounts = self.config.get_value("LF_INFO") or []
         proxies = self.config.get_value("WZ_INFO") or []
-        lf_locals = self.secret.load() or {}
+        lf_locals = unpack_locals(self.secret.load())
 
         new_sessions = {}
 
-        for account, proxy in zip(accounts, proxies):
+        # 今日已完成的账号直接跳过（FORCE_RUN=1 强制重跑）
+        # 代理池并发预检全部代理，失效代理的账号切换到健康的备用代理（粘性分配）
+        self.pool = pool = ProxyPool(proxies, task=TASK_NAME, store=self.state)
+        # 共用同一代理的账号复用 gost 隧道，全部账号结束后统一关闭
+        tunnels = get_tunnel_pool(keep_idle=True)
+        pairs = self.scheduler.pending(pool.assign_all(accounts), key=lambda p: p[0]["username"])
+
+        for account, proxy in pairs:
             try:
                 print("\n" + "="*50)
                 user = account["username"]
                 pwd = account["password"]
+                self.logger = self.task_logger.bind(account=mask_email(user))
 
                 #proxy=proxies[-1]
     
                 self.log(f"开始处理账号: {mask_email(user)}", "STEP")
                 self.log(f"检测代理: {mask_ip(proxy['server'])}", "STEP")
-                test_proxy(proxy)
+                proxy_url = test_proxy(proxy)
     
                 storage = None
+                self.last_report = None
                 if user in lf_locals:
-                    storage = decode_storage(lf_locals[user])
+                    storage = decode_state(lf_locals[user])
+
+                # 登录态有效时走纯 API，省去浏览器启动
+                with self.state.timer(TASK_NAME, user, "api_checkin"):
+                    api_done = self.try_api_checkin(user, storage, proxy_url)
+                if api_done:
+                    self.record_result(user, True, proxy=proxy)
+                    continue
     
-                pw = browser = None
+                context = page = None
                 try:
-                    pw, browser, page = self.open_browser(proxy, storage)
+                    with self.state.timer(TASK_NAME, user, "open_browser"):
+                        context, page = self.open_browser(proxy, storage)
     
-                    refreshed = self.ensure_login(page, user, pwd)
-                    self.do_checkin(page)
+                    with self.state.timer(TASK_NAME, user, "ensure_login"):
+                        refreshed = self.ensure_login(page, user, pwd)
+                    with self.state.timer(TASK_NAME, user, "do_checkin"):
+                        self.do_checkin(page)
+                    self.record_result(user, True, proxy=proxy)
     
                     if refreshed or not storage:
                         self.log("更新 storage", "STEP")
@@ -589,23 +662,17 @@ class LeaflowTask:
     
                 except Exception as e:
                     self.log(f"{mask_email(user)} 登录异常: {e}", "ERROR")
+                    self.record_result(user, False, reason=str(e))
                     if page:
                         self.capture_and_notify(page, user, str(e))
     
                 finally:
-                    if browser:
+                    if context:
                         try:
-                            browser.close()
+                            context.close()
                         except Exception:
                             pass
-                    if pw:
-                        try:
-                            pw.stop()
-                        except Exception:
-                            pass
-                    if self.gost_proc:
-                        self.gost_proc.terminate()
-                        self.gost_proc = None
+                    self.release_gost_proxy()
             except Exception as e:
                 self.log(f"处理账号 {user} 时发生未预期错误: {e}", "ERROR")
                 # 可以在这里增加一层保护，防止 notifier 本身报错导致崩溃
@@ -614,15 +681,29 @@ class LeaflowTask:
                 except:
                     pass
             #break
-            
+
+        self.logger = self.task_logger
+        close_browser_manager()
+        self.log(f"隧道统计: {tunnels.stats()}", "INFO")
+        tunnels.close_all()
+
         if new_sessions:
             self.log("准备回写 GitHub Secret", "STEP")
-            encoded = {k: encode_storage(v) for k, v in new_sessions.items()}
-            self.secret.update(encoded)
-            self.log("Secret 回写成功", "SUCCESS")
+            encoded = {k: encode_state(v) for k, v in new_sessions.items()}
+            for k, v in encoded.items():
+                self.state.save_session(TASK_NAME, k, v)
+            # 保留本次未刷新（跳过 / 走 API）账号的原有会话
+            merged = dict(lf_locals, **encoded)
+            if self.secret.update(pack_locals(merged, name=self.secret.name)) == "unchanged":
+                self.log("Secret 内容未变化，跳过回写", "INFO")
+            else:
+                self.log("Secret 回写成功", "SUCCESS")
+
+        for row in self.state.timing_summary(TASK_NAME):
+            self.log(f"耗时统计[{row['step']}]: {row['runs']} 次, 平均 {row['avg_s']:.1f}s, 最大 {row['max_s']:.1f}s", "INFO")
 
         self.log("开始发送通知", "STEP")
-        #self.notifier.send(title="Leaflow 自动签到结果", content="\n".join(self.logs))
+        #self.notifier.send(title="Leaflow 自动签到结果", content="\n".join(self.task_logger.lines()))
 
 
 if __name__ == "__main__":
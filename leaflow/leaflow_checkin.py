@@ -1,9 +1,6 @@
 # leaflow/Leaflow_checkin.py
 import os
 import sys
-import subprocess
-import time
-import requests
 
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, BASE_DIR)
@@ -21,8 +18,18 @@ from engine.leaflow_login import (
 from engine.main import (
     perform_token_checkin,
     SecretUpdater,
-    ConfigReader
+    ConfigReader,
+    build_proxy_url
 )
+from engine.leaflow_api import api_mode_enabled, build_session, api_checkin, LoginExpired, MAIN_SITE, CHECKIN_URL
+from engine.worker_pool import run_pool, get_max_workers
+from engine.browser import close_browser_manager
+from engine.state import get_state_store
+from engine.scheduler import DailyScheduler
+from engine.proxy_pool import ProxyPool
+from engine.tunnel import get_tunnel_pool
+
+TASK_NAME = "leaflow_checkin"
 
 # 初始化
 _notifier = None
@@ -48,46 +55,58 @@ def run_task_for_account(account, proxy, cookie=None):
     """
     note = ""
     username = account['username']
-    proxy_str = f"{proxy['username']}:{proxy['password']}@{proxy['server']}:{proxy['port']}"
     
     print(f"\n{'='*40}")
     print(f"👤 账号: {username}")
     print(f"🌐 代理: {proxy['server']}:{proxy['port']}")
     print(f"{'='*40}")
 
-    gost_proc = None
-    pw_bundle = None
+    tunnels = get_tunnel_pool()
+    tunnel = None
+    ctx = None
     final_cookie = cookie or ""
 
     try:
         # ----------------------------
-        # 1️⃣ 启动 Gost 隧道
+        # 0️⃣ 已有 cookie 时先走纯 API 快速通道（不启动隧道与浏览器）
         # ----------------------------
-        gost_proc = subprocess.Popen(
-            ["./gost", "-L=:8080", f"-F=socks5://{proxy_str}"],
-            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-        )
-        time.sleep(5)
-        local_proxy = "http://127.0.0.1:8080"
+        if final_cookie and api_mode_enabled():
+            try:
+                session = build_session(final_cookie, proxy_url=build_proxy_url(proxy))
+                ok, _, msg = api_checkin(session, username)
+                if ok:
+                    print(f"⚡ API 快速签到完成: {msg}")
+                    return True, final_cookie, f"⚡ cookie 有效，API 签到 | {msg}"
+                note = f"⚠ API 未确认签到，回退浏览器: {msg}"
+            except LoginExpired as e:
+                print(f"⚠ API 登录态失效（{e}），回退浏览器")
+                note = "⚠ API 登录态失效，回退浏览器"
+            except Exception as e:
+                print(f"⚠ API 快速通道异常: {e}，回退浏览器")
+                note = f"⚠ API 快速通道异常，回退浏览器"
+
+        # ----------------------------
+        # 1️⃣ 从隧道池获取 Gost 隧道（同一代理复用）
+        # ----------------------------
+        tunnel = tunnels.acquire(proxy)
+        local_proxy = tunnel.local_url
 
         # ----------------------------
         # 2️⃣ 测试隧道是否可用
         # ----------------------------
-        res = requests.get("https://api.ipify.org", proxies={"http": local_proxy, "https": local_proxy}, timeout=15)
-        print(f"✅ 隧道就绪，出口 IP: {res.text.strip()}")
+        tunnels.probe(proxy)
 
         # ----------------------------
         # 3️⃣ 打开浏览器
         # ----------------------------
-        pw_bundle = open_browser(proxy_url=local_proxy)
-        pw, browser, ctx, page = pw_bundle
+        ctx, page = open_browser(proxy_url=local_proxy)
 
         # ----------------------------
         # 4️⃣ 如果已有 cookie，先注入测试
         # ----------------------------
         if final_cookie:
             print("🔹 注入已有 cookie 测试有效性")
-            page.goto("https://leaflow.net", timeout=30000)
+            page.goto(MAIN_SITE, timeout=30000)
             ctx.add_cookies(final_cookie)  # 直接传 login_and_get_cookies 返回的列表
             page.reload()
         
@@ -121,8 +140,8 @@ def run_task_for_account(account, proxy, cookie=None):
         success, msg = perform_token_checkin(
             cookies=final_cookie,
             account_name=username,
-            checkin_url="https://checkin.leaflow.net",
-            main_site="https://leaflow.net",
+            checkin_url=CHECKIN_URL,
+            main_site=MAIN_SITE,
             headers=headers,
             proxy_url=local_proxy
         )
@@ -139,80 +158,18 @@ def run_task_for_account(account, proxy, cookie=None):
         # ----------------------------
         # 6️⃣ 清理资源
         # ----------------------------
-        if pw_bundle:
-            pw_bundle[1].close()  # browser.close()
-            pw_bundle[0].stop()   # pw.stop()
-        if gost_proc:
-            gost_proc.terminate()
-            gost_proc.wait()
+        if ctx:
+            ctx.close()  # 仅关闭本账号 context，浏览器留给下一个账号
+        if tunnel:
+            tunnels.release(proxy)
         print(f"✨ 账号 {username} 处理完毕，清理隧道。")
-def jrun_task_for_account(account, proxy,cookie=None):
-    """为单个账号启动专属隧道并执行登录签到"""
-    username=account['username']
-    proxy_str=f"{proxy['username']}:{proxy['password']}@{proxy['server']}:{proxy['port']}"
 
-    print(f"\n{'='*40}")
-    print(f"👤 账号: {username}")
-    print(f"🌐 代理: {proxy['server']}:{proxy['port']}")
-    print(f"{'='*40}")
 
-    # 1. 启动 Gost 隧道 (将 SOCKS5 转换为本地 8080 HTTP 代理)
-    gost_proc = subprocess.Popen(
-        ["./gost", "-L=:8080", f"-F=socks5://{proxy_str}"],
-        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-    )
-    
-    time.sleep(5) # 等待隧道建立
-    local_proxy = "http://127.0.0.1:8080"
-    pw_bundle = None
+def timed_task_for_account(account, proxy, cookie=None):
+    """run_task_for_account + 耗时记录"""
+    with get_state_store().timer(TASK_NAME, account['username'], "account_total"):
+        return run_task_for_account(account, proxy, cookie)
 
-    try:
-        # 2. 预检代理是否通畅
-        res = requests.get("https://api.ipify.org", proxies={"http": local_proxy, "https": local_proxy}, timeout=15)
-        print(f"✅ 隧道就绪，出口 IP: {res.text.strip()}")
-
-        # 3. Playwright 登录获取 Cookies
-        pw_bundle = open_browser(proxy_url=local_proxy)
-        pw, browser, ctx, page = pw_bundle
-        cookies = login_and_get_cookies(page, username, account['password'])
-
-        # 4. 访问面板测试cookie
-        if cookies_ok(page):
-            print(f"✨ cookies 有效，开始签到！")
-        else:
-            print(f"✨ cookies 无效，退出！")
-            return
-        # 5. 执行签到逻辑
-        headers={
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36",
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-            "Accept-Language": "zh-CN,zh;q=0.9,en;q=0.8",
-            "DNT": "1",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1"
-        }
-        if cookies:
-            success, msg = perform_token_checkin(
-                cookies=cookies,
-                account_name=username,
-                checkin_url="https://checkin.leaflow.net",
-                main_site="https://leaflow.net",
-                headers=headers,
-                proxy_url=local_proxy
-            )
-            print(f"📢 签到结果: {msg}")
-        
-    except Exception as e:
-        print(f"❌ 执行异常: {str(e)}")
-    finally:
-        # 5. 清理当前账号资源，释放端口供下一个账号使用
-        if pw_bundle:
-            pw_bundle[1].close() # browser.close()
-            pw_bundle[0].stop()  # pw.stop()
-        if gost_proc:
-            gost_proc.terminate()
-            gost_proc.wait()
-        print(f"✨ 账号 {username} 处理完毕，清理隧道。")
 
 def main():
     global config
@@ -243,32 +200,68 @@ def main():
 
     print(f"📊 检测到 {len(accounts)} 个账号和 {len(proxies)} 个代理")
 
-    # 使用 zip 实现一一对应
-    for account, proxy in zip(accounts, proxies):
-        username=account['username']
+    # 通知器需在并发前初始化，避免多线程重复创建
+    notifier = get_notifier()
+    # 共用同一代理的账号复用 gost 隧道，全部账号结束后统一关闭
+    tunnels = get_tunnel_pool(keep_idle=True)
+
+    # 代理池分配（粘性 + 故障转移），隧道端口由 GostTunnel 自动分配
+    # 今日已完成的账号跳过（FORCE_RUN=1 强制重跑），保留其原有 cookie
+    scheduler = DailyScheduler(TASK_NAME)
+    pool = ProxyPool(proxies, task=TASK_NAME)
+    all_pairs = pool.assign_all(accounts)
+    pairs = scheduler.pending(all_pairs, key=lambda p: p[0]['username'])
+    for account, _ in all_pairs:
+        username = account['username']
+        if scheduler.is_done(username):
+            results.append(f"⏭️ 账号：{username}, 今日已完成，跳过")
+            if cookies.get(username):
+                newcookies[username] = cookies[username]
+    jobs = [
+        (account, proxy, cookies.get(account['username'], ''))
+        for account, proxy in pairs
+    ]
+    outcomes = run_pool(
+        timed_task_for_account,
+        jobs,
+        max_workers=get_max_workers("LEAFLOW_CONCURRENCY"),
+        label="leaflow",
+        on_worker_exit=close_browser_manager,
+    )
 
-        print(f"🚀 开始处理账号: {username}, 使用代理: {proxy['server']}")
+    # 按账号原始顺序汇总
+    store = get_state_store()
+    for (account, proxy), (done, value, error) in zip(pairs, outcomes):
+        username=account['username']
         results.append(f"🚀 账号：{username}, 使用代理: {proxy['server']}")
-        try:
-            # run_task_for_account 返回 ok（bool）和 newcookie（dict 或 str）
-            ok, newcookie,msg = run_task_for_account(account, proxy,cookies.get(username,''))
-    
-            if ok:
-                print(f"    ✅ 执行成功，保存新 cookie")
-                results.append(f"    ✅ 执行成功:{msg}")
-                newcookies[username]=newcookie
-            else:
-                print(f"    ⚠️ 执行失败，不保存 cookie")
-                results.append(f"    ⚠️ 执行失败:{msg}")
-    
-        except Exception as e:
-            print(f"    ❌ 执行异常: {e}")
-            results.append(f"    ❌ 执行异常: {e}")
+
+        if not done:
+            print(f"    ❌ {username} 执行异常: {error}")
+            results.append(f"    ❌ 执行异常: {error}")
+            store.record_result(TASK_NAME, username, False, reason=str(error))
+            continue
+
+        # run_task_for_account 返回 ok（bool）和 newcookie（dict 或 str）
+        ok, newcookie,msg = value
+        store.record_result(TASK_NAME, username, ok, reason=None if ok else msg)
+        if ok:
+            scheduler.mark_done(username)
+            pool.confirm(username, proxy)
+            print(f"    ✅ {username} 执行成功，保存新 cookie")
+            results.append(f"    ✅ 执行成功:{msg}")
+            newcookies[username]=newcookie
+        else:
+            print(f"    ⚠️ {username} 执行失败，不保存 cookie")
+            results.append(f"    ⚠️ 执行失败:{msg}")
+
+    print(f"🚇 隧道统计: {tunnels.stats()}")
+    tunnels.close_all()
 
     # 写入
-    secret.update(newcookies)
+    status = secret.update(newcookies)
+    results.append(f"💾 {secret.name}: {'内容未变化，跳过回写' if status == 'unchanged' else '已回写'}")
     # 发送结果
-    get_notifier().send(
+    notifier.send(
         title="Leaflow 自动签到汇总",
         content="\n".join(results)
     )
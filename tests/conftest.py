@@ -0,0 +1,86 @@
+# tests/conftest.py
+# -*- coding: utf-8 -*-
+import sys
+import types
+import importlib
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+# 测试从仓库根目录导入 engine / 各站点模块
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+
+class _Unavailable:
+    """占位依赖：被调用即报错，避免测试在未安装依赖时"假通过\""""
+    def __init__(self, *args, **kwargs):
+        raise RuntimeError(f"{type(self).__name__} 未安装，测试不应走到真实调用")
+
+
+def _placeholder(name: str):
+    return type(name, (_Unavailable,), {})
+
+
+def _unavailable_func(name: str):
+    def func(*args, **kwargs):
+        raise RuntimeError(f"{name} 未安装，测试不应走到真实调用")
+    return func
+
+
+# 只提供被测模块导入时需要的名字
+STUBS = {
+    "requests": lambda: {
+        "Session": _placeholder("Session"),
+        "get": _unavailable_func("requests.get"),
+        "post": _unavailable_func("requests.post"),
+        "RequestException": type("RequestException", (Exception,), {}),
+    },
+    "requests.adapters": lambda: {"HTTPAdapter": _placeholder("HTTPAdapter")},
+    "nacl": dict,
+    "nacl.public": dict,
+    "nacl.encoding": dict,
+    "cryptography": dict,
+    "cryptography.hazmat": dict,
+    "cryptography.hazmat.primitives": dict,
+    "cryptography.hazmat.primitives.ciphers": dict,
+    "cryptography.hazmat.primitives.ciphers.aead": lambda: {"AESGCM": _placeholder("AESGCM")},
+}
+
+
+def _installed(root: str) -> bool:
+    return root in sys.modules or importlib.util.find_spec(root) is not None
+
+
+@pytest.fixture
+def stub_import(monkeypatch):
+    """
+    返回 import_module：未安装的 requests / nacl / cryptography 仅在本测试内用占位模块代替，
+    已安装时使用真实模块；测试结束后移除占位模块及本测试中新导入的 engine 模块
+    """
+    missing = {}
+    for name, attrs in STUBS.items():
+        if _installed(name.split(".")[0]):
+            continue
+        module = types.ModuleType(name)
+        for key, value in attrs().items():
+            setattr(module, key, value)
+        missing[name] = module
+    for name, module in missing.items():
+        parent, _, child = name.rpartition(".")
+        if parent:
+            setattr(missing[parent], child, module)
+        monkeypatch.setitem(sys.modules, name, module)
+
+    before = set(sys.modules)
+    yield importlib.import_module
+
+    if missing:
+        import engine
+        for name in set(sys.modules) - before:
+            if name.startswith("engine."):
+                sys.modules.pop(name, None)
+                if hasattr(engine, name.split(".", 1)[1]):
+                    delattr(engine, name.split(".", 1)[1])
@@ -0,0 +1,37 @@
+# tests/test_logger.py
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from engine import logger as logger_module
+
+
+@pytest.fixture
+def jsonl(tmp_path, monkeypatch):
+    """日志写到临时 JSON Lines 文件，测试结束后停止后台线程"""
+    path = tmp_path / "run.jsonl"
+    monkeypatch.setenv("LOG_JSONL", str(path))
+    logger_module.shutdown_logging()
+    monkeypatch.setattr(logger_module, "_ring", None)
+    base = logger_module.logging.getLogger(logger_module.LOGGER_NAME)
+    saved = list(base.handlers), list(base.filters)
+    yield path
+    logger_module.shutdown_logging()
+    base.handlers[:], base.filters[:] = saved
+
+
+def test_account_field_is_masked(jsonl):
+    log = logger_module.get_logger("test", account="octocat")
+    log.log("开始登录", "STEP")
+    mail = log.bind(account="octocat@example.com")
+    mail.log("登录成功", "SUCCESS")
+    logger_module.shutdown_logging()
+
+    rows = [json.loads(line) for line in jsonl.read_text(encoding="utf-8").splitlines()]
+    assert [r["account"] for r in rows] == ["oct***at", "oct***at@example.com"]
+    assert "octocat" not in jsonl.read_text(encoding="utf-8").replace("oct***at", "")
+
+    # lines() 仍能按账号取回已脱敏的记录
+    assert log.lines() == ["🔹 开始登录"]
+    assert mail.lines() == ["✅ 登录成功"]
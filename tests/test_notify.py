@@ -0,0 +1,89 @@
+# tests/test_notify.py
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+
+class BotConfig:
+    def get_value(self, key):
+        return [{"token": "123:test", "id": "1"}] if key == "BOT_INFO" else None
+
+
+class DummySession:
+    def post(self, *args, **kwargs):
+        raise AssertionError("测试中不应发出真实请求")
+
+
+@pytest.fixture
+def notify(stub_import, monkeypatch):
+    module = stub_import("engine.notify")
+    monkeypatch.setattr(module.requests, "Session", DummySession)
+    return module
+
+
+def test_send_now_falls_back_to_text_when_image_unreadable(notify, tmp_path, monkeypatch):
+    notifier = notify.TelegramNotifier(BotConfig())
+    calls = []
+    monkeypatch.setattr(notifier, "_request", lambda method, data, files=None, timeout=30: calls.append(method) or "ok")
+
+    # 目录存在但无法按文件读取
+    assert notifier.send_now("标题", "内容", image_path=str(tmp_path)) is False
+    assert calls == ["sendMessage"]
+
+
+@pytest.fixture
+def telegram(request, monkeypatch):
+    """真实 HTTP 访问本地 Telegram 替身，需要安装 requests（须在占位模块生效前检查）"""
+    pytest.importorskip("requests")
+    stub_import = request.getfixturevalue("stub_import")
+    mock_sites = stub_import("engine.mock_sites")
+    notify = stub_import("engine.notify")
+
+    def start(rate_per_sec: float):
+        site = mock_sites.TelegramSite(rate_per_sec=rate_per_sec)
+        server = mock_sites.start_site(site)
+        monkeypatch.setattr(notify, "TELEGRAM_API", site.url)
+        site.rejected = 0
+        send = site.send
+
+        def counting_send(req):
+            resp = send(req)
+            site.rejected += resp.status == 429
+            return resp
+
+        site.send = counting_send
+        servers.append(server)
+        return site, notify.TelegramNotifier(BotConfig())
+
+    servers = []
+    monkeypatch.setattr(notify, "MAX_RETRIES", 3)
+    yield start, notify
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_retry_after_429_delivers_message(telegram):
+    start, _ = telegram
+    site, notifier = start(rate_per_sec=2)
+
+    assert notifier.send_now("第一条", "a")
+    assert notifier.send_now("第二条", "b")
+    assert site.rejected >= 1
+    assert [m["text"].split("\n")[0] for m in site.messages] == ["<b>第一条</b>", "<b>第二条</b>"]
+
+
+def test_token_bucket_paces_requests_below_server_limit(telegram, monkeypatch):
+    start, notify = telegram
+    monkeypatch.setattr(notify, "BOT_RATE", 1.5)
+    monkeypatch.setattr(notify, "BOT_BURST", 1)
+    site, notifier = start(rate_per_sec=2)
+
+    began = time.monotonic()
+    for i in range(3):
+        assert notifier.send_now(f"第{i}条", "x")
+    # 令牌桶 1.5 条/秒 慢于服务端 2 条/秒，不触发 429
+    assert site.rejected == 0
+    assert len(site.messages) == 3
+    assert time.monotonic() - began >= 2 / 1.5 - 0.1
@@ -0,0 +1,113 @@
+# tests/test_proxy_pool.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from engine.state import StateStore
+
+PROXIES = [{"server": f"10.0.0.{i}", "port": 1080} for i in range(3)]
+ACCOUNTS = [{"username": f"user{i}"} for i in range(3)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = StateStore(path=tmp_path / "run_state.db")
+    yield s
+    s.close()
+
+
+@pytest.fixture
+def proxy_pool(stub_import):
+    return stub_import("engine.proxy_pool")
+
+
+def proxy_key(proxy: dict) -> str:
+    return f"{proxy['server']}:{proxy['port']}"
+
+
+@pytest.fixture
+def alive(proxy_pool, monkeypatch):
+    """设置本次探测结果：{代理下标: 是否可用}，未列出的视为可用"""
+    status = {}
+
+    def fake_probe(proxies):
+        return [
+            {"ok": status.get(PROXIES.index(p), True), "latency_ms": 100.0 + PROXIES.index(p)}
+            for p in proxies
+        ]
+
+    monkeypatch.setattr(proxy_pool, "probe_proxies", fake_probe)
+    return status
+
+
+def _keys(pairs):
+    return [(a["username"], proxy_key(p)) for a, p in pairs]
+
+
+def test_assign_all_matches_zip_when_healthy(proxy_pool, alive, store):
+    pool = proxy_pool.ProxyPool(PROXIES, task="test", store=store)
+    assert _keys(pool.assign_all(ACCOUNTS)) == _keys(zip(ACCOUNTS, PROXIES))
+
+
+def test_assign_all_cycles_proxies_for_extra_accounts(proxy_pool, alive, store):
+    pool = proxy_pool.ProxyPool(PROXIES, task="test", store=store)
+    pairs = pool.assign_all(ACCOUNTS + [{"username": "extra"}])
+    assert len(pairs) == 4
+    assert pairs[-1][0]["username"] == "extra"
+    assert pairs[-1][1] is PROXIES[0]
+
+
+def test_assign_all_without_proxies(proxy_pool, store):
+    pool = proxy_pool.ProxyPool([], task="test", store=store, probe=False)
+    assert pool.assign_all(ACCOUNTS) == []
+
+
+def test_failover_to_spare_and_stick(proxy_pool, alive, store):
+    alive[0] = False
+    pool = proxy_pool.ProxyPool(PROXIES, task="test", store=store)
+    chosen = pool.assign("user0", 0)
+    assert chosen is not PROXIES[0]
+    # 运行成功前不写入粘性分配
+    assert store.get_kv("proxy_assign:test:user0") is None
+    pool.confirm("user0", chosen)
+    assert store.get_kv("proxy_assign:test:user0") == proxy_key(chosen)
+
+    # 下次运行首选代理恢复，仍沿用上次成功的代理
+    alive.clear()
+    pool = proxy_pool.ProxyPool(PROXIES, task="test", store=store)
+    assert pool.assign("user0", 0) == chosen
+
+
+def test_sticky_proxy_down_fails_over_again(proxy_pool, alive, store):
+    store.set_kv("proxy_assign:test:user0", proxy_key(PROXIES[2]))
+    alive[2] = False
+    pool = proxy_pool.ProxyPool(PROXIES, task="test", store=store)
+    chosen = pool.assign("user0", 0)
+    assert chosen in PROXIES[:2]
+    assert store.get_kv("proxy_assign:test:user0") == proxy_key(PROXIES[2])
+    pool.confirm("user0", chosen)
+    assert store.get_kv("proxy_assign:test:user0") == proxy_key(chosen)
+
+
+def test_failover_spreads_by_load(proxy_pool, alive, store):
+    alive[0] = False
+    pool = proxy_pool.ProxyPool(PROXIES, task="test", store=store)
+    first = pool.assign("a", 0)
+    second = pool.assign("b", 0)
+    assert {proxy_key(first), proxy_key(second)} == {proxy_key(PROXIES[1]), proxy_key(PROXIES[2])}
+
+
+def test_all_down_falls_back_to_preferred(proxy_pool, alive, store):
+    alive.update({0: False, 1: False, 2: False})
+    pool = proxy_pool.ProxyPool(PROXIES, task="test", store=store)
+    assert pool.assign("user1", 1) is PROXIES[1]
+    assert pool.spare_for(PROXIES[1]) is PROXIES[-1]
+
+
+def test_health_accumulates_across_runs(proxy_pool, alive, store):
+    alive[1] = False
+    proxy_pool.ProxyPool(PROXIES, task="test", store=store)
+    proxy_pool.ProxyPool(PROXIES, task="test", store=store)
+    pool = proxy_pool.ProxyPool(PROXIES, task="test", store=store, probe=False)
+    assert pool.health(PROXIES[1])["fail"] == 2
+    assert pool.health(PROXIES[0])["ok"] == 2
+    assert pool.spare_for(PROXIES[2]) is PROXIES[0]
@@ -0,0 +1,40 @@
+# tests/test_safe_print.py
+# -*- coding: utf-8 -*-
+import pytest
+
+from engine.safe_print import desensitize_text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("password=hunterabc", "password=hun***bc"),
+    ("PASSWORD=hunterabc", "PASSWORD=hun***bc"),
+    ("Password=hunterabc", "Password=hun***bc"),
+    ("session: abcdefgh", "session: abc***gh"),
+    ("SESSION: abcdefgh", "SESSION: abc***gh"),
+    ("Token=abcdefgh", "Token=abc***gh"),
+])
+def test_secret_keys_case_insensitive(text, expected):
+    assert desensitize_text(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "v1.2.3.4",
+    "1.2.3.4.5",
+    "999.1.1.1",
+])
+def test_version_strings_not_masked_as_ip(text):
+    assert desensitize_text(text) == text
+
+
+@pytest.mark.parametrize("ip", ["127.0.0.1", "10.1.2.3", "172.16.5.4", "172.31.255.1", "192.168.1.1"])
+def test_private_ipv4_kept(ip):
+    assert desensitize_text(f"隧道 {ip}:8080") == f"隧道 {ip}:8080"
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("出口 IP 8.8.8.8", "出口 IP 8.***.***.8"),
+    ("http://8.8.8.8/ip", "http://8.***.***.8/ip"),
+    ("172.32.0.1", "172.***.***.1"),
+])
+def test_public_ipv4_masked(text, expected):
+    assert desensitize_text(text) == expected
@@ -0,0 +1,48 @@
+# tests/test_scheduler.py
+# -*- coding: utf-8 -*-
+from datetime import datetime, timezone
+
+import pytest
+
+from engine import scheduler
+from engine.state import StateStore, business_day
+
+# 北京时间 2026-01-01 23:59:59 / 2026-01-02 00:00:00（UTC+8）
+BEFORE_MIDNIGHT = datetime(2026, 1, 1, 15, 59, 59, tzinfo=timezone.utc).timestamp()
+AFTER_MIDNIGHT = datetime(2026, 1, 1, 16, 0, 0, tzinfo=timezone.utc).timestamp()
+
+
+@pytest.fixture
+def store(tmp_path):
+    s = StateStore(path=tmp_path / "run_state.db")
+    yield s
+    s.close()
+
+
+def _scheduler_at(monkeypatch, store, ts, **kwargs):
+    monkeypatch.setattr(scheduler, "business_day", lambda: business_day(ts))
+    return scheduler.DailyScheduler("test", store=store, **kwargs)
+
+
+def test_business_day_uses_beijing_midnight():
+    assert business_day(BEFORE_MIDNIGHT) == "2026-01-01"
+    assert business_day(AFTER_MIDNIGHT) == "2026-01-02"
+
+
+def test_done_mark_expires_at_beijing_midnight(monkeypatch, store):
+    accounts = [{"username": "alice"}, {"username": "bob"}]
+    _scheduler_at(monkeypatch, store, BEFORE_MIDNIGHT, force=False).mark_done("alice")
+
+    same_day = _scheduler_at(monkeypatch, store, BEFORE_MIDNIGHT, force=False)
+    assert same_day.is_done("alice")
+    assert same_day.pending(accounts) == [{"username": "bob"}]
+
+    next_day = _scheduler_at(monkeypatch, store, AFTER_MIDNIGHT, force=False)
+    assert not next_day.is_done("alice")
+    assert next_day.pending(accounts) == accounts
+
+
+def test_force_run_ignores_done_mark(monkeypatch, store):
+    _scheduler_at(monkeypatch, store, BEFORE_MIDNIGHT, force=False).mark_done("alice")
+    monkeypatch.setenv("FORCE_RUN", "1")
+    assert not _scheduler_at(monkeypatch, store, BEFORE_MIDNIGHT).is_done("alice")
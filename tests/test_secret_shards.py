@@ -0,0 +1,105 @@
+# tests/test_secret_shards.py
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from engine import state
+
+
+@pytest.fixture
+def main(stub_import):
+    return stub_import("engine.main")
+
+
+@pytest.fixture
+def backend(main, tmp_path, monkeypatch):
+    """文件后端 + 临时状态库，返回读取底层存储的函数"""
+    secret_file = tmp_path / "secrets.json"
+    repo = f"test/{tmp_path.name}"
+    monkeypatch.setenv("SECRET_BACKEND", "file")
+    monkeypatch.setenv("SECRET_FILE", str(secret_file))
+    monkeypatch.setenv("GITHUB_REPOSITORY", repo)
+    monkeypatch.setenv("REPO_TOKEN", "test-token")
+    store = state.StateStore(path=tmp_path / "run_state.db")
+    previous = state.set_state_store(store)
+
+    def stored() -> dict:
+        if not secret_file.exists():
+            return {}
+        return json.loads(secret_file.read_text(encoding="utf-8")).get(repo, {})
+
+    yield stored
+    state.set_state_store(previous)
+    store.close()
+
+
+def _blob(kb: int) -> dict:
+    return {"blob": "x" * kb * 1024}
+
+
+def test_split_shards_respects_utf8_bytes(main):
+    data = "签" * 1000
+    parts = main.split_shards(data, size=100)
+    assert "".join(parts) == data
+    assert all(len(p.encode("utf-8")) <= 100 for p in parts)
+
+
+def test_small_secret_is_not_sharded(main, backend):
+    main.SecretUpdater("LOCALS").update(_blob(1))
+    assert set(backend()) == {"LOCALS"}
+    assert main.SecretUpdater("LOCALS").load() == _blob(1)
+
+
+def test_large_secret_writes_manifest_and_shards(main, backend):
+    main.SecretUpdater("LOCALS").update(_blob(100))
+    stored = backend()
+    manifest = main.parse_manifest(stored["LOCALS"])
+    assert manifest[main.SHARD_KEY] == 3
+    assert sorted(stored) == ["LOCALS", "LOCALS_0", "LOCALS_1", "LOCALS_2"]
+    assert all(len(stored[f"LOCALS_{i}"].encode("utf-8")) <= main.SHARD_SIZE for i in range(3))
+    assert main.SecretUpdater("LOCALS").load() == _blob(100)
+
+
+def test_stale_shards_are_removed(main, backend):
+    main.SecretUpdater("LOCALS").update(_blob(100))
+    main.SecretUpdater("LOCALS").update(_blob(60))
+    assert sorted(backend()) == ["LOCALS", "LOCALS_0", "LOCALS_1"]
+    assert main.SecretUpdater("LOCALS").load() == _blob(60)
+
+    main.SecretUpdater("LOCALS").update(_blob(1))
+    assert sorted(backend()) == ["LOCALS"]
+    assert main.SecretUpdater("LOCALS").load() == _blob(1)
+
+
+def test_torn_shards_fail_digest_check(main, backend):
+    updater = main.SecretUpdater("LOCALS")
+    updater.update(_blob(100))
+    # 模拟分片写入中途失败：某一片仍是旧内容
+    updater.client._write("LOCALS_1", "y" * 10)
+    assert main.SecretUpdater("LOCALS").load() is None
+
+
+def test_too_many_shards_rejected(main, backend):
+    with pytest.raises(RuntimeError):
+        main.SecretUpdater("LOCALS").update(_blob(45 * main.MAX_SHARDS + 10))
+    # 超限时不写入任何分片
+    assert backend() == {}
+
+
+def test_failed_shard_write_raises_and_keeps_manifest(main, backend, monkeypatch):
+    main.SecretUpdater("LOCALS").update(_blob(60))
+    manifest = backend()["LOCALS"]
+
+    updater = main.SecretUpdater("LOCALS")
+    write = updater.client._write
+
+    def flaky_write(name, value):
+        if name == "LOCALS_1":
+            raise OSError("disk full")
+        write(name, value)
+
+    monkeypatch.setattr(updater.client, "_write", flaky_write)
+    with pytest.raises(RuntimeError, match="LOCALS_1"):
+        updater.update(_blob(100))
+    assert backend()["LOCALS"] == manifest
@@ -0,0 +1,58 @@
+# tests/test_storage_codec.py
+# -*- coding: utf-8 -*-
+import json
+import base64
+
+from engine.storage_codec import (
+    STATE_PREFIX,
+    LOCALS_PREFIX,
+    encode_state,
+    decode_state,
+    pack_locals,
+    unpack_locals,
+)
+
+SHARED = {"name": "cf_clearance", "value": "shared", "domain": ".claw.cloud", "path": "/"}
+
+
+def _state(user: str) -> dict:
+    return {
+        "cookies": [SHARED, {"name": "session", "value": user, "domain": ".claw.cloud", "path": "/"}],
+        "origins": [{"origin": "https://claw.cloud", "localStorage": [{"name": "session", "value": user}]}],
+    }
+
+
+def test_encode_state_prefix_and_round_trip():
+    encoded = encode_state(_state("a"))
+    assert encoded.startswith(STATE_PREFIX)
+    assert decode_state(encoded) == _state("a")
+
+
+def test_decode_state_legacy_base64():
+    legacy = base64.b64encode(json.dumps(_state("a")).encode()).decode()
+    assert decode_state(legacy) == _state("a")
+
+
+def test_decode_state_invalid_returns_none():
+    assert decode_state(STATE_PREFIX + "not-zlib") is None
+    assert decode_state("") is None
+    assert decode_state(None) is None
+
+
+def test_pack_locals_shares_common_cookies():
+    packed = pack_locals({"a": encode_state(_state("a")), "b": _state("b")})
+    assert packed.startswith(LOCALS_PREFIX)
+
+    unpacked = unpack_locals(packed)
+    assert set(unpacked) == {"a", "b"}
+    assert all(v.startswith(STATE_PREFIX) for v in unpacked.values())
+    assert decode_state(unpacked["a"]) == _state("a")
+    assert decode_state(unpacked["b"]) == _state("b")
+
+
+def test_unpack_locals_legacy_and_unknown():
+    legacy = {"a": base64.b64encode(json.dumps(_state("a")).encode()).decode()}
+    assert unpack_locals(legacy) == legacy
+    assert unpack_locals("z9:whatever") == {}
+    assert unpack_locals(LOCALS_PREFIX + "broken") == {}
+    assert unpack_locals(None) == {}
@@ -0,0 +1,54 @@
+# tests/test_tunnel.py
+# -*- coding: utf-8 -*-
+import pytest
+
+PROXY = {"server": "10.0.0.1", "port": 1080}
+
+
+class FakeProc:
+    def poll(self):
+        return None
+
+
+@pytest.fixture
+def tunnel(stub_import, monkeypatch):
+    """不启动真实 gost：start 直接视为就绪，记录启动次数"""
+    module = stub_import("engine.tunnel")
+    started = []
+
+    def start(self):
+        self.proc, self.port, self.ready_seconds = FakeProc(), 40000 + len(started), 0.02
+        started.append(self.port)
+        return self
+
+    monkeypatch.setattr(module.GostTunnel, "start", start)
+    monkeypatch.setattr(module.GostTunnel, "stop", lambda self: setattr(self, "proc", None))
+    module.started = started
+    return module
+
+
+def test_teardown_by_default_keeps_stats(tunnel):
+    pool = tunnel.TunnelPool()
+    with pool.lease(PROXY):
+        pass
+    with pool.lease(PROXY):
+        pass
+    assert len(tunnel.started) == 2
+    (row,) = pool.stats()
+    assert row["alive"] is False
+    assert row["uses"] == 2 and row["starts"] == 2
+    assert row["ready_ms"] == 20
+
+
+def test_keep_idle_reuses_tunnel_until_close_all(tunnel):
+    pool = tunnel.TunnelPool(keep_idle=True)
+    with pool.lease(PROXY):
+        pass
+    with pool.lease(PROXY):
+        pass
+    assert len(tunnel.started) == 1
+    assert pool.stats()[0]["alive"] is True
+
+    pool.close_all()
+    (row,) = pool.stats()
+    assert row["alive"] is False and row["uses"] == 2 and row["starts"] == 1